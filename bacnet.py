@@ -1,14 +1,20 @@
 import BAC0
-from BAC0.core.devices.local.models import (analog_input,analog_output,analog_value,binary_input,binary_output,binary_value,character_string,date_value,datetime_value,humidity_input,humidity_value,make_state_text,multistate_input,multistate_output,multistate_value,temperature_input,temperature_value,)
-from BAC0.core.devices.local.object import ObjectFactory
-import re
-import time
 import configparser
-import openpyxl
-from openpyxl.styles import PatternFill
 import pandas as pd
 import numpy as np
-import os
+import threading
+import bacnet_session
+import batch_read
+import device_cache
+import read_scheduler
+import result_sink
+import discovery
+import outliers
+import override_audit
+import point_inventory
+import poller
+from device_registry import DeviceRegistry
+from ranges import range_to_list
 
 
 ### Logging Settings ###
@@ -25,230 +31,205 @@ BAC0.log_level('silence')
 # BAC0.log_level(file='debug', stdout='debug', stderr='critical')
 
 
-### CLASSES ###
-class Device:
-    def __init__(self, address, device_instance, ip_address, net, mac):
-        self.address = address
-        self.deviceInstance = device_instance
-        self.ipAddress = ip_address
-        self.net = net
-        self.mac = mac
-
-
-    def __repr__(self):
-        return f"Device(deviceInstance={self.deviceInstance}, ipAddress={self.ipAddress}, net={self.net}, mac={self.mac})"
+### SETTINGS ###
+# Sweep key: (object type, settings.ini range, column prefix, output file, value type)
+SWEEP_TYPES = {
+    'av': ('analogValue', 'avRange', 'AV', 'av_values.xlsx', 'float'),
+    'bv': ('binaryValue', 'bvRange', 'BV', 'bv_values.xlsx', 'object'),
+    'ai': ('analogInput', 'aiRange', 'AI', 'ai_values.xlsx', 'float'),
+    'ao': ('analogOutput', 'aoRange', 'AO', 'ao_values.xlsx', 'float'),
+    'bi': ('binaryInput', 'biRange', 'BI', 'bi_values.xlsx', 'object'),
+    'bo': ('binaryOutput', 'boRange', 'BO', 'bo_values.xlsx', 'object'),
+    'msv': ('multiStateValue', 'msvRange', 'MSV', 'msv_values.xlsx', 'float'),
+}
 
 
 ### BACnet FUNCTIONS ###
 def bacnetInitialize():
-    config = configparser.ConfigParser()
-    config.read('settings.ini')
-    ipAddress = config.get('bacnet', 'ipAddress')
-    udpPort = config.get('bacnet', 'udpPort')
-    bacnet = BAC0.lite(ip=ipAddress, port=udpPort)
-    
-    return bacnet
+    # Stack of the shared session, see bacnet_session.py.  Made on first call, the same stack after that
+    return bacnet_session.get_session().bacnet
 
-def deviceScan(bacnet):
+def deviceScan(bacnet, on_device=None, progress=None, cancel=None):
+    # progress(rangesDone, rangeCount, devicesFound) is called as each device is found and after each range
+    # cancel is a threading.Event.  The scan stops at the next device once it is set
     config = configparser.ConfigParser()
     config.read('settings.ini')
     device_ranges = config.get('bacnet', 'deviceRanges').split(';')
-    scanTimeout = config.getint('bacnet', 'scanTimeout')
 
-    deviceList = []
+    deviceList = DeviceRegistry()
+
+    # Devices are streamed to device_info as they are found
+    sink = result_sink.open_sink('device_info', [('address', 'string'), ('deviceInstance', 'int'), ('IP', 'string'), ('Network', 'string'), ('MAC', 'string')], sort_by='deviceInstance')
 
-    for device_range in device_ranges:
+    for rangeNumber, device_range in enumerate(device_ranges, start=1):
         range_limits = [int(limit) for limit in device_range.split('-') if limit.isdigit()]
 
         if len(range_limits) == 1:
             startInstance = endInstance = range_limits[0]
         else: 
             startInstance, endInstance = range_limits
-        passes = 1
-
-        noNewDeviceCounter = 0
-        while noNewDeviceCounter < scanTimeout:
-            print(f"Scan for devices {startInstance} to {endInstance}, Pass # {passes}")
-            newDeviceFlag = False
-            bacnet.discover(limits=(startInstance, endInstance))
-            deviceDict = bacnet.discoveredDevices
-
-            for key, value in deviceDict.items():
-                address = key[0]
-                deviceInstance = key[1]
-                ipAddress = ""
-                net = ""
-                mac = ""
-
-                if re.match(r'^(\d{1,3}\.){3}\d{1,3}$', address):
-                    ipAddress = address
-                else:
-                    address_parts = address.split(':')
-                    if len(address_parts) == 2:
-                        net = address_parts[0]
-                        mac = address_parts[1]
-
-                device = Device(address, deviceInstance, ipAddress, net, mac)
-                if all(device.deviceInstance != d.deviceInstance for d in deviceList):
-                    deviceList.append(device)
-                    print("*** added " + str(device.deviceInstance))
-                    newDeviceFlag = True
-
-            if newDeviceFlag:
-                noNewDeviceCounter = 0
-            else:
-                noNewDeviceCounter += 1
-
-            passes += 1
-
-    deviceList = sorted(deviceList, key=lambda x: x.deviceInstance)
-
-    # Create a dictionary to store device information
-    data = {
-        'address': [device.address for device in deviceList],
-        'deviceInstance': [device.deviceInstance for device in deviceList],
-        'IP': [device.ipAddress for device in deviceList],
-        'Network': [device.net for device in deviceList],
-        'MAC': [device.mac for device in deviceList]
-    }
-
-    # Create a Pandas DataFrame from the device information
-    df = pd.DataFrame(data)
-
-    # Write the DataFrame to an Excel file
-    df.to_excel('device_info.xlsx', index=False)
-
-    print("Device scan complete.")
-
-def readAv(bacnet):
-    # Read the existing Device Excel into a DataFrame
-    df = pd.read_excel('device_info.xlsx')
-
-    # Create a new DataFrame to store AV values
-    av_df = pd.DataFrame(columns=['deviceInstance'])
-
-    # Get unique device instances
-    device_instances = df['deviceInstance'].unique()
-    av_df['deviceInstance'] = device_instances
-
-    # Iterate through AV ranges from the .ini file
+
+        if cancel is not None and cancel.is_set():
+            break
+
+        # Busy ranges are split and re-probed until stable, see discovery.py.  Devices come in as they are found
+        for device in discovery.iter_discover(bacnet, startInstance, endInstance):
+            if cancel is not None and cancel.is_set():
+                break
+            if deviceList.add(device):
+                print("*** added " + str(device.deviceInstance))
+                sink.write_row([device.address, device.deviceInstance, device.ipAddress, device.net, device.mac])
+                if on_device is not None:
+                    on_device(device)
+                if progress is not None:
+                    progress(rangeNumber - 1, len(device_ranges), len(deviceList))
+
+        # Save to the device cache after each range
+        device_cache.remember_devices(deviceList)
+
+        if progress is not None:
+            progress(rangeNumber, len(device_ranges), len(deviceList))
+
+    result_sink.finish_sink(sink)
+
+    if cancel is not None and cancel.is_set():
+        print("Device scan cancelled.")
+    else:
+        print("Device scan complete.")
+
+def readSweep(bacnet, objectKey, covManager=None, stats=None, progress=None, cancel=None):
+    # Column-major sweep: every configured instance of one object type is read per device in batched requests
+    # With a cov_manager.CovManager, subscribed present values come from its value table instead of the network
+    # With an outliers.OutlierStats, each device row is added to the running statistics as it comes in
+    # With pointInventory, only objects in the device objectList are read (see point_inventory.py)
+    # progress(devicesDone, deviceCount, pointsRead) is called as each device finishes
+    # cancel is a threading.Event.  Devices not started when it is set are skipped and get an empty row
+    objectType, rangeKey, prefix, fileName, dtype = SWEEP_TYPES[objectKey]
+
+    # Read the devices found by deviceScan from the device cache.  Entries older than deviceCacheTtl are confirmed first
+    device_manager = device_cache.load_live_registry(bacnet)
+    device_instances = device_manager.instances()
+
+    # Instances from the .ini file
     config = configparser.ConfigParser()
     config.read('settings.ini')
-    avRangeList = config.get('bacnet', 'avRange').split(';')
-
-    for avRange in avRangeList:
-        # Check if it's a single AV or a range
-        if '-' in avRange:
-            start, end = avRange.split('-')
-            startAV, endAV = int(start), int(end)
+    instances = range_to_list(config.get('bacnet', rangeKey, fallback=''))
+
+    # Preallocated devices x points matrix
+    if dtype == 'float':
+        values = np.full((len(device_instances), len(instances)), np.nan, dtype=np.float64)
+    else:
+        values = np.full((len(device_instances), len(instances)), None, dtype=object)
+    rowIndex = {device_instance: row for row, device_instance in enumerate(device_instances)}
+    done = set()
+    pointsRead = [0]
+    progressLock = threading.Lock()
+
+    requests = [(objectType, instance, 'presentValue', None) for instance in instances]
+    if stats is not None:
+        stats.start(instances)
+
+    # Objects that exist in each device
+    inventory = {}
+    if instances and point_inventory.use_inventory():
+        inventory = point_inventory.get_inventory(bacnet, device_manager)
+
+    # Rows are streamed to the result file as each device finishes
+    columns = [f'{prefix}{instance}' for instance in instances]
+    sink = result_sink.open_sink(fileName.replace('.xlsx', ''), [('deviceInstance', 'int')] + [(column, 'float' if dtype == 'float' else 'string') for column in columns])
+
+    def readDevice(device_instance):
+        if cancel is not None and cancel.is_set():
+            return
+
+        address = device_manager.get_address(device_instance)
+
+        # Skip instances the device doesn't have.  All of them if the device has no inventory
+        existing = inventory.get(device_instance)
+        if existing is None:
+            cols = list(range(len(instances)))
         else:
-            startAV = endAV = int(avRange)
-
-        for av_number in range(startAV, endAV + 1):
-            av_values = []
-            for device_instance in device_instances:
-                address = df[df['deviceInstance'] == device_instance]['address'].values[0]
-
-                try:
-                    av_value = bacnet.read(f'{address} analogValue {av_number} presentValue')
-                    # Round the AV value to 3 decimal points
-                    av_value_rounded = round(av_value, 3) if av_value is not None else None
-                    av_values.append(av_value_rounded)
-                except Exception as e:
-                    print(f"Error reading AV{av_number} for device {address}: {e}")
-                    av_values.append(None)
+            cols = [col for col, instance in enumerate(instances) if (objectType, instance) in existing]
+        deviceRequests = [requests[col] for col in cols]
 
-            # Add AV values as new columns in the DataFrame
-            av_df[f'AV{av_number}'] = av_values
-
-    # Write AV values to a new Excel file
-    av_df.to_excel('av_values.xlsx', index=False)
-
-    highlight_outliers()
-
-    return av_df
-
-def readBv(bacnet):
-    # Read the existing Device Excel into a DataFrame
-    df = pd.read_excel('device_info.xlsx')
+        if covManager is not None:
+            deviceValues = covManager.read_properties(address, device_instance, deviceRequests)
+        else:
+            deviceValues = batch_read.read_properties(bacnet, address, device_instance, deviceRequests)
 
-    # Create a new DataFrame to store BV values
-    bv_df = pd.DataFrame(columns=['deviceInstance'])
+        row = rowIndex[device_instance]
+        for col, value in zip(cols, deviceValues):
+            if isinstance(value, str) and value == 'NR':
+                print(f"Error reading {prefix}{instances[col]} for device {address}")
+                continue
+            # Values that aren't numbers (e.g. an error object) are NaN in the float matrix
+            values[row, col] = poller.to_float(value) if dtype == 'float' else value
 
-    # Get unique device instances
-    device_instances = df['deviceInstance'].unique()
-    bv_df['deviceInstance'] = device_instances
+        # Round analog values to 3 decimal points
+        rowValues = np.round(values[row], 3) if dtype == 'float' else values[row]
+        sink.write_row([device_instance] + list(rowValues))
+        done.add(device_instance)
 
-    # Iterate through BV ranges from the .ini file
-    config = configparser.ConfigParser()
-    config.read('settings.ini')
-    bvRange = config.get('bacnet', 'bvRange').split(';')
+        if stats is not None:
+            stats.update(rowValues)
 
-    for bvRange in bvRange:
-        # Check if it's a single AV or a range
-        if '-' in bvRange:
-            start, end = bvRange.split('-')
-            startBV, endBV = int(start), int(end)
-        else:
-            startBV = endBV = int(bvRange)
+        if progress is not None:
+            with progressLock:
+                pointsRead[0] += len(cols)
+                progress(len(done), len(device_instances), pointsRead[0])
 
+    # Read all devices at the same time, limited per network
+    if instances:
+        read_scheduler.run_per_device(device_manager, device_instances, readDevice)
 
-        for bv_number in range(startBV, endBV + 1):
-            bv_values = []
-            for device_instance in device_instances:
-                address = df[df['deviceInstance'] == device_instance]['address'].values[0]
+    # Round analog values to 3 decimal points
+    if dtype == 'float':
+        values = np.round(values, 3)
 
-                try:
-                    bv_value = bacnet.read(f'{address} binaryValue {bv_number} presentValue')
-                    bv_values.append(bv_value)
-                except Exception as e:
-                    print(f"Error reading BV{bv_number} for device {address}: {e}")
-                    bv_values.append(None)
+    # Build the DataFrame once
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, 'deviceInstance', device_instances)
 
-            # Add BV values as new columns in the DataFrame
-            bv_df[f'BV{bv_number}'] = bv_values
+    # Devices that were not read still get a row
+    for device_instance in device_instances:
+        if device_instance not in done:
+            sink.write_row([device_instance] + [None for column in columns])
 
-    # Write BV values to a new Excel file
-    bv_df.to_excel('bv_values.xlsx', index=False)
+    # Outlier highlights are filled in while the Excel file is written
+    if stats is not None:
+        sink.set_highlights(device_instances, stats.mask(values))
 
-    return bv_df
+    # Close the result file.  Excel is written here, or exported from parquet / arrow if excelExport is set
+    result_sink.finish_sink(sink)
 
+    return df
 
+def readAv(bacnet, covManager=None, progress=None, cancel=None):
+    # Cells far from the other devices are highlighted in av_values.xlsx.  See outliers.py
+    return readSweep(bacnet, 'av', covManager, outliers.OutlierStats(), progress, cancel)
 
-### Other helper functions ###
-def highlight_outliers():
-    file_path = os.path.join(os.getcwd(), 'av_values.xlsx')
+def readBv(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'bv', covManager, progress=progress, cancel=cancel)
 
-    # Load the workbook
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb.active
+def readAi(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'ai', covManager, progress=progress, cancel=cancel)
 
-    # Get the data from the sheet
-    data = []
-    for row in sheet.iter_rows(values_only=True):
-        data.append(row)
+def readAo(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'ao', covManager, progress=progress, cancel=cancel)
 
-    # Convert data to NumPy array
-    data = np.array(data[1:], dtype=np.float64)  # Exclude header row
+def readBi(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'bi', covManager, progress=progress, cancel=cancel)
 
-    # Calculate standard deviation for each column
-    std_dev = np.nanstd(data, axis=0)
-    mean = np.nanmean(data, axis=0)
+def readBo(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'bo', covManager, progress=progress, cancel=cancel)
 
-    # Highlight cells that are more than 2 standard deviations away in red
-    red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+def readMsv(bacnet, covManager=None, progress=None, cancel=None):
+    return readSweep(bacnet, 'msv', covManager, progress=progress, cancel=cancel)
 
-    for col_index, (column, std, avg) in enumerate(zip(data.T, std_dev, mean), start=1):
-        for cell_index, value in enumerate(column, start=2):
-            cell = sheet.cell(row=cell_index, column=col_index)
-            if value > avg + 1 * std or value < avg - 1 * std:
-                cell.fill = yellow_fill
-            if value > avg + 2 * std or value < avg - 2 * std:
-                cell.fill = red_fill
+def overrideAudit(bacnet, progress=None, cancel=None):
+    # Every non-null priority slot of every commandable object of the cached devices.  See override_audit.py
+    return override_audit.audit_overrides(bacnet, None, progress, cancel)
 
-    # Save the updated workbook
-    wb.save(file_path)
 
 
 def main():
@@ -1,7 +1,25 @@
+import time
+
+# Startup is measured from here to the window showing
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-from bacnet import bacnetInitialize, deviceScan, readAv, readBv
+from concurrent.futures import ThreadPoolExecutor
+import queue
 import subprocess
+import sys
+import threading
+
+# bacnet.py (BAC0, pandas, numpy) is imported by the first job, not at startup
+
+# Settings
+# Jobs running at the same time.  Every job can run together with the others on the one BACnet stack
+MAX_JOBS = 4
+
+# How often the UI picks up messages from the jobs (ms)
+POLL_MS = 100
+
 
 # Classes
 class CustomButton(tk.Button):
@@ -10,27 +28,124 @@ class CustomButton(tk.Button):
         self.configure(bg="#3C8FDD", fg="white", font=("Arial", 10, "bold"), width=15)
 
 
+class JobRow:
+    # Start button, progress bar, status text and cancel button of one job
+    # The job runs on the executor.  It only talks to the UI through ui_queue
+    # function is the name of the bacnet.py function the job calls
+    def __init__(self, master, text, function, done_text, count_text):
+        self.name = text
+        self.function = function
+        self.done_text = done_text
+        self.count_text = count_text
+        self.cancel = threading.Event()
+        self.running = False
+        self.started = 0
+
+        frame = ttk.Frame(master)
+        frame.pack(fill='x', padx=10, pady=5)
+
+        self.button = CustomButton(frame, text=text, command=self.start)
+        self.button.grid(row=0, column=0, padx=(0, 5))
+        self.cancel_button = tk.Button(frame, text="Cancel", command=self.cancel.set, state='disabled')
+        self.cancel_button.grid(row=0, column=1)
+        self.bar = ttk.Progressbar(frame, length=260, maximum=1)
+        self.bar.grid(row=1, column=0, columnspan=2, sticky='we', pady=(3, 0))
+        self.status = tk.Label(frame, text="", anchor='w')
+        self.status.grid(row=2, column=0, columnspan=2, sticky='we')
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.cancel.clear()
+        self.started = time.monotonic()
+        self.button.configure(state='disabled')
+        self.cancel_button.configure(state='normal')
+        self.bar.configure(value=0)
+        self.status.configure(text="Starting...")
+        executor.submit(run_job, self)
+
+    def show_progress(self, done, total, count):
+        # count is devices found for a scan, points read for a sweep
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        text = f"{count} {self.count_text}, {count / elapsed:.1f}/s"
+        if total:
+            self.bar.configure(value=done / total)
+            if 0 < done < total:
+                text += f", ETA {format_seconds(elapsed * (total - done) / done)}"
+        self.status.configure(text=text)
+
+    def finish(self, error):
+        self.running = False
+        self.button.configure(state='normal')
+        self.cancel_button.configure(state='disabled')
+        elapsed = format_seconds(time.monotonic() - self.started)
+        if error is not None:
+            self.status.configure(text=f"Error after {elapsed}")
+            messagebox.showerror("Error", f"Error in {self.name}: {error}")
+        elif self.cancel.is_set():
+            self.status.configure(text=f"Cancelled after {elapsed}")
+        else:
+            self.bar.configure(value=1)
+            self.status.configure(text=f"Done in {elapsed}")
+            messagebox.showinfo(self.name, self.done_text)
+
+
 # Functions
-def device_scan():
-    try:
-        deviceScan(bacnet)  # Call the readAv function from bacnet.py
-        messagebox.showinfo("Device Scan", "Devices scanned successfully!")
-    except Exception as e:
-        messagebox.showerror("Error", f"Error scanning devices: {e}")
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def get_bacnet():
+    # Imports the BACnet code and starts the shared session stack on first use.  Jobs after that share the same stack
+    with bacnet_lock:
+        import bacnet_session
+        session = bacnet_session.get_session()
+        if not session.connected():
+            ui_queue.put(('status', None, "Starting BACnet..."))
+            try:
+                session.bacnet
+            except Exception:
+                ui_queue.put(('status', None, "BACnet not started"))
+                raise
+            ui_queue.put(('status', None, "BACnet ready"))
+        return session.bacnet
+
+def run_job(job):
+    # Runs on an executor thread.  Never touches Tk
+    def progress(done, total, count):
+        ui_queue.put(('progress', job, (done, total, count)))
 
-def read_bv_values():
     try:
-        readBv(bacnet)  # Call the readAv function from bacnet.py
-        messagebox.showinfo("Read BV", "BV values read successfully!")
+        device = get_bacnet()
+        import bacnet as bacnet_scan
+        getattr(bacnet_scan, job.function)(device, progress=progress, cancel=job.cancel)
+        ui_queue.put(('finish', job, None))
     except Exception as e:
-        messagebox.showerror("Error", f"Error reading AV: {e}")
+        ui_queue.put(('finish', job, e))
 
-def read_av_values():
+def show_startup_time(event=None):
+    # Time from start to the window showing.  With --startup-time the window closes right after, see benchmark.py
+    root.unbind('<Map>')
+    print(f"Window shown in {time.perf_counter() - STARTED:.3f} s")
+    if '--startup-time' in sys.argv:
+        root.after(0, on_close)
+
+def process_queue():
+    # Applies job messages on the Tk thread
     try:
-        readAv(bacnet)  # Call the readAv function from bacnet.py
-        messagebox.showinfo("Read AV", "AV values read successfully!")
-    except Exception as e:
-        messagebox.showerror("Error", f"Error reading AV: {e}")
+        while True:
+            kind, job, payload = ui_queue.get_nowait()
+            if kind == 'progress':
+                job.show_progress(*payload)
+            elif kind == 'finish':
+                job.finish(payload)
+            elif kind == 'status':
+                status_label.configure(text=payload)
+    except queue.Empty:
+        pass
+
+    root.after(POLL_MS, process_queue)
 
 def adjust_settings():
     try:
@@ -38,15 +153,32 @@ def adjust_settings():
     except Exception as e:
         messagebox.showerror("Error", f"Error opening settings.ini: {e}")
 
+def on_close():
+    # Jobs stop at their next device.  Jobs not started yet are dropped
+    for job_row in jobs:
+        job_row.cancel.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+    root.destroy()
+
+    # Saves the devices found to device_cache.json and closes the socket.  Only if a job started BACnet
+    if 'bacnet_session' in sys.modules:
+        session = sys.modules['bacnet_session'].get_session()
+        if session.connected():
+            session.close()
+
 
 # Main
-bacnet = bacnetInitialize()
+bacnet_lock = threading.Lock()
+ui_queue = queue.Queue()
+executor = ThreadPoolExecutor(max_workers=MAX_JOBS + 1, thread_name_prefix="scan_utility")
 
 # Main Window
 root = tk.Tk()
 root.title("BACnet Scan Utility")
-root.geometry("300x300")
+root.geometry("320x500")
 root.configure(bg="white")
+root.protocol("WM_DELETE_WINDOW", on_close)
+root.bind('<Map>', show_startup_time)
 
 # Create a Notebook (tabbed interface)
 notebook = ttk.Notebook(root)
@@ -57,15 +189,16 @@ device_scan_frame = ttk.Frame(notebook)
 notebook.add(device_scan_frame, text='Device Scan')
 # device_scan_frame.configure(bg="white")
 
-# Buttons for Device Scan tab
-button_device_scan = CustomButton(device_scan_frame, text="Device Scan", command=device_scan)
-button_device_scan.pack(pady=10)
-
-button_read_av = CustomButton(device_scan_frame, text="Read AV", command=read_av_values)
-button_read_av.pack(pady=10)
+status_label = tk.Label(device_scan_frame, text="BACnet starts with the first job", anchor='w')
+status_label.pack(fill='x', padx=10, pady=(5, 0))
 
-button_read_bv = CustomButton(device_scan_frame, text="Read BV", command=read_bv_values)
-button_read_bv.pack(pady=10)
+# Jobs for Device Scan tab
+jobs = [
+    JobRow(device_scan_frame, "Device Scan", "deviceScan", "Devices scanned successfully!", "devices found"),
+    JobRow(device_scan_frame, "Read AV", "readAv", "AV values read successfully!", "points read"),
+    JobRow(device_scan_frame, "Read BV", "readBv", "BV values read successfully!", "points read"),
+    JobRow(device_scan_frame, "Override Audit", "overrideAudit", "Override audit written to override_audit!", "overrides found"),
+]
 
 button_adjust_settings = CustomButton(device_scan_frame, text="Adjust Settings", command=adjust_settings)
 button_adjust_settings.pack(pady=10)
@@ -79,4 +212,5 @@ notebook.add(settings_frame, text='Adjust Settings')
 button_adjust_settings = CustomButton(settings_frame, text="Adjust Settings", command=adjust_settings)
 button_adjust_settings.pack(pady=10)
 
-root.mainloop()
\ No newline at end of file
+root.after(POLL_MS, process_queue)
+root.mainloop()
@@ -0,0 +1,400 @@
+from BAC0.core.io.IOExceptions import (
+    BufferOverflow,
+    NoResponseFromController,
+    SegmentationNotSupported,
+    UnknownObjectError,
+    UnknownPropertyError,
+    UnrecognizedService,
+)
+from BAC0.core.io.Read import cast_datatype_from_tag, find_reason
+from bacpypes.apdu import ReadPropertyACK, ReadPropertyMultipleACK, SimpleAckPDU
+from bacpypes.constructeddata import Array
+from bacpypes.core import deferred
+from bacpypes.iocb import IOCB
+from bacpypes.object import get_datatype
+from bacpypes.primitivedata import Unsigned
+import asyncio
+import logging
+import threading
+import time
+import batch_read
+
+
+### SETTINGS ###
+# BACnet invoke IDs are one byte, so a device can't have more than 255 confirmed requests outstanding from us
+MAX_OUTSTANDING_PER_DEVICE = 255
+MAX_OUTSTANDING = 4096
+REQUEST_TIMEOUT = 10
+
+
+# One event loop per process, run in a background thread
+_loop = None
+_loop_lock = threading.Lock()
+
+
+### EVENT LOOP ###
+def get_loop():
+    """
+    Parameters: None
+    Starts the process event loop in a background thread the first time it is called
+    Return: asyncio event loop
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="bacnet_async", daemon=True).start()
+
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """
+    Parameters: coroutine, seconds to wait (None for no limit)
+    Runs a coroutine on the process event loop and waits for the result.  For calling async code from the blocking scripts
+    Return: coroutine result
+
+    Example:
+    client = AsyncBacnetClient(bacnet)
+    value = run_sync(client.read("192.168.1.10", "analogValue", 1, "presentValue"))
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    loop = get_loop()
+    if threading.current_thread().name == "bacnet_async":
+        raise RuntimeError("run_sync can't be called from the event loop.  Use await")
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+### DECODING ###
+def decode_value(object_type, property, array_index, property_value, vendor_id=0):
+    """
+    Parameters: object type, property, array index, bacpypes Any
+    Casts a property value the same way BAC0 read does
+    Return: python value
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    datatype = get_datatype(object_type, property, vendor_id=vendor_id)
+
+    if not datatype:
+        return cast_datatype_from_tag(property_value, object_type, property)
+
+    # Array parts
+    if issubclass(datatype, Array) and array_index is not None:
+        if array_index == 0:
+            return property_value.cast_out(Unsigned)
+        return property_value.cast_out(datatype.subtype)
+
+    if property_value.is_application_class_null():
+        return None
+
+    return property_value.cast_out(datatype)
+
+
+def raise_for_error(apdu, args):
+    """
+    Parameters: error / reject / abort apdu, request description
+    Raises the BAC0 exception that matches the error reason
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    reason = find_reason(apdu)
+
+    if reason == "unrecognizedService":
+        raise UnrecognizedService(f"Unrecognized service {args}")
+    if reason == "segmentationNotSupported":
+        raise SegmentationNotSupported(f"Segmentation not supported {args}")
+    if reason == "bufferOverflow":
+        raise BufferOverflow(f"Buffer capacity exceeded {args}")
+    if reason == "unknownObject":
+        raise UnknownObjectError(f"Unknown object {args}")
+    if reason == "unknownProperty":
+        raise UnknownPropertyError(f"Unknown property {args}")
+
+    raise NoResponseFromController(f"APDU Abort Reason : {reason}")
+
+
+### CLASSES ###
+class AsyncBacnetClient:
+    """
+    Awaitable read, read multiple, write and Who-Is on top of a running BAC0 stack.
+
+    Each confirmed request is handed to the bacpypes stack as an IOCB.  The stack gives every request an invoke ID
+    and matches the reply by (device address, invoke ID), then completes the IOCB from the bacpypes thread.
+    The IOCB callback resolves an asyncio future on the process event loop, so no thread waits on a reply
+    and thousands of requests can be outstanding over the one UDP socket.
+
+    Example:
+    client = AsyncBacnetClient(bacnet)
+    values = run_sync(client.read_multiple("192.168.1.10", [("analogValue", 1, "presentValue", None)]))
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    def __init__(self, bacnet, timeout=REQUEST_TIMEOUT, max_outstanding=MAX_OUTSTANDING):
+        self.bacnet = bacnet
+        self.timeout = timeout
+        self.max_outstanding = max_outstanding
+        self._outstanding = None
+        self._device_limits = {}
+
+    def _limits(self, address):
+        # Semaphores belong to the loop, so they are made on first use from inside it
+        if self._outstanding is None:
+            self._outstanding = asyncio.Semaphore(self.max_outstanding)
+        if address not in self._device_limits:
+            self._device_limits[address] = asyncio.Semaphore(MAX_OUTSTANDING_PER_DEVICE)
+        return self._outstanding, self._device_limits[address]
+
+    async def request(self, address, apdu):
+        """
+        Parameters: device address, bacpypes request apdu
+        Sends a confirmed request and waits for the reply without blocking the event loop
+        Return: IOCB, completed or aborted
+        """
+
+        loop = asyncio.get_running_loop()
+        outstanding, device_limit = self._limits(str(address))
+
+        async with outstanding, device_limit:
+            future = loop.create_future()
+
+            def on_complete(iocb):
+                # Called from the bacpypes thread
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(iocb))
+
+            iocb = IOCB(apdu)
+            iocb.set_timeout(self.timeout)
+            iocb.add_callback(on_complete)
+            deferred(self.bacnet.this_application.request_io, iocb)
+
+            return await future
+
+    async def read(self, address, object_type, object_instance, property, array_index=None):
+        """
+        Parameters: device address, object type, object instance, property, array index
+        Awaitable ReadProperty
+        Return: BACnet value.  None if the reply is not an ack.  Raises the BAC0 exceptions on error
+        """
+
+        args = [str(address), str(object_type), str(object_instance), str(property)]
+        if array_index is not None:
+            args.append(str(array_index))
+
+        iocb = await self.request(address, self.bacnet.build_rp_request(args))
+
+        if iocb.ioError:
+            raise_for_error(iocb.ioError, " ".join(args))
+
+        apdu = iocb.ioResponse
+        if not isinstance(apdu, ReadPropertyACK):
+            return None
+
+        return decode_value(apdu.objectIdentifier[0], apdu.propertyIdentifier, apdu.propertyArrayIndex, apdu.propertyValue)
+
+    async def read_multiple(self, address, requests):
+        """
+        Parameters: device address, list of request tuples (object_type, object_instance, property, array_index)
+        Awaitable ReadPropertyMultiple.  Does not split requests, see read_properties
+        Return: list of values in the same order as requests.  None for property access errors
+        """
+
+        args = batch_read.build_rpm_args(address, requests)
+
+        iocb = await self.request(address, self.bacnet.build_rpm_request(args.split()))
+
+        if iocb.ioError:
+            raise_for_error(iocb.ioError, args)
+
+        apdu = iocb.ioResponse
+        if not isinstance(apdu, ReadPropertyMultipleACK):
+            raise NoResponseFromController(f"Not an ack {args}")
+
+        values = []
+        for result in apdu.listOfReadAccessResults:
+            object_type = result.objectIdentifier[0]
+            for element in result.listOfResults:
+                if element.readResult.propertyAccessError is not None:
+                    values.append(None)
+                else:
+                    values.append(
+                        decode_value(object_type, element.propertyIdentifier, element.propertyArrayIndex, element.readResult.propertyValue)
+                    )
+
+        return values
+
+    async def read_single(self, address, request):
+        """
+        Parameters: device address, request tuple
+        Return: BACnet value.  If error, returns "NR"
+        """
+
+        try:
+            return await self.read(address, *request)
+        except Exception as e:
+            logging.error(f"read_single error.  error: {e} address: {address} request: {request}")
+            return "NR"
+
+    async def read_chunk(self, address, device_instance, chunk, capabilities):
+        """
+        Parameters: device address, device instance, list of request tuples, device capabilities
+        Async version of batch_read.read_chunk
+        Return: list of values, "NR" for errors
+        """
+
+        if len(chunk) == 1 or not capabilities["rpm"]:
+            return list(await asyncio.gather(*(self.read_single(address, request) for request in chunk)))
+
+        try:
+            values = await self.read_multiple(address, chunk)
+
+        except UnrecognizedService:
+            logging.info(f"Device {device_instance} does not support ReadPropertyMultiple.  Using single reads")
+            capabilities["rpm"] = False
+            return await self.read_chunk(address, device_instance, chunk, capabilities)
+
+        except (SegmentationNotSupported, BufferOverflow):
+            half = len(chunk) // 2
+            first, second = await asyncio.gather(
+                self.read_chunk(address, device_instance, chunk[:half], capabilities),
+                self.read_chunk(address, device_instance, chunk[half:], capabilities),
+            )
+            return first + second
+
+        except Exception as e:
+            logging.error(f"read_chunk error.  error: {e} device: {device_instance}.  Using single reads")
+            values = None
+
+        if not isinstance(values, list) or len(values) != len(chunk):
+            return list(await asyncio.gather(*(self.read_single(address, request) for request in chunk)))
+
+        return ["NR" if value is None else value for value in values]
+
+    async def get_device_capabilities(self, address, device_instance):
+        """
+        Parameters: device address, device instance
+        Async version of batch_read.get_device_capabilities.  Same defaults and decoding, kept in batch_read.device_capabilities
+        Return: capabilities dict
+        """
+
+        if device_instance in batch_read.device_capabilities:
+            return batch_read.device_capabilities[device_instance]
+
+        capabilities = batch_read.default_capabilities()
+        requests = batch_read.capability_requests(device_instance)
+
+        try:
+            max_apdu, segmentation = await self.read_multiple(address, requests)
+        except UnrecognizedService:
+            capabilities["rpm"] = False
+            max_apdu, segmentation = await asyncio.gather(*(self.read_single(address, request) for request in requests))
+        except Exception as e:
+            logging.error(f"get_device_capabilities error.  error: {e} device: {device_instance}")
+            max_apdu, segmentation = None, None
+
+        batch_read.device_capabilities[device_instance] = batch_read.set_capabilities(capabilities, max_apdu, segmentation)
+
+        return batch_read.device_capabilities[device_instance]
+
+    async def read_properties(self, address, device_instance, requests):
+        """
+        Parameters: device address, device instance, list of request tuples
+        Async version of batch_read.read_properties.  Chunks are sent at the same time
+        Return: list of values in the same order as requests.  If error, value is "NR"
+        """
+
+        unique_requests = list(dict.fromkeys(requests))
+
+        if not unique_requests:
+            return []
+
+        if len(unique_requests) == 1:
+            value = await self.read_single(address, unique_requests[0])
+            return [value for request in requests]
+
+        capabilities = await self.get_device_capabilities(address, device_instance)
+        chunks = batch_read.chunk_requests(unique_requests, capabilities["max_apdu"], capabilities["segmentation"])
+        chunk_values = await asyncio.gather(*(self.read_chunk(address, device_instance, chunk, capabilities) for chunk in chunks))
+
+        results = {}
+        for chunk, values in zip(chunks, chunk_values):
+            results.update(zip(chunk, values))
+
+        return [results[request] for request in requests]
+
+    async def write(self, address, object_type, object_instance, property, value, array_index=None, priority=None):
+        """
+        Parameters: device address, object type, object instance, property, value, array index, priority
+        Awaitable WriteProperty
+        Return: True.  Raises NoResponseFromController on error
+        """
+
+        args = [str(address), str(object_type), str(object_instance), str(property), str(value)]
+        if array_index is not None:
+            args.append(str(array_index))
+        if priority is not None:
+            args += ["-", str(priority)]
+
+        iocb = await self.request(address, self.bacnet.build_wp_request(args))
+
+        if iocb.ioError:
+            reason = find_reason(iocb.ioError)
+            raise NoResponseFromController(f"APDU Abort Reason : {reason}")
+
+        if not isinstance(iocb.ioResponse, SimpleAckPDU):
+            raise NoResponseFromController(f"Not an ack {' '.join(args)}")
+
+        return True
+
+    async def whois(self, start_instance=None, end_instance=None, address=None, wait=1.0):
+        """
+        Parameters: range of device instances, address or "network:*" (None for local broadcast), seconds to wait for I-Am
+        Awaitable Who-Is.  Who-Is is unconfirmed, so I-Am are collected from the stack for wait seconds
+        Return: list of (address, device instance) that answered
+        """
+
+        args = []
+        if address is not None:
+            args.append(str(address))
+        if start_instance is not None:
+            args += [str(start_instance), str(end_instance if end_instance is not None else start_instance)]
+
+        i_am_counter = self.bacnet.this_application.i_am_counter
+        before = dict(i_am_counter)
+
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            # BAC0 whois sleeps while sending
+            if args:
+                await loop.run_in_executor(None, self.bacnet.whois, " ".join(args))
+            else:
+                await loop.run_in_executor(None, self.bacnet.whois)
+        except Exception as e:
+            logging.error(f"whois error.  error: {e} args: {args}")
+
+        await asyncio.sleep(max(0, wait - (time.monotonic() - start)))
+
+        responders = []
+        for key, count in list(i_am_counter.items()):
+            if start_instance is not None and not (start_instance <= key[1] <= (end_instance if end_instance is not None else start_instance)):
+                continue
+            if count > before.get(key, 0):
+                responders.append(key)
+
+        return responders
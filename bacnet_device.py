@@ -9,7 +9,14 @@
 
 
 import BAC0
+import ipaddress
+import json
+import multiprocessing
+import random
+import sys
+import threading
 import time
+from bacpypes.task import FunctionTask
 from BAC0.core.devices.local.models import (
     analog_input,
     analog_output,
@@ -31,6 +38,24 @@ from BAC0.core.devices.local.models import (
 )
 from BAC0.core.devices.local.object import ObjectFactory
 
+
+### SETTINGS ###
+# Object types used by add_generated_points, in the order they are handed out
+GENERATED_TYPES = [
+    ("analogValue", analog_value, 50.0),
+    ("binaryValue", binary_value, False),
+    ("analogInput", analog_input, 70.0),
+    ("analogOutput", analog_output, 0.0),
+    ("binaryInput", binary_input, False),
+    ("binaryOutput", binary_output, False),
+]
+
+MSTP_MAX_APDU = 480
+
+# Time each emulated MS/TP trunk is busy until (time.monotonic)
+trunk_busy_until = {}
+
+
 ### HELPER FUNCTIONS ###
 def create_bacnet_device(device_instance, ip, port=47808, description=""):
     return BAC0.lite(ip=ip, deviceId=device_instance, port=port, description=description)
@@ -48,14 +73,215 @@ def add_points(device):
     binary_value(instance=0, description = "Heat_cool mode", presentValue=False).add_objects_to_application(device)
     return
 
+def generated_points(point_count):
+    # Points made by add_generated_points: [(object_type, instance), ...]
+    return [(GENERATED_TYPES[i % len(GENERATED_TYPES)][0], i // len(GENERATED_TYPES)) for i in range(point_count)]
+
+def points_from_spec(points):
+    # Spec points are a count (cycles through GENERATED_TYPES) or {"analogValue": 200, "binaryValue": 50, ...}
+    if isinstance(points, dict):
+        return [(object_type, instance) for object_type, count in points.items() for instance in range(count)]
+    return generated_points(points)
+
+def add_generated_points(device, points):
+    # Adds points to device.  points is a count or a list of (object_type, instance)
+    if isinstance(points, int):
+        points = generated_points(points)
+
+    ObjectFactory.clear_objects()
+    models = {object_type: (model, value) for object_type, model, value in GENERATED_TYPES}
+
+    factory = None
+    for object_type, instance in points:
+        model, value = models[object_type]
+        factory = model(instance=instance, name=f"{object_type}_{instance}", description=f"{object_type} {instance}", presentValue=value)
+
+    # Every object made since clear_objects is added in one pass
+    if factory is not None:
+        factory.add_objects_to_application(device)
+
+    # Objects are held by the factory class.  Clear them so the next device starts empty
+    ObjectFactory.clear_objects()
+    return
+
+def make_mstp(device):
+    # Device limits of a typical MS/TP controller
+    device.this_application.localDevice.maxApduLengthAccepted = MSTP_MAX_APDU
+    device.this_application.localDevice.segmentationSupported = 'noSegmentation'
+    return
+
+def apply_network_conditions(device, latency_ms=0, jitter_ms=0, loss=0.0, trunk=None):
+    # Delays and drops requests to the device
+    # Requests to devices on the same trunk are answered one after the other, like a shared MS/TP bus
+    app = device.this_application
+    indication = app.indication
+
+    def delayed_indication(apdu):
+        if loss and random.random() < loss:
+            return
+
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+        if trunk is not None:
+            now = time.monotonic()
+            trunk_busy_until[trunk] = max(now, trunk_busy_until.get(trunk, now)) + delay
+            delay = trunk_busy_until[trunk] - now
+
+        if delay <= 0:
+            indication(apdu)
+        else:
+            FunctionTask(indication, apdu).install_task(delta=delay)
+
+    if latency_ms or jitter_ms or loss or trunk is not None:
+        app.indication = delayed_indication
+    return
+
+def load_simulator_spec(file_name):
+    # Reads a simulator spec file and expands it into one dict per device
+    #
+    # {
+    #   "first_ip": "127.0.1.1", "prefix_length": 8, "workers": 4,
+    #   "groups": [
+    #     {"count": 200, "first_instance": 100000, "points": 1000, "latency_ms": 5},
+    #     {"count": 64, "first_instance": 200000, "points": {"analogValue": 200, "binaryValue": 100},
+    #      "latency_ms": 30, "jitter_ms": 10, "loss": 0.02, "mstp": true, "trunk_size": 32}
+    #   ]
+    # }
+    with open(file_name, 'r') as f:
+        spec = json.load(f)
+
+    next_ip = ipaddress.IPv4Address(spec.get('first_ip', '127.0.1.1'))
+    prefix_length = spec.get('prefix_length', 8)
+    devices = []
+    trunk_count = 0
+
+    for group in spec['groups']:
+        mstp = group.get('mstp', False)
+        trunk_size = group.get('trunk_size', 32)
+
+        for i in range(group['count']):
+            # Each MS/TP trunk gets its own trunk number
+            trunk = None
+            if mstp:
+                if i % trunk_size == 0:
+                    trunk_count += 1
+                trunk = trunk_count
+
+            devices.append({
+                'instance': group['first_instance'] + i,
+                'ip': f'{next_ip}/{prefix_length}',
+                'points': group.get('points', 12),
+                'latency_ms': group.get('latency_ms', 0),
+                'jitter_ms': group.get('jitter_ms', 0),
+                'loss': group.get('loss', 0.0),
+                'mstp': mstp,
+                'trunk': trunk,
+            })
+            next_ip += 1
+
+    return devices, spec.get('workers', 1)
+
+def split_devices(devices, workers):
+    # Splits devices between workers.  A trunk stays in one worker so its devices share the bus timing
+    batches = [[] for i in range(max(1, workers))]
+    groups = {}
+    for device in devices:
+        key = ('trunk', device['trunk']) if device['trunk'] is not None else ('device', device['instance'])
+        groups.setdefault(key, []).append(device)
+
+    for i, group in enumerate(groups.values()):
+        batches[i % len(batches)].extend(group)
+
+    return [batch for batch in batches if batch]
+
+def run_devices(devices, ready=None, stop=None):
+    # Starts the devices from load_simulator_spec in this process
+    # Sets ready once all devices are up, then runs until stop is set
+    bacnet_devices = []
+    for spec in devices:
+        device = create_bacnet_device(spec['instance'], spec['ip'], 47808)
+        add_generated_points(device, points_from_spec(spec['points']))
+        if spec['mstp']:
+            make_mstp(device)
+        apply_network_conditions(device, spec['latency_ms'], spec['jitter_ms'], spec['loss'], spec['trunk'])
+        bacnet_devices.append(device)
+
+    if ready is not None:
+        ready.set()
+
+    try:
+        wait_for_stop(stop)
+    finally:
+        for device in bacnet_devices:
+            device.disconnect()
+    return
+
+def run_simulators(device_count, point_count, ip_prefix="127.0.0.", first_host=10, first_instance=100000, prefix_length=8, ready=None, stop=None):
+    # Starts device_count simulated devices at ip_prefix + first_host, ip_prefix + first_host + 1, ...
+    devices = [{
+        'instance': first_instance + i,
+        'ip': f'{ip_prefix}{first_host + i}/{prefix_length}',
+        'points': point_count,
+        'latency_ms': 0,
+        'jitter_ms': 0,
+        'loss': 0.0,
+        'mstp': False,
+        'trunk': None,
+    } for i in range(device_count)]
+
+    run_devices(devices, ready, stop)
+    return
+
+def run_farm(file_name):
+    # Runs the devices in a simulator spec file, split over a pool of worker processes
+    devices, workers = load_simulator_spec(file_name)
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+
+    processes = []
+    for batch in split_devices(devices, workers):
+        ready = context.Event()
+        process = context.Process(target=run_devices, args=(batch, ready, stop), daemon=True)
+        process.start()
+        processes.append((process, ready, len(batch)))
+
+    for process, ready, device_count in processes:
+        ready.wait()
+        print(f'Worker {process.pid}: {device_count} devices running')
+
+    print(f'{len(devices)} simulated devices running.  Ctrl+C to stop')
+
+    try:
+        wait_for_stop(None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for process, ready, device_count in processes:
+            process.join(10)
+    return
+
+def wait_for_stop(stop):
+    # Sleeps until stop is set.  Wakes once a second so Ctrl+C still works on Windows
+    if stop is None:
+        stop = threading.Event()
+
+    while not stop.wait(1):
+        pass
+    return
+
 def start_device(device):
     device.this_application
-    
-    while True:
-        time.sleep(0.01)
+
+    wait_for_stop(None)
     return
 
 def main():
+    # Simulator farm: python bacnet_device.py simulators.json
+    if len(sys.argv) > 1:
+        run_farm(sys.argv[1])
+        return
+
     # Create BACnet device
     dev100001 = create_bacnet_device(100001, "192.168.105.39/24", 47808)
 
@@ -0,0 +1,528 @@
+import BAC0
+import configparser
+import logging
+import threading
+import time
+import batch_read
+import device_cache
+import discovery
+import point_inventory
+import priority_array
+import write_pipeline
+from device_registry import DeviceRegistry
+
+
+### FUNCTIONS ###
+def bacnet_initialize():
+    """
+    Parameters: None
+    Takes in BACnet configuration parameters from settings.ini
+    Returns: BACnet device
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    """
+    # Takes in BACnet configuration parameters from settings.ini
+    # Creates and returns a BACnet device
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    ipAddress = config.get("bacnet", "ipAddress")
+    udpPort = config.get("bacnet", "udpPort")
+    bacnet = BAC0.lite(ip=ipAddress, port=udpPort)
+    return bacnet
+
+
+def build_device_manager(bacnet, DI_list):
+    """
+    Parameters: bacnet device, list of Device Instances
+    Checks the device cache first, then discovers missing devices.  See discovery.iter_device_manager
+    Return: DeviceRegistry with address information for each Device Instance
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): return DeviceRegistry instead of df
+    2026-10-17 (mikes): use device cache
+    2026-10-17 (mikes): use streaming discovery
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    """
+
+    device_manager = DeviceRegistry()
+    for device in discovery.iter_device_manager(bacnet, DI_list, device_manager):
+        pass
+
+    # Keep the DI_list order
+    device_manager = device_manager.filter(DI_list)
+
+    return device_manager
+
+
+def device_scan(bacnet, start_instance, end_instance):
+    """
+    Parameters: bacnet device, list of Device Instances
+    Conducts an adaptive scan for a set range of device instances.  Busy ranges are split and re-probed, see discovery.py
+    Return: DeviceRegistry with address information for each Device Instance
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): return DeviceRegistry instead of df
+    2026-10-17 (mikes): adaptive discovery
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    """
+
+    device_manager = discovery.adaptive_discover(bacnet, start_instance, end_instance)
+
+    return device_manager
+
+
+def serialize_priority_array(priority_array_value, object_type):
+    """
+    Parameters: priority_array object as read, object_type
+    Unpacks priority_array object.
+    Replaces binary text with active and inactive
+    Return: dict with priority array data
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    2026-10-17 (mikes): takes the array as read, slots decoded by priority_array.decode_priority_array
+    """
+
+    slots = priority_array.decode_priority_array(priority_array_value, object_type) or ()
+
+    return {str(i + 1): value for i, value in enumerate(slots)}
+
+
+def point_to_request(device_instance, object_type, object_instance, property):
+    """
+    Parameters: device instance, point information
+    Converts a point to the request tuple used by batch_read
+    Return: tuple (object_type, object_instance, property, array_index)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    # Read DDC file name
+    if object_type == "program":
+        return ("program", 0, property, None)
+
+    # Read from device
+    if object_type == "device":
+        return ("device", device_instance, property, None)
+
+    # Read point
+    return (object_type, object_instance, property, None)
+
+
+def point_requests(device_instance, points, array_index=True):
+    """
+    Parameters: device instance, list of point dicts, True if the device takes array index reads
+    Request for each point.  The priority array points of one object share one read of the whole array.
+    If only a few levels of the object are wanted (MAX_SLOT_READS) and the device takes array index reads, each level is read on its own
+    Return: list of request tuples, one per point.  batch_read sends each distinct request once
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    # Levels wanted per object
+    levels = {}
+    for point in points:
+        if point["property"] == "priorityArray":
+            levels.setdefault((point["object_type"], point["object_instance"]), set()).add(point["index"])
+
+    requests = []
+    for point in points:
+        request = point_to_request(device_instance, point["object_type"], point["object_instance"], point["property"])
+        if point["property"] == "priorityArray" and array_index:
+            level = priority_array.level(point["index"])
+            if level is not None and len(levels[(point["object_type"], point["object_instance"])]) <= priority_array.MAX_SLOT_READS:
+                request = request[:3] + (level,)
+        requests.append(request)
+
+    return requests
+
+
+def unpack_values(points, requests, values):
+    """
+    Parameters: list of point dicts, their requests from point_requests, values read for the requests
+    Picks the requested level out of priority arrays.  Each whole array is decoded once for all its levels
+    Return: list of BACnet values in the same order as points.  If error, value is "NR"
+
+    REV History:
+    2026-10-17 (mikes): initial, replaces unpack_point_value
+    """
+
+    arrays = {}
+    results = []
+    for point, request, value in zip(points, requests, values):
+        if point["property"] == "priorityArray" and not is_not_read(value):
+            # Level read with an array index
+            if request[3] is not None:
+                value = priority_array.decode_slot(value, point["object_type"])
+
+            # Whole array
+            else:
+                if request not in arrays:
+                    arrays[request] = priority_array.decode_priority_array(value, point["object_type"])
+                slots = arrays[request]
+                level = priority_array.level(point["index"])
+                value = slots[level - 1] if slots is not None and level is not None else "NR"
+
+        results.append(value)
+
+    return results
+
+
+def is_not_read(value):
+    return isinstance(value, str) and value == "NR"
+
+
+def log_read_errors(device_instance, points, values):
+    for point, value in zip(points, values):
+        if is_not_read(value):
+            logging.error(
+                f"read_point error.  device: {device_instance} object_type: {point['object_type']} object_instance: {point['object_instance']} property: {point['property']} index: {point['index']}"
+            )
+
+
+def failed_slot_reads(requests, values):
+    # Points whose level was read with an array index and failed.  Read again as whole arrays
+    return [i for i, (request, value) in enumerate(zip(requests, values)) if request[2] == "priorityArray" and request[3] is not None and is_not_read(value)]
+
+
+def plan_reads(device_instance, points):
+    """
+    Parameters: device instance, list of point dicts (object_type, object_instance, property, index)
+    The steps of a point read without the I/O, shared by read_points and point_read_write.read_points_async.
+    Generator: yields each list of request tuples to read and is sent back their values (batch_read.read_properties form).
+    Failed array index reads of priority slots are asked for again as whole arrays.  A device that answers those
+    is remembered (array_index capability) and gets whole arrays after that
+    Return (StopIteration value): list of BACnet values in the same order as points.  If error, value is "NR"
+
+    Example:
+    values = run_plan(plan_reads(1001, points), lambda requests: batch_read.read_properties(bacnet, address, 1001, requests))
+
+    REV History:
+    2026-10-17 (mikes): initial, from read_points
+    """
+
+    capabilities = batch_read.device_capabilities.get(device_instance, {})
+    requests = point_requests(device_instance, points, capabilities.get("array_index", True))
+    values = unpack_values(points, requests, (yield requests))
+
+    # Device may not take array index reads.  Read those objects as whole arrays
+    retry = failed_slot_reads(requests, values)
+    if retry:
+        retry_points = [points[i] for i in retry]
+        retry_requests = point_requests(device_instance, retry_points, array_index=False)
+        retry_values = unpack_values(retry_points, retry_requests, (yield retry_requests))
+        for i, value in zip(retry, retry_values):
+            values[i] = value
+
+        # Capabilities are read by the first read if they weren't known
+        capabilities = batch_read.device_capabilities.get(device_instance)
+        if capabilities and not all(is_not_read(value) for value in retry_values):
+            capabilities["array_index"] = False
+
+    log_read_errors(device_instance, points, values)
+
+    return values
+
+
+def run_plan(plan, read):
+    """
+    Parameters: plan_reads generator, read(requests) -> values
+    Runs the plan with blocking reads
+    Return: plan result
+    """
+
+    try:
+        requests = next(plan)
+        while True:
+            requests = plan.send(read(requests))
+    except StopIteration as done:
+        return done.value
+
+
+def read_points(bacnet, device_manager, device_instance, points, cov_manager=None):
+    """
+    Parameters: bacnet device, device_manager, device instance, list of point dicts (object_type, object_instance, property, index), CovManager (optional)
+    Reads all points for one device with batched ReadPropertyMultiple requests.  Subscribed present values come from the CovManager table.
+    Priority arrays are read at most once per object, or one level at a time with array index reads, see point_requests.
+    A device that fails the array index reads but answers the whole array is remembered and gets whole arrays after that
+    Return: list of BACnet values in the same order as points.  If error, value is "NR"
+
+    Example:
+    values = read_points(bacnet, device_manager, 1001, points_list)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): priority array levels with array index reads, each array decoded once
+    2026-10-17 (mikes): steps in plan_reads, shared with read_points_async
+    """
+
+    # Get bacnet address from device_manager
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        return ["NR" for point in points]
+
+    def read(requests):
+        if cov_manager is not None:
+            return cov_manager.read_properties(address, device_instance, requests)
+        return batch_read.read_properties(bacnet, address, device_instance, requests)
+
+    return run_plan(plan_reads(device_instance, points), read)
+
+
+def read_point(bacnet, device_manager, device_instance, object_type, object_instance, property, index=None):
+    """
+    Parameters: lots
+    Performs BACnet read
+    Return: BACnet value.  If error, returns "NR"
+
+    Example:
+    value = read_point(bacnet, device_manager, 1001, "binaryOutput", "0", "priorityArray", 14)
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): read through batched read_points
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    """
+
+    point = {"object_type": object_type, "object_instance": object_instance, "property": property, "index": index}
+
+    return read_points(bacnet, device_manager, device_instance, [point])[0]
+
+
+def write_point(bacnet, device_manager, device_instance, object_type, object_instance, property, value, index=None):
+    """
+    Parameters: lots
+    Performs BACnet write
+    Logs previous value prior to writing
+    Return: None
+
+    Example:
+    write_point(bacnet, device_manager, 1001, "binaryOutput", "20", "priorityArray", "inactive", 3)
+
+    REV History:
+    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): use write_pipeline.  Reads only the written priority slot
+    2026-10-17 (mikes): moved to bacnet_session, shared by the scripts
+    """
+
+    write_pipeline.write_points(bacnet, device_manager, device_instance, [(object_type, object_instance, property, value, index)])
+
+    return
+
+
+### CLASSES ###
+class BacnetSession:
+    """
+    One long lived BACnet connection shared by the tools.
+
+    - The BAC0 stack (the UDP socket) is made on first use and kept until close()
+    - device_manager holds every device found in the session, so later jobs skip discovery for them.
+      Entries older than deviceCacheTtl go through the device cache and confirm logic again, so a device that moved is found again
+    - Device capabilities stay in batch_read, object lists found in the session are kept in inventory
+    - metrics counts calls, items and seconds per operation
+
+    Example:
+    session = get_session()
+    device_manager = session.devices([1001, 1002])
+    value = session.read_point(1001, "analogValue", 1, "presentValue")
+    session.close()
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): session devices expire after deviceCacheTtl
+    """
+
+    def __init__(self, bacnet=None):
+        self.stack = bacnet
+        self.device_manager = DeviceRegistry()
+        self.added = {}
+        self.inventory = {}
+        self.metrics = {}
+        self.lock = threading.RLock()
+
+    ### Connection ###
+    @property
+    def bacnet(self):
+        # Stack is made on first use
+        with self.lock:
+            if self.stack is None:
+                start = time.perf_counter()
+                self.stack = bacnet_initialize()
+                self.record("connect", time.perf_counter() - start)
+            return self.stack
+
+    def connected(self):
+        return self.stack is not None
+
+    def close(self):
+        """Saves the devices found and closes the socket"""
+        with self.lock:
+            if self.stack is None:
+                return
+            device_cache.remember_devices(self.device_manager, seen=False)
+            try:
+                self.stack.disconnect()
+            except Exception as e:
+                logging.error(f"BacnetSession close error: {e}")
+            self.stack = None
+
+    ### Metrics ###
+    def record(self, name, seconds, items=1):
+        with self.lock:
+            metric = self.metrics.setdefault(name, {"calls": 0, "items": 0, "seconds": 0.0})
+            metric["calls"] += 1
+            metric["items"] += items
+            metric["seconds"] += seconds
+
+    def print_metrics(self):
+        for name, metric in sorted(self.metrics.items()):
+            print(f"{name}: {metric['calls']} calls, {metric['items']} items, {metric['seconds']:.2f} s")
+
+    ### Devices ###
+    def add_devices(self, devices):
+        # Session entries expire deviceCacheTtl after they were added
+        now = time.time()
+        with self.lock:
+            for device in devices:
+                self.device_manager.replace(device)
+                self.added[device.deviceInstance] = now
+
+    def iter_devices(self, DI_list):
+        """
+        Parameters: list of Device Instances
+        Devices known to the session for less than deviceCacheTtl come first.
+        The rest, new or expired, go through discovery.iter_device_manager (device cache, confirm, discovery)
+        Yield: DeviceRecord
+        """
+
+        start = time.perf_counter()
+        ttl = device_cache.get_cache_ttl()
+        now = time.time()
+        missing = []
+        for device_instance in DI_list:
+            device = self.device_manager.get(device_instance)
+            if device is not None and now - self.added.get(device_instance, 0) <= ttl:
+                yield device
+                continue
+
+            # Expired.  Not used until it is found again
+            if device is not None:
+                with self.lock:
+                    self.device_manager.remove(device_instance)
+            missing.append(device_instance)
+
+        if missing:
+            found = DeviceRegistry()
+            for device in discovery.iter_device_manager(self.bacnet, missing, found):
+                self.add_devices([device])
+                yield device
+
+        self.record("devices", time.perf_counter() - start, len(DI_list))
+
+    def devices(self, DI_list):
+        """Return: DeviceRegistry of DI_list, in DI_list order.  See iter_devices"""
+        for device in self.iter_devices(DI_list):
+            pass
+
+        return self.device_manager.filter(DI_list)
+
+    def scan(self, start_instance, end_instance):
+        """Adaptive scan of a range, see device_scan.  Found devices are added to the session.  Return: DeviceRegistry"""
+        start = time.perf_counter()
+        device_manager = device_scan(self.bacnet, start_instance, end_instance)
+        self.add_devices(device_manager)
+        self.record("scan", time.perf_counter() - start, len(device_manager))
+
+        return device_manager
+
+    def objects(self, DI_list):
+        """Point inventory of DI_list, see point_inventory.get_inventory.  Devices read before in the session are not read again"""
+        missing = [device_instance for device_instance in DI_list if device_instance not in self.inventory]
+        if missing:
+            start = time.perf_counter()
+            inventory = point_inventory.get_inventory(self.bacnet, self.devices(missing), missing)
+            with self.lock:
+                self.inventory.update(inventory)
+            self.record("objects", time.perf_counter() - start, len(missing))
+
+        return {device_instance: self.inventory[device_instance] for device_instance in DI_list if device_instance in self.inventory}
+
+    ### Points ###
+    def read_points(self, device_instance, points, cov_manager=None):
+        """See read_points"""
+        start = time.perf_counter()
+        values = read_points(self.bacnet, self.device_manager, device_instance, points, cov_manager)
+        self.record("read", time.perf_counter() - start, len(points))
+
+        return values
+
+    def read_point(self, device_instance, object_type, object_instance, property, index=None):
+        """See read_point"""
+        point = {"object_type": object_type, "object_instance": object_instance, "property": property, "index": index}
+
+        return self.read_points(device_instance, [point])[0]
+
+    def write_points(self, device_instance, writes, verify=None):
+        """See write_pipeline.write_points"""
+        start = time.perf_counter()
+        results = write_pipeline.write_points(self.bacnet, self.device_manager, device_instance, writes, verify)
+        self.record("write", time.perf_counter() - start, len(writes))
+
+        return results
+
+    def write_point(self, device_instance, object_type, object_instance, property, value, index=None):
+        """See write_point"""
+        self.write_points(device_instance, [(object_type, object_instance, property, value, index)])
+
+
+# One session per process, shared by everything that runs in it (e.g. the jobs of bacnetScanUtility)
+session = None
+session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Parameters: None
+    Return: the shared BacnetSession.  Made on first call, the stack on first use
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    global session
+    with session_lock:
+        if session is None:
+            session = BacnetSession()
+        return session
+
+
+def session_for(bacnet=None):
+    """
+    Parameters: bacnet device (None for the shared session)
+    Lets functions that take a bacnet device run in a session.  A stack that isn't the shared session's gets its own session,
+    kept on the stack (bacnet.bacnet_session) for the next call, so it goes away with the stack
+    Return: BacnetSession
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): one session per stack
+    2026-10-17 (mikes): session kept on the stack instead of by id(bacnet)
+    """
+
+    shared = get_session()
+    if bacnet is None or bacnet is shared.stack:
+        return shared
+
+    with session_lock:
+        stack_session = getattr(bacnet, "bacnet_session", None)
+        if stack_session is None:
+            stack_session = BacnetSession(bacnet)
+            bacnet.bacnet_session = stack_session
+        return stack_session
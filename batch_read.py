@@ -0,0 +1,273 @@
+from BAC0.core.io.IOExceptions import BufferOverflow, SegmentationNotSupported, UnrecognizedService
+import logging
+
+
+### SETTINGS ###
+# Estimated encoded size (bytes) of one property in a ReadPropertyMultiple-ACK.
+# Used to keep each response inside the device's max APDU.
+PROPERTY_RESPONSE_SIZE = {
+    "objectName": 72,
+    "description": 72,
+    "priorityArray": 100,
+    "stateText": 200,
+    "objectList": 400,
+    "modelName": 72,
+    "firmwareRevision": 40,
+    "applicationSoftwareVersion": 40,
+    "vendorName": 72,
+    "location": 72,
+}
+DEFAULT_PROPERTY_SIZE = 12
+OBJECT_OVERHEAD = 10
+APDU_HEADER = 8
+
+DEFAULT_MAX_APDU = 480
+MAX_RESPONSE_SEGMENTS = 8
+MAX_PROPERTIES_PER_REQUEST = 50
+
+
+# Capabilities per device instance: {"max_apdu": int, "segmentation": bool, "rpm": bool, "wpm": bool, "array_index": bool}
+device_capabilities = {}
+
+
+### FUNCTIONS ###
+def default_capabilities():
+    """Return: capabilities of a device before anything is known about it"""
+    return {"max_apdu": DEFAULT_MAX_APDU, "segmentation": False, "rpm": True, "wpm": True, "array_index": True}
+
+
+def capability_requests(device_instance):
+    """Return: request tuples for the device limits read by get_device_capabilities"""
+    return [("device", device_instance, "maxApduLengthAccepted", None), ("device", device_instance, "segmentationSupported", None)]
+
+
+def set_capabilities(capabilities, max_apdu, segmentation):
+    """
+    Parameters: capabilities dict, maxApduLengthAccepted and segmentationSupported as read ("NR" / None if not read)
+    Fills in max_apdu and segmentation.  Shared by get_device_capabilities and AsyncBacnetClient.get_device_capabilities
+    Return: capabilities
+    """
+
+    if isinstance(max_apdu, int) and max_apdu > 0:
+        capabilities["max_apdu"] = max_apdu
+
+    # Device must be able to transmit segments for us to receive a segmented response
+    capabilities["segmentation"] = segmentation in ("segmentedBoth", "segmentedTransmit")
+
+    return capabilities
+
+
+def read_single(bacnet, address, request):
+    """
+    Parameters: bacnet device, device address, request tuple (object_type, object_instance, property, array_index)
+    Performs a single ReadProperty
+    Return: BACnet value.  If error, returns "NR"
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    object_type, object_instance, property, array_index = request
+
+    try:
+        if array_index is None:
+            return bacnet.read(f"{address} {object_type} {object_instance} {property}")
+        return bacnet.read(f"{address} {object_type} {object_instance} {property} {array_index}")
+
+    except Exception as e:
+        logging.error(
+            f"read_single error.  error: {e} address: {address} object_type: {object_type} object_instance: {object_instance} property: {property} index: {array_index}"
+        )
+        return "NR"
+
+
+def get_device_capabilities(bacnet, address, device_instance):
+    """
+    Parameters: bacnet device, device address, device instance
+    Reads maxApduLengthAccepted and segmentationSupported once per device and caches them
+    Return: dict with max_apdu, segmentation, rpm, wpm, array_index.  wpm is set to False by write_pipeline when WritePropertyMultiple is rejected,
+    array_index by bacnet_session.read_points when array index reads fail but whole arrays can be read
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): defaults and decoding shared with the async client
+    """
+
+    if device_instance in device_capabilities:
+        return device_capabilities[device_instance]
+
+    capabilities = default_capabilities()
+    requests = capability_requests(device_instance)
+
+    try:
+        max_apdu, segmentation = bacnet.readMultiple(build_rpm_args(address, requests))
+    except UnrecognizedService:
+        capabilities["rpm"] = False
+        max_apdu, segmentation = [read_single(bacnet, address, request) for request in requests]
+    except Exception as e:
+        logging.error(f"get_device_capabilities error.  error: {e} device: {device_instance}")
+        max_apdu, segmentation = None, None
+
+    device_capabilities[device_instance] = set_capabilities(capabilities, max_apdu, segmentation)
+
+    return capabilities
+
+
+def estimate_response_size(request):
+    """
+    Parameters: request tuple (object_type, object_instance, property, array_index)
+    Return: estimated size in bytes of this property in a ReadPropertyMultiple-ACK
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    property = request[2]
+    array_index = request[3]
+
+    # A single array element is never larger than the whole property
+    if array_index is not None:
+        return DEFAULT_PROPERTY_SIZE
+
+    return PROPERTY_RESPONSE_SIZE.get(property, DEFAULT_PROPERTY_SIZE)
+
+
+def chunk_requests(requests, max_apdu, segmentation):
+    """
+    Parameters: list of request tuples, device max APDU, device segmentation support
+    Splits requests into groups whose estimated response fits the device limits
+    Return: list of lists of request tuples
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    budget = max_apdu * MAX_RESPONSE_SEGMENTS if segmentation else max_apdu
+    budget -= APDU_HEADER
+
+    chunks = []
+    chunk = []
+    size = 0
+    last_object = None
+
+    for request in requests:
+        request_size = estimate_response_size(request)
+        if request[:2] != last_object:
+            request_size += OBJECT_OVERHEAD
+
+        if chunk and (size + request_size > budget or len(chunk) >= MAX_PROPERTIES_PER_REQUEST):
+            chunks.append(chunk)
+            chunk = []
+            size = 0
+            request_size = estimate_response_size(request) + OBJECT_OVERHEAD
+
+        chunk.append(request)
+        size += request_size
+        last_object = request[:2]
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def build_rpm_args(address, chunk):
+    """
+    Parameters: device address, list of request tuples
+    Builds the BAC0 readMultiple string.  Consecutive properties of the same object share one access spec
+    Return: string
+
+    Example:
+    "192.168.1.10 analogValue 1 presentValue objectName binaryValue 2 presentValue"
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    args = [str(address)]
+    last_object = None
+
+    for object_type, object_instance, property, array_index in chunk:
+        if (object_type, object_instance) != last_object:
+            args.append(f"{object_type} {object_instance}")
+            last_object = (object_type, object_instance)
+
+        args.append(str(property))
+        if array_index is not None:
+            args.append(str(array_index))
+
+    return " ".join(args)
+
+
+def read_chunk(bacnet, address, device_instance, chunk, capabilities):
+    """
+    Parameters: bacnet device, device address, device instance, list of request tuples, device capabilities
+    Reads a chunk with ReadPropertyMultiple.  Splits the chunk if the response is too big,
+    falls back to single reads if the device rejects RPM
+    Return: list of values, "NR" for errors
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if len(chunk) == 1 or not capabilities["rpm"]:
+        return [read_single(bacnet, address, request) for request in chunk]
+
+    try:
+        values = bacnet.readMultiple(build_rpm_args(address, chunk))
+
+    except UnrecognizedService:
+        logging.info(f"Device {device_instance} does not support ReadPropertyMultiple.  Using single reads")
+        capabilities["rpm"] = False
+        return [read_single(bacnet, address, request) for request in chunk]
+
+    except (SegmentationNotSupported, BufferOverflow):
+        half = len(chunk) // 2
+        return read_chunk(bacnet, address, device_instance, chunk[:half], capabilities) + read_chunk(
+            bacnet, address, device_instance, chunk[half:], capabilities
+        )
+
+    except Exception as e:
+        logging.error(f"read_chunk error.  error: {e} device: {device_instance}.  Using single reads")
+        values = None
+
+    # Unexpected answer (abort, timeout, not an ack).  Read one at a time
+    if not isinstance(values, list) or len(values) != len(chunk):
+        return [read_single(bacnet, address, request) for request in chunk]
+
+    # Property access errors come back as None
+    return ["NR" if value is None else value for value in values]
+
+
+def read_properties(bacnet, address, device_instance, requests):
+    """
+    Parameters: bacnet device, device address, device instance, list of request tuples
+    Batched read engine.  Groups all requests for one device into ReadPropertyMultiple requests
+    that respect the device's max APDU and segmentation.  Duplicate requests are read once
+    Return: list of values in the same order as requests.  If error, value is "NR"
+
+    Example:
+    values = read_properties(bacnet, "192.168.1.10", 1001, [("analogValue", 1, "presentValue", None)])
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    unique_requests = list(dict.fromkeys(requests))
+
+    if not unique_requests:
+        return []
+
+    # Single read does not need to know the device limits
+    if len(unique_requests) == 1:
+        value = read_single(bacnet, address, unique_requests[0])
+        return [value for request in requests]
+
+    capabilities = get_device_capabilities(bacnet, address, device_instance)
+
+    results = {}
+    for chunk in chunk_requests(unique_requests, capabilities["max_apdu"], capabilities["segmentation"]):
+        values = read_chunk(bacnet, address, device_instance, chunk, capabilities)
+        results.update(zip(chunk, values))
+
+    return [results[request] for request in requests]
@@ -0,0 +1,433 @@
+# Benchmark for the read / write / scan functions, run against simulated devices from bacnet_device.py
+#
+# Example (loopback, 20 devices with 30 points each):
+# python benchmark.py --devices 20 --points 30 --output benchmark.json
+#
+# Each simulated device gets its own IP (ip_prefix + host number) so Who-Is broadcasts work.
+# Linux answers on all of 127.0.0.0/8.  On Windows / macOS add loopback aliases or use a virtual adapter with --ip-prefix
+
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+import openpyxl
+import bacnet_device
+
+
+### SETTINGS ###
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_FILE = "Point Read Write.xlsx"
+
+# Scripts whose import time is measured in a fresh interpreter
+STARTUP_MODULES = ["bacnet", "point_read_write", "objNameToDesc", "device_point_read"]
+
+# Written to every analogValue / binaryValue by execute_write
+WRITE_PRIORITY = 8
+WRITE_VALUES = {"analogValue": 55.5, "binaryValue": "active"}
+
+
+### SETUP ###
+def get_version():
+    """
+    Parameters: None
+    Return: git commit of the code being measured.  "" if not a git checkout
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def write_settings(work_dir, args, DI_list, points):
+    """
+    Parameters: benchmark folder, command line args, list of Device Instances, generated points
+    Writes settings.ini for the benchmark network
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    av_instances = [instance for object_type, instance in points if object_type == "analogValue"]
+    bv_instances = [instance for object_type, instance in points if object_type == "binaryValue"]
+
+    lines = [
+        "[bacnet]",
+        f"ipAddress = {args.ip_prefix}{args.client_host}/{args.prefix_length}",
+        "udpPort = 47808",
+        f"deviceRanges = {DI_list[0]}-{DI_list[-1]}",
+        "scanTimeout = 1",
+        f"avRange = {';'.join(str(instance) for instance in av_instances)}",
+        f"bvRange = {';'.join(str(instance) for instance in bv_instances)}",
+        f"maxConcurrentRequests = {args.max_concurrent}",
+        "maxRequestsPerNetwork = 2",
+        "deviceCacheTtl = 24",
+        "discoverySplit = 50",
+        f"whoisWait = {args.whois_wait}",
+    ]
+
+    with open(os.path.join(work_dir, "settings.ini"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def write_template(work_dir, DI_list, points):
+    """
+    Parameters: benchmark folder, list of Device Instances, generated points
+    Writes a Point Read Write.xlsx with every point on the read sheet,
+    and the analogValue / binaryValue points at priority WRITE_PRIORITY on the write sheet
+    Return: number of points on the write sheet
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    wb = openpyxl.Workbook()
+    read_sheet = wb.active
+    read_sheet.title = "read"
+    write_sheet = wb.create_sheet("write")
+
+    write_points = [(object_type, instance) for object_type, instance in points if object_type in WRITE_VALUES]
+
+    for sheet, header, sheet_points, property in (
+        (read_sheet, "READ", points, "presentValue"),
+        (write_sheet, "WRITE", write_points, "priorityArray"),
+    ):
+        sheet.append([header] + [f"{object_type}{instance}" for object_type, instance in sheet_points])
+        sheet.append(["object_type"] + [object_type for object_type, instance in sheet_points])
+        sheet.append(["object_instance"] + [instance for object_type, instance in sheet_points])
+        sheet.append(["object_property"] + [property for object_type, instance in sheet_points])
+        sheet.append(["index"] + [WRITE_PRIORITY if sheet is write_sheet else None for point in sheet_points])
+
+        for device_instance in DI_list:
+            if sheet is write_sheet:
+                sheet.append([device_instance] + [WRITE_VALUES[object_type] for object_type, instance in sheet_points])
+            else:
+                sheet.append([device_instance])
+
+    wb.save(os.path.join(work_dir, TEMPLATE_FILE))
+
+    return len(write_points) * len(DI_list)
+
+
+def start_simulators(args):
+    """
+    Parameters: command line args
+    Runs bacnet_device.run_simulators in its own process so the simulators don't share the client's BACnet stack
+    Return: (process, stop event)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    stop = context.Event()
+
+    process = context.Process(
+        target=bacnet_device.run_simulators,
+        args=(args.devices, args.points, args.ip_prefix, args.first_host, args.first_instance, args.prefix_length, ready, stop),
+        daemon=True,
+    )
+    process.start()
+
+    if not ready.wait(60 + args.devices):
+        process.terminate()
+        raise RuntimeError("Simulated devices did not start")
+
+    return process, stop
+
+
+### MEASUREMENT ###
+class RequestTimer:
+    """
+    Wraps the bacnet device request methods and keeps the time of every request.  Thread safe
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    METHODS = ("read", "readMultiple", "write", "writeMultiple", "whois")
+
+    def __init__(self, bacnet):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+        for name in self.METHODS:
+            if hasattr(bacnet, name):
+                setattr(bacnet, name, self._wrap(getattr(bacnet, name)))
+
+    def _wrap(self, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - start)
+
+        return timed
+
+    def take(self):
+        with self._lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+def run_case(name, function, point_count, timer, repeat, memory, before=None):
+    """
+    Parameters:
+    - name: case name
+    - function: called with no arguments, once per repeat
+    - point_count: points handled by one call.  Used for points/sec
+    - timer: RequestTimer on the client bacnet device
+    - repeat: number of runs
+    - memory: True to measure peak python memory with tracemalloc
+    - before: called before each run, not timed
+
+    Return: dict with results for the case
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    print(f"Benchmark {name}...")
+
+    seconds = []
+    latencies = []
+    peak_memory = 0
+
+    for run in range(repeat):
+        if before is not None:
+            before()
+
+        timer.take()
+        if memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+        latencies += timer.take()
+        if memory:
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+
+    median_seconds = float(np.median(seconds))
+
+    result = {
+        "seconds": [round(s, 4) for s in seconds],
+        "median_seconds": round(median_seconds, 4),
+        "points": point_count,
+        "points_per_sec": round(point_count / median_seconds, 2) if median_seconds > 0 else None,
+        "requests": len(latencies) // repeat,
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3) if latencies else None,
+        "peak_memory_kb": round(peak_memory / 1024, 1) if memory else None,
+    }
+
+    print(f"  {result['median_seconds']} s, {result['points_per_sec']} points/s, p50 {result['latency_p50_ms']} ms, p99 {result['latency_p99_ms']} ms")
+
+    return result
+
+
+def measure_startup(repeat):
+    """
+    Parameters: runs per measurement
+    Startup time, each run in a fresh interpreter so nothing is already imported:
+    - import time of each script in STARTUP_MODULES
+    - time until the bacnetScanUtility window shows (bacnetScanUtility.py --startup-time).  None if there is no display
+
+    Return: dict name -> median seconds
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    print("Benchmark startup...")
+
+    def median_run(command, pattern):
+        seconds = []
+        for run in range(repeat):
+            try:
+                output = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True, timeout=120).stdout
+                seconds.append(float(output.split(pattern)[-1].split()[0]))
+            except Exception:
+                return None
+        return round(float(np.median(seconds)), 4)
+
+    results = {}
+    for module in STARTUP_MODULES:
+        code = f"import time; start = time.perf_counter(); import {module}; print('Imported in', time.perf_counter() - start)"
+        results[f"import_{module}"] = median_run([sys.executable, "-c", code], "Imported in")
+    results["window"] = median_run([sys.executable, "bacnetScanUtility.py", "--startup-time"], "Window shown in")
+
+    for name, seconds in results.items():
+        print(f"  {name}: {seconds} s")
+
+    return results
+
+
+def run_benchmark(args):
+    """
+    Parameters: command line args
+    Starts the simulated devices, runs every case from a scratch folder and collects the results
+    Return: dict with the benchmark report
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    DI_list = [args.first_instance + i for i in range(args.devices)]
+    points = bacnet_device.generated_points(args.points)
+
+    work_dir = tempfile.mkdtemp(prefix="bacnet_benchmark_")
+    write_settings(work_dir, args, DI_list, points)
+    write_point_count = write_template(work_dir, DI_list, points)
+
+    process, stop = start_simulators(args)
+    original_dir = os.getcwd()
+
+    try:
+        # The scripts read settings.ini / the template and write logs in the current folder
+        os.chdir(work_dir)
+        sys.path.insert(0, REPO_DIR)
+        import bacnet as bacnet_scan
+        import bacnet_session
+        import batch_read
+        import objNameToDesc
+        import point_read_write
+
+        bacnet = bacnet_session.bacnet_initialize()
+        timer = RequestTimer(bacnet)
+
+        if args.memory:
+            tracemalloc.start()
+
+        def clear_cache():
+            # Cold start: no device cache, nothing learned about the devices
+            if os.path.exists("device_cache.json"):
+                os.remove("device_cache.json")
+            batch_read.device_capabilities.clear()
+
+        def warm_cache():
+            bacnet_session.build_device_manager(bacnet, DI_list)
+
+        av_count = len([point for point in points if point[0] == "analogValue"])
+        bv_count = len([point for point in points if point[0] == "binaryValue"])
+        ai_count = len([point for point in points if point[0] == "analogInput"])
+        ao_count = len([point for point in points if point[0] == "analogOutput"])
+        bi_count = len([point for point in points if point[0] == "binaryInput"])
+        bo_count = len([point for point in points if point[0] == "binaryOutput"])
+
+        def range_string(count):
+            return f"0-{count - 1}" if count else ""
+
+        cases = {
+            "device_scan": (
+                lambda: bacnet_session.device_scan(bacnet, DI_list[0], DI_list[-1]),
+                args.devices,
+                clear_cache,
+            ),
+            "build_device_manager_cold": (lambda: bacnet_session.build_device_manager(bacnet, DI_list), args.devices, clear_cache),
+            "build_device_manager_warm": (lambda: bacnet_session.build_device_manager(bacnet, DI_list), args.devices, warm_cache),
+            "execute_read": (lambda: point_read_write.execute_read(bacnet), args.devices * args.points, warm_cache),
+            "execute_write": (lambda: point_read_write.execute_write(bacnet), write_point_count, warm_cache),
+            "readAv": (lambda: bacnet_scan.readAv(bacnet), args.devices * av_count, warm_cache),
+            "objName_to_description": (
+                lambda: objNameToDesc.objName_to_description(
+                    bacnet,
+                    f"{DI_list[0]}-{DI_list[-1]}",
+                    range_string(av_count),
+                    range_string(bv_count),
+                    "",
+                    range_string(ai_count),
+                    range_string(bi_count),
+                    "",
+                    range_string(ao_count),
+                    range_string(bo_count),
+                    "",
+                ),
+                args.devices * args.points,
+                warm_cache,
+            ),
+        }
+
+        selected = args.cases or list(cases.keys())
+        results = {}
+        for name in selected:
+            function, point_count, before = cases[name]
+            results[name] = run_case(name, function, point_count, timer, args.repeat, args.memory, before)
+
+        if args.memory:
+            tracemalloc.stop()
+
+        bacnet.disconnect()
+
+    finally:
+        os.chdir(original_dir)
+        stop.set()
+        process.join(10)
+        if process.is_alive():
+            process.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "version": get_version(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "devices": args.devices,
+        "points_per_device": args.points,
+        "repeat": args.repeat,
+        "max_concurrent": args.max_concurrent,
+        "cases": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BACnet read / write / scan against simulated devices")
+    parser.add_argument("--devices", type=int, default=10, help="number of simulated devices")
+    parser.add_argument("--points", type=int, default=12, help="points per simulated device")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case")
+    parser.add_argument("--cases", nargs="*", help="cases to run (default all)")
+    parser.add_argument("--ip-prefix", default="127.0.0.", help="first three octets of the device IPs")
+    parser.add_argument("--prefix-length", type=int, default=8, help="subnet prefix length of the device IPs")
+    parser.add_argument("--client-host", type=int, default=2, help="host number of the benchmark client")
+    parser.add_argument("--first-host", type=int, default=10, help="host number of the first simulated device")
+    parser.add_argument("--first-instance", type=int, default=100000, help="device instance of the first simulated device")
+    parser.add_argument("--max-concurrent", type=int, default=16, help="maxConcurrentRequests for the run")
+    parser.add_argument("--whois-wait", type=float, default=0.5, help="whoisWait for the run")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc (it slows the run)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report file")
+    args = parser.parse_args()
+
+    if args.first_host + args.devices > 255:
+        parser.error("Too many devices for one /24 of host numbers.  Lower --first-host or --devices")
+
+    startup = measure_startup(args.repeat)
+    report = run_benchmark(args)
+    report["startup"] = startup
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
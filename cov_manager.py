@@ -0,0 +1,385 @@
+from bacpypes.apdu import SubscribeCOVRequest
+from bacpypes.core import deferred
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+from BAC0.core.io.Read import find_reason
+import configparser
+import logging
+import threading
+import time
+import batch_read
+import device_cache
+import job_template
+import poller
+import read_scheduler
+import result_sink
+
+
+### SETTINGS ###
+# Subscriptions sent to one device before waiting for answers.  Keeps us well inside the 255 invoke IDs
+MAX_PENDING_PER_DEVICE = 32
+
+# Renew subscriptions when this much of the lifetime has passed
+RENEW_AT = 0.8
+
+# Seconds stop() waits for the devices to answer the subscription cancels
+STOP_TIMEOUT = 5
+
+# Errors that mean the device doesn't do COV at all.  Every point of the device is polled
+DEVICE_UNSUPPORTED = ("unrecognizedService", "serviceRequestDenied", "optionalFunctionalityNotSupported")
+
+# Columns of the snapshot file
+SNAPSHOT_SCHEMA = [
+    ("deviceInstance", "int"),
+    ("object_type", "string"),
+    ("object_instance", "int"),
+    ("value", "string"),
+    ("age", "float"),
+    ("source", "string"),
+]
+
+
+### FUNCTIONS ###
+def get_cov_settings():
+    """
+    Parameters: None
+    Takes in COV settings from settings.ini
+    Return: dict with lifetime (seconds), poll_interval (seconds, for devices without COV), snapshot_interval (seconds)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    return {
+        "lifetime": config.getint("bacnet", "covLifetime", fallback=300),
+        "poll_interval": config.getfloat("bacnet", "covPollInterval", fallback=60),
+        "snapshot_interval": config.getfloat("bacnet", "covSnapshotInterval", fallback=60),
+    }
+
+
+### CLASSES ###
+class CovManager:
+    """
+    Keeps an always fresh table of present values.
+
+    - Every point gets a SubscribeCOV with a lifetime.  Subscriptions are renewed before the lifetime runs out
+    - COV notifications update the value table
+    - Devices that reject COV, and points whose subscription fails, are polled with batched reads instead
+    - read_properties / snapshot answer from the table without going to the network.  read_properties only uses values updated
+      within lifetime + poll_interval.  Older values (device offline, subscription lapsed) are read live
+
+    Example:
+    cov = CovManager(bacnet, device_manager)
+    cov.start(poller.build_poll_points(device_manager))
+    values = cov.read_properties(address, 1001, requests)
+    cov.stop()
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): table values expire, stop waits for the cancels
+    """
+
+    def __init__(self, bacnet, device_manager, lifetime=None, poll_interval=None):
+        settings = get_cov_settings()
+        self.bacnet = bacnet
+        self.device_manager = device_manager
+        self.lifetime = lifetime or settings["lifetime"]
+        self.poll_interval = poll_interval or settings["poll_interval"]
+
+        # (device instance, object type, object instance) -> value / time.monotonic() of last update / "cov" or "poll"
+        self.values = {}
+        self.updated = {}
+        self.source = {}
+
+        # key -> BAC0 subscription context
+        self.subscriptions = {}
+        self.polled = set()
+        self.unsupported_devices = set()
+
+        self.addresses = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    ### Value table ###
+    def set_value(self, key, value, source):
+        with self.lock:
+            self.values[key] = value
+            self.updated[key] = time.monotonic()
+            self.source[key] = source
+
+    def fresh_value(self, key, now):
+        # Value from the table.  None if not there or not updated within lifetime + poll_interval
+        with self.lock:
+            if now - self.updated.get(key, now) > self.lifetime + self.poll_interval:
+                return None
+            return self.values.get(key)
+
+    def read_properties(self, address, device_instance, requests):
+        """
+        Parameters: device address, device instance, list of request tuples (same as batch_read.read_properties)
+        Fresh present values in the table are answered from the table.  Everything else is read with batch_read
+        Return: list of values in the same order as requests.  If error, value is "NR"
+        """
+
+        now = time.monotonic()
+        values = [None for request in requests]
+        missing = []
+        for i, (object_type, object_instance, property, array_index) in enumerate(requests):
+            if property == "presentValue" and array_index is None:
+                values[i] = self.fresh_value((device_instance, object_type, object_instance), now)
+            if values[i] is None:
+                missing.append(i)
+
+        if missing:
+            read_values = batch_read.read_properties(self.bacnet, address, device_instance, [requests[i] for i in missing])
+            for i, value in zip(missing, read_values):
+                values[i] = value
+
+        return values
+
+    def snapshot(self):
+        """Return: list of [device instance, object type, object instance, value, age in seconds, source]"""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                [key[0], key[1], key[2], value, round(now - self.updated[key], 1), self.source[key]]
+                for key, value in sorted(self.values.items(), key=lambda x: (x[0][0], x[0][1], x[0][2]))
+            ]
+
+    def export_snapshot(self, name="cov_snapshot"):
+        """Writes the value table with result_sink.  Return: file name"""
+        sink = result_sink.open_sink(name, SNAPSHOT_SCHEMA)
+        sink.write_rows(self.snapshot())
+        return sink.close()
+
+    ### Notifications ###
+    def on_notification(self, elements):
+        # Called from the bacpypes thread
+        device_instance = self.addresses.get(str(elements["source"]))
+        value = elements["properties"].get("presentValue")
+        if device_instance is None or value is None:
+            return
+
+        object_type, object_instance = elements["object_changed"]
+        self.set_value((device_instance, str(object_type), int(object_instance)), value, "cov")
+
+    ### Subscriptions ###
+    def send_subscription(self, context, cancel=False):
+        """Sends SubscribeCOV for context.  Return: IOCB"""
+        request = SubscribeCOVRequest(
+            subscriberProcessIdentifier=context.subscriberProcessIdentifier,
+            monitoredObjectIdentifier=context.monitoredObjectIdentifier,
+        )
+        request.pduDestination = context.address
+
+        # No confirmed / lifetime cancels the subscription
+        if not cancel:
+            request.issueConfirmedNotifications = False
+            request.lifetime = self.lifetime
+
+        iocb = IOCB(request)
+        deferred(self.bacnet.this_application.request_io, iocb)
+        return iocb
+
+    def forget_context(self, context):
+        """Removes context from the BAC0 subscription contexts, so the map doesn't grow with every dropped subscription"""
+        self.bacnet.subscription_contexts.pop(context.subscriberProcessIdentifier, None)
+
+    def drop_subscription(self, key):
+        """Stops using COV for key.  The point is polled instead.  Call with self.lock held"""
+        context = self.subscriptions.pop(key, None)
+        if context is not None:
+            self.forget_context(context)
+        self.polled.add(key)
+
+    def subscribe_device(self, device_instance, keys, renew=False):
+        """Subscribes (or renews) every key of one device.  Failed points are polled instead"""
+        address = self.device_manager.get_address(device_instance)
+        if address is None:
+            return
+
+        self.addresses[str(Address(address))] = device_instance
+        pending = threading.BoundedSemaphore(MAX_PENDING_PER_DEVICE)
+        done = threading.Event()
+        remaining = [len(keys)]
+
+        def on_answer(iocb, key):
+            if iocb.ioError:
+                reason = find_reason(iocb.ioError)
+                logging.info(f"COV subscription failed.  reason: {reason} point: {key}")
+                if reason in DEVICE_UNSUPPORTED:
+                    self.unsupported_devices.add(device_instance)
+                with self.lock:
+                    self.drop_subscription(key)
+
+            pending.release()
+            with self.lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    done.set()
+
+        for key in keys:
+            # Device said no to COV.  Don't send the rest
+            if device_instance in self.unsupported_devices:
+                with self.lock:
+                    self.drop_subscription(key)
+                    remaining[0] -= 1
+                continue
+
+            context = self.subscriptions.get(key)
+            if context is None:
+                if renew:
+                    with self.lock:
+                        remaining[0] -= 1
+                    continue
+                context = self.bacnet._build_cov_context(
+                    Address(address), (key[1], key[2]), confirmed=False, lifetime=self.lifetime, callback=self.on_notification
+                )
+                self.subscriptions[key] = context
+
+            pending.acquire()
+            iocb = self.send_subscription(context)
+            iocb.add_callback(on_answer, key)
+
+        with self.lock:
+            if remaining[0] <= 0:
+                done.set()
+        done.wait(self.lifetime)
+
+    def start(self, points):
+        """
+        Parameters: list of (device instance, object type, object instance, ...).  See poller.build_poll_points and template_points
+        Reads every point once, subscribes to all of them and starts the renewal / polling thread
+        """
+        keys_by_device = {}
+        for point in points:
+            key = (point[0], point[1], int(point[2]))
+            keys_by_device.setdefault(point[0], {})[key] = True
+        keys_by_device = {device_instance: list(keys) for device_instance, keys in keys_by_device.items()}
+
+        # Seed the table with one batched read per device
+        self.poll(keys_by_device)
+
+        print(f"Subscribing to COV for {sum(len(keys) for keys in keys_by_device.values())} points...")
+        read_scheduler.run_per_device(
+            self.device_manager, list(keys_by_device.keys()), lambda device_instance: self.subscribe_device(device_instance, keys_by_device[device_instance])
+        )
+
+        print(f"COV: {len(self.subscriptions)} subscribed, {len(self.polled)} polled, {len(self.unsupported_devices)} devices without COV")
+
+        self.keys_by_device = keys_by_device
+        self.thread = threading.Thread(target=self.maintain, name="cov_manager", daemon=True)
+        self.thread.start()
+
+    def poll(self, keys_by_device):
+        """Reads keys with one batched request per device and puts the values in the table"""
+
+        def read_device(device_instance):
+            keys = keys_by_device[device_instance]
+            address = self.device_manager.get_address(device_instance)
+            requests = [(object_type, object_instance, "presentValue", None) for device, object_type, object_instance in keys]
+            values = batch_read.read_properties(self.bacnet, address, device_instance, requests)
+            for key, value in zip(keys, values):
+                # Points that can't be read stay out of the table, so read_properties reads them live
+                if not (isinstance(value, str) and value == "NR"):
+                    self.set_value(key, value, "poll")
+
+        if keys_by_device:
+            read_scheduler.run_per_device(self.device_manager, list(keys_by_device.keys()), read_device)
+
+    def maintain(self):
+        """Renews subscriptions before they run out and polls the points without COV"""
+        renew_time = time.monotonic() + self.lifetime * RENEW_AT
+        poll_time = time.monotonic() + self.poll_interval
+
+        while not self.stop_event.wait(max(0, min(renew_time, poll_time) - time.monotonic())):
+            now = time.monotonic()
+
+            if now >= renew_time:
+                for device_instance, keys in self.keys_by_device.items():
+                    self.subscribe_device(device_instance, [key for key in keys if key in self.subscriptions], renew=True)
+                renew_time = now + self.lifetime * RENEW_AT
+
+            if now >= poll_time:
+                polled = {}
+                with self.lock:
+                    for key in self.polled:
+                        polled.setdefault(key[0], []).append(key)
+                self.poll(polled)
+                poll_time = now + self.poll_interval
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stops renewing and cancels every subscription.  Waits up to timeout seconds for the cancels to be answered, so they go out before a disconnect"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+
+        iocbs = []
+        for context in list(self.subscriptions.values()):
+            try:
+                iocbs.append(self.send_subscription(context, cancel=True))
+            except Exception as e:
+                logging.error(f"CovManager stop error: {e}")
+            self.forget_context(context)
+        self.subscriptions = {}
+
+        deadline = time.monotonic() + timeout
+        for iocb in iocbs:
+            if not iocb.wait(max(0, deadline - time.monotonic())):
+                logging.error(f"CovManager stop error: {len([iocb for iocb in iocbs if not iocb.ioComplete.is_set()])} cancels not answered")
+                break
+
+
+def template_points(spec):
+    """
+    Parameters: JobSpec (template.read)
+    Return: list of (device instance, object type, object instance) for the present value points of the sheet
+    """
+
+    points = []
+    for point in spec.points_list:
+        if point["property"] != "presentValue" or point["object_type"] in ("device", "program"):
+            continue
+        try:
+            object_instance = int(point["object_instance"])
+        except (TypeError, ValueError):
+            continue
+        points += [(device_instance, point["object_type"], object_instance) for device_instance in spec.DI_list]
+
+    return points
+
+
+def main():
+    import bacnet as bacnet_scan
+
+    bacnet = bacnet_scan.bacnetInitialize()
+    device_manager = device_cache.load_device_registry()
+    settings = get_cov_settings()
+
+    # Points from the settings.ini ranges, and the present values of the template read sheet
+    points = [point[:3] for point in poller.build_poll_points(device_manager)]
+    template = job_template.load_template()
+    if template is not None:
+        points += [point for point in template_points(template.read) if point[0] in device_manager]
+
+    cov = CovManager(bacnet, device_manager, settings["lifetime"], settings["poll_interval"])
+    cov.start(points)
+
+    print("Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(settings["snapshot_interval"])
+            print(f"Snapshot written to {cov.export_snapshot()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cov.stop()
+        bacnet.disconnect()
+
+
+if __name__ == "__main__":
+    main()
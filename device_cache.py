@@ -0,0 +1,274 @@
+import configparser
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import batch_read
+from device_registry import DeviceRecord, DeviceRegistry, parse_address
+
+
+### SETTINGS ###
+CACHE_FILE = "device_cache.json"
+
+# Load, update and save of the cache file by the threads of one process (scans, jobs, session close) one at a time
+_lock = threading.Lock()
+
+
+### FUNCTIONS ###
+def get_cache_ttl():
+    """
+    Parameters: None
+    Takes in deviceCacheTtl (hours) from settings.ini
+    Return: cache time to live in seconds
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    ttl_hours = config.getfloat("bacnet", "deviceCacheTtl", fallback=24)
+
+    return ttl_hours * 3600
+
+
+def load_device_cache(file_name=CACHE_FILE):
+    """
+    Parameters: cache file name
+    Return: dict device_instance -> cache entry.  Empty dict if there is no cache yet
+
+    Cache entry:
+    {"address": "2000:15", "IP": "", "Network": "2000", "MAC": "15", "last_seen": 1700000000.0, "max_apdu": 480, "segmentation": False}
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if not os.path.exists(file_name):
+        return {}
+
+    try:
+        with open(file_name, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        logging.error(f"load_device_cache error: {e}")
+        return {}
+
+    # json keys are strings
+    return {int(device_instance): entry for device_instance, entry in data.items()}
+
+
+def save_device_cache(cache, file_name=CACHE_FILE):
+    """
+    Parameters: dict device_instance -> cache entry, cache file name
+    Writes the cache.  Writes to a temp file with a unique name first so a crash or another writer can't leave a half written cache
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): unique temp file
+    """
+
+    temp_file = None
+
+    try:
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(file_name)), prefix=os.path.basename(file_name), suffix=".tmp", delete=False) as f:
+            temp_file = f.name
+            json.dump({str(device_instance): entry for device_instance, entry in sorted(cache.items())}, f, indent=1)
+        os.replace(temp_file, file_name)
+    except Exception as e:
+        logging.error(f"save_device_cache error: {e}")
+        if temp_file is not None and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def update_device_cache(cache, device_manager, seen=True):
+    """
+    Parameters: dict device_instance -> cache entry, DeviceRegistry, seen (True if the devices just answered)
+    Adds / refreshes entries for every device in device_manager.  Keeps the max APDU / segmentation learned by batch_read
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    now = time.time()
+
+    for device in device_manager:
+        device_instance = int(device.deviceInstance)
+        entry = cache.get(device_instance, {})
+
+        # Device moved.  Old capabilities may not be valid anymore
+        if entry.get("address") != device.address:
+            entry = {"max_apdu": None, "segmentation": None}
+
+        entry["address"] = device.address
+        entry["IP"] = device.ipAddress
+        entry["Network"] = device.net
+        entry["MAC"] = device.mac
+        if seen or "last_seen" not in entry:
+            entry["last_seen"] = now
+
+        capabilities = batch_read.device_capabilities.get(device_instance)
+        if capabilities is not None:
+            entry["max_apdu"] = capabilities["max_apdu"]
+            entry["segmentation"] = capabilities["segmentation"]
+            entry["wpm"] = capabilities.get("wpm", True)
+            entry["array_index"] = capabilities.get("array_index", True)
+
+        cache[device_instance] = entry
+
+
+def seed_capabilities(cache, device_instance):
+    """
+    Parameters: dict device_instance -> cache entry, device instance
+    Gives batch_read the cached max APDU / segmentation so it doesn't have to read them again
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    entry = cache.get(int(device_instance), {})
+    if entry.get("max_apdu") and device_instance not in batch_read.device_capabilities:
+        capabilities = batch_read.default_capabilities()
+        capabilities.update(max_apdu=entry["max_apdu"], segmentation=bool(entry.get("segmentation")), wpm=entry.get("wpm", True), array_index=entry.get("array_index", True))
+        batch_read.device_capabilities[device_instance] = capabilities
+
+
+def record_from_entry(device_instance, entry):
+    return DeviceRecord(entry["address"], device_instance, entry.get("IP", ""), entry.get("Network", ""), entry.get("MAC", ""))
+
+
+def registry_from_cache(cache, DI_list=None, ttl=None):
+    """
+    Parameters: dict device_instance -> cache entry, list of Device Instances (None for all), ttl in seconds (None for no limit)
+    Splits the requested devices into fresh cache hits, stale entries and devices not in the cache
+    Return: (DeviceRegistry of fresh devices, list of stale device instances, list of missing device instances)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if DI_list is None:
+        DI_list = sorted(cache.keys())
+
+    now = time.time()
+    device_manager = DeviceRegistry()
+    stale = []
+    missing = []
+
+    for device_instance in DI_list:
+        entry = cache.get(int(device_instance))
+        if entry is None:
+            missing.append(device_instance)
+        elif ttl is not None and now - entry.get("last_seen", 0) > ttl:
+            stale.append(device_instance)
+        else:
+            device_manager.add(record_from_entry(device_instance, entry))
+            seed_capabilities(cache, device_instance)
+
+    return device_manager, stale, missing
+
+
+def confirm_devices(bacnet, cache, DI_list, wait=1.0):
+    """
+    Parameters: bacnet device, dict device_instance -> cache entry, list of stale device instances, seconds to wait for I-Am
+    Sends a Who-Is for each device straight to its cached address instead of a broadcast
+    Return: DeviceRegistry of devices that answered.  I-Am heard before the Who-Is don't count
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): only I-Am that arrive after the Who-Is
+    """
+
+    device_manager = DeviceRegistry()
+    if not DI_list:
+        return device_manager
+
+    # The counter keeps every I-Am the stack has heard.  Only counts that go up answered this Who-Is
+    i_am_counter = bacnet.this_application.i_am_counter
+    before = dict(i_am_counter)
+
+    for device_instance in DI_list:
+        address = cache[int(device_instance)]["address"]
+        print(f"Confirming device {device_instance} at {address}")
+        try:
+            bacnet.whois(f"{address} {int(device_instance)} {int(device_instance)}")
+        except Exception as e:
+            logging.error(f"confirm_devices error.  error: {e} device: {device_instance}")
+
+    time.sleep(wait)
+
+    # I-Am may come back from a new address
+    answered = {int(key[1]): key[0] for key, count in list(i_am_counter.items()) if count > before.get(key, 0)}
+
+    for device_instance in DI_list:
+        address = answered.get(int(device_instance))
+        if address is None:
+            continue
+
+        if address == cache[int(device_instance)]["address"]:
+            device_manager.add(record_from_entry(device_instance, cache[int(device_instance)]))
+            seed_capabilities(cache, device_instance)
+        else:
+            device_manager.add(parse_address(address, device_instance))
+
+    return device_manager
+
+
+def remember_devices(device_manager, seen=True, file_name=CACHE_FILE):
+    """
+    Parameters: DeviceRegistry, seen (True if the devices just answered), cache file name
+    Loads the cache, adds the devices and capabilities and saves it again.  One thread at a time, so updates aren't lost
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): lock
+    """
+
+    with _lock:
+        cache = load_device_cache(file_name)
+        update_device_cache(cache, device_manager, seen)
+        save_device_cache(cache, file_name)
+
+
+def load_device_registry(file_name=CACHE_FILE):
+    """
+    Parameters: cache file name
+    Return: DeviceRegistry of every cached device, sorted by device instance
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    cache = load_device_cache(file_name)
+    device_manager, stale, missing = registry_from_cache(cache)
+
+    return device_manager
+
+
+def load_live_registry(bacnet, file_name=CACHE_FILE):
+    """
+    Parameters: bacnet device, cache file name
+    Cached devices seen within deviceCacheTtl, plus stale devices that answer a Who-Is to their cached address.
+    Devices that don't answer are left out, so offline devices aren't read on every run
+    Return: DeviceRegistry sorted by device instance
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    cache = load_device_cache(file_name)
+    device_manager, stale, missing = registry_from_cache(cache, None, get_cache_ttl())
+
+    # Confirm stale cache entries
+    found = confirm_devices(bacnet, cache, stale)
+    device_manager.update(found)
+    if len(found):
+        remember_devices(found, file_name=file_name)
+
+    return device_manager.sorted()
@@ -0,0 +1,125 @@
+import re
+import pandas as pd
+
+
+### CLASSES ###
+class DeviceRecord:
+    __slots__ = ("address", "deviceInstance", "ipAddress", "net", "mac")
+
+    def __init__(self, address, device_instance, ip_address, net, mac):
+        self.address = address
+        self.deviceInstance = device_instance
+        self.ipAddress = ip_address
+        self.net = net
+        self.mac = mac
+
+    def __repr__(self):
+        return f"DeviceRecord(deviceInstance={self.deviceInstance}, ipAddress={self.ipAddress}, net={self.net}, mac={self.mac})"
+
+
+class DeviceRegistry:
+    """
+    Device instance -> DeviceRecord, hashed so address lookups are O(1)
+    Replaces the device_manager DataFrame.  Use to_dataframe() when exporting
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    def __init__(self, records=()):
+        self._devices = {}
+        for record in records:
+            self.add(record)
+
+    def __contains__(self, device_instance):
+        return device_instance in self._devices
+
+    def __iter__(self):
+        return iter(self._devices.values())
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __repr__(self):
+        return f"DeviceRegistry({len(self)} devices)"
+
+    def add(self, record):
+        """Adds record.  Keeps the first record found for a device instance.  Returns True if new"""
+        if record.deviceInstance in self._devices:
+            return False
+        self._devices[record.deviceInstance] = record
+        return True
+
+    def replace(self, record):
+        """Adds record, replacing the record of the device instance if there is one (e.g. the device moved)"""
+        self._devices[record.deviceInstance] = record
+
+    def remove(self, device_instance):
+        self._devices.pop(device_instance, None)
+
+    def get(self, device_instance):
+        return self._devices.get(device_instance)
+
+    def get_address(self, device_instance):
+        record = self._devices.get(device_instance)
+        return record.address if record is not None else None
+
+    def get_network(self, device_instance):
+        """Returns the BACnet network of the device.  "" for devices on the local IP network"""
+        record = self._devices.get(device_instance)
+        return record.net if record is not None else ""
+
+    def instances(self):
+        return list(self._devices.keys())
+
+    def update(self, other):
+        for record in other:
+            self.add(record)
+
+    def filter(self, DI_list):
+        """Returns a new registry with only the devices in DI_list"""
+        return DeviceRegistry(self._devices[device_instance] for device_instance in DI_list if device_instance in self._devices)
+
+    def sorted(self):
+        return DeviceRegistry(sorted(self._devices.values(), key=lambda x: x.deviceInstance))
+
+    def to_dataframe(self):
+        data = {
+            "address": [device.address for device in self],
+            "deviceInstance": [device.deviceInstance for device in self],
+            "IP": [device.ipAddress for device in self],
+            "Network": [device.net for device in self],
+            "MAC": [device.mac for device in self],
+        }
+
+        return pd.DataFrame(data)
+
+
+### FUNCTIONS ###
+def parse_address(address, device_instance):
+    """
+    Parameters: BACnet address string as found by Who-Is, device instance
+    Splits the address into IP or network / MAC
+    Return: DeviceRecord
+
+    Example:
+    parse_address("192.168.1.10", 1001)
+    parse_address("2000:15", 2015)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    ipAddress = ""
+    net = ""
+    mac = ""
+
+    if re.match(r"^(\d{1,3}\.){3}\d{1,3}$", address):
+        ipAddress = address
+    else:
+        address_parts = address.split(":")
+        if len(address_parts) == 2:
+            net = address_parts[0]
+            mac = address_parts[1]
+
+    return DeviceRecord(address, device_instance, ipAddress, net, mac)
@@ -0,0 +1,269 @@
+import configparser
+import logging
+import threading
+import time
+import device_cache
+from device_registry import DeviceRegistry, parse_address
+
+
+# Seconds between checks for new I-Am while a Who-Is is running
+POLL_INTERVAL = 0.05
+
+# Remote networks learned from routers, per bacnet device
+known_networks = {}
+
+
+### FUNCTIONS ###
+def get_discovery_settings():
+    """
+    Parameters: None
+    Takes in discovery settings from settings.ini
+    Return: dict with scan_timeout, split_threshold, whois_wait, max_passes
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    return {
+        "scan_timeout": config.getint("bacnet", "scanTimeout", fallback=1),
+        "split_threshold": config.getint("bacnet", "discoverySplit", fallback=50),
+        "whois_wait": config.getfloat("bacnet", "whoisWait", fallback=1),
+        "max_passes": config.getint("bacnet", "discoveryMaxPasses", fallback=4),
+    }
+
+
+def get_networks(bacnet):
+    """
+    Parameters: bacnet device
+    Asks local routers which remote networks they can reach.  Only asks once per bacnet device
+    Return: list of network numbers
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if id(bacnet) in known_networks:
+        return known_networks[id(bacnet)]
+
+    try:
+        bacnet.what_is_network_number()
+        bacnet.whois_router_to_network()
+        networks = sorted(bacnet.known_network_numbers)
+    except Exception as e:
+        logging.error(f"get_networks error: {e}")
+        networks = []
+
+    known_networks[id(bacnet)] = networks
+
+    return networks
+
+
+def iter_probe(bacnet, start_instance, end_instance, networks, whois_wait, seen, responders):
+    """
+    Parameters:
+    - bacnet device, range of device instances, list of remote networks, seconds to wait for I-Am
+    - seen: set of device instances already found.  Updated as devices are yielded
+    - responders: list.  Filled with every (address, device instance) that answered this Who-Is
+
+    Sends one Who-Is for the range on the local network and on each remote network.
+    Yields each new device as its I-Am arrives instead of waiting for the Who-Is to finish.
+    I-Am heard before this Who-Is don't count
+    Yield: (address, device instance)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): only I-Am that arrive after the Who-Is
+    """
+
+    i_am_counter = bacnet.this_application.i_am_counter
+    before = dict(i_am_counter)
+    sent = threading.Event()
+
+    def send_whois():
+        try:
+            bacnet.whois(f"{start_instance} {end_instance}")
+            for network in networks:
+                bacnet.whois(f"{network}:* {start_instance} {end_instance}")
+        except Exception as e:
+            logging.error(f"iter_probe error: {e}")
+        finally:
+            sent.set()
+
+    threading.Thread(target=send_whois, daemon=True).start()
+
+    deadline = None
+    while True:
+        finished = sent.wait(POLL_INTERVAL)
+
+        # Only I-Am counted since this Who-Is.  The counter keeps every I-Am the stack has heard
+        for key, count in list(i_am_counter.items()):
+            address, device_instance = key
+            if start_instance <= device_instance <= end_instance and device_instance not in seen and count > before.get(key, 0):
+                seen.add(device_instance)
+                yield key
+
+        # Late I-Am from MS/TP devices
+        if finished:
+            if deadline is None:
+                deadline = time.monotonic() + whois_wait
+            if time.monotonic() >= deadline:
+                break
+
+    for key, count in list(i_am_counter.items()):
+        if start_instance <= key[1] <= end_instance and count > before.get(key, 0):
+            responders.append(key)
+
+
+def iter_discover_range(bacnet, start_instance, end_instance, networks, settings, seen, wanted=None):
+    """
+    Parameters: bacnet device, range of device instances, list of remote networks, discovery settings, set of device instances already found,
+    set of device instances being looked for (None for every device in the range)
+    Adaptive discovery for one range.
+    - If a Who-Is gets more answers than split_threshold, the I-Am storm may have dropped answers.
+      The range is split in two and each half is discovered on its own
+    - Otherwise the range is probed again until scan_timeout passes in a row find nothing new, like the original scan.
+      A lost Who-Is or I-Am is picked up by the next pass.  Stops early once every wanted device in the range is found
+    Yield: (address, device instance) for each new device
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): generator, yields devices as they are found
+    2026-10-17 (mikes): quiet passes up to scan_timeout while wanted devices are missing, small answers only skip the split
+    """
+
+    quiet_passes = 0
+    passes = 0
+
+    while passes < settings["max_passes"]:
+        print(f"Scan for devices {start_instance} to {end_instance}, Pass # {passes + 1}")
+
+        responders = []
+        new_devices = 0
+        for key in iter_probe(bacnet, start_instance, end_instance, networks, settings["whois_wait"], seen, responders):
+            print("** Found device " + str(key[1]))
+            new_devices += 1
+            yield key
+        passes += 1
+
+        # Too many answers for one Who-Is.  Split the range
+        if len(responders) >= settings["split_threshold"] and end_instance > start_instance:
+            middle = (start_instance + end_instance) // 2
+            yield from iter_discover_range(bacnet, start_instance, middle, networks, settings, seen, wanted)
+            yield from iter_discover_range(bacnet, middle + 1, end_instance, networks, settings, seen, wanted)
+            return
+
+        # Everything looked for is found
+        if wanted is not None and all(device_instance in seen for device_instance in wanted if start_instance <= device_instance <= end_instance):
+            return
+
+        if new_devices == 0:
+            quiet_passes += 1
+            if quiet_passes >= settings["scan_timeout"]:
+                return
+        else:
+            quiet_passes = 0
+
+
+def iter_discover(bacnet, start_instance, end_instance, seen=None, wanted=None):
+    """
+    Parameters: bacnet device, range of device instances, set of device instances to skip (updated as devices are found),
+    set of device instances being looked for (None for every device in the range)
+    Streaming adaptive discovery.  Busy ranges are split so each Who-Is only gets a small number of I-Am,
+    other ranges stop after scanTimeout passes without a new device, or once every wanted device is found.
+    Devices are yielded as soon as their I-Am arrives
+    Yield: DeviceRecord
+
+    Example:
+    for device in iter_discover(bacnet, 0, 4194303):
+        print(device.deviceInstance)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): wanted
+    """
+
+    settings = get_discovery_settings()
+    networks = get_networks(bacnet)
+    if seen is None:
+        seen = set()
+
+    start = time.perf_counter()
+    found = 0
+    for address, device_instance in iter_discover_range(bacnet, start_instance, end_instance, networks, settings, seen, wanted):
+        found += 1
+        yield parse_address(address, device_instance)
+
+    logging.info(f"iter_discover {start_instance}-{end_instance}: {found} devices in {time.perf_counter() - start:.1f} s")
+
+
+def adaptive_discover(bacnet, start_instance, end_instance):
+    """
+    Parameters: bacnet device, range of device instances
+    Runs iter_discover to the end
+    Return: DeviceRegistry sorted by device instance
+
+    Example:
+    device_manager = adaptive_discover(bacnet, 0, 4194303)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    device_manager = DeviceRegistry(iter_discover(bacnet, start_instance, end_instance))
+
+    return device_manager.sorted()
+
+
+def iter_device_manager(bacnet, DI_list, device_manager):
+    """
+    Parameters: bacnet device, list of Device Instances, DeviceRegistry to fill
+    Streaming version of build_device_manager.  Each device is added to device_manager and yielded as soon as it is known:
+    fresh cache entries first, then stale entries confirmed with a Who-Is to the cached address,
+    then devices found by discovery.  Saves the device cache at the end
+    Yield: DeviceRecord
+
+    Example:
+    device_manager = DeviceRegistry()
+    for device in iter_device_manager(bacnet, DI_list, device_manager):
+        start_reading(device)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    cache = device_cache.load_device_cache()
+    fresh, stale, missing = device_cache.registry_from_cache(cache, DI_list, device_cache.get_cache_ttl())
+
+    for device in fresh:
+        if device_manager.add(device):
+            yield device
+
+    # Confirm stale cache entries
+    found = device_cache.confirm_devices(bacnet, cache, stale)
+    for device in found:
+        if device_manager.add(device):
+            yield device
+
+    missing += [device for device in stale if device not in found]
+    wanted = set(missing)
+
+    if missing:
+        # Scan for entire range of missing devices, then for each device still missing
+        ranges = [(min(missing), max(missing))] + [(device, device) for device in missing]
+
+        for start_instance, end_instance in ranges:
+            if start_instance == end_instance:
+                if start_instance in device_manager:
+                    continue
+                print(f"Scanning for missing device {start_instance}")
+
+            for device in iter_discover(bacnet, start_instance, end_instance, wanted=wanted - set(device_manager.instances())):
+                if device.deviceInstance in wanted and device_manager.add(device):
+                    found.add(device)
+                    yield device
+
+    # Save addresses for next time
+    device_cache.remember_devices(found)
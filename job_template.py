@@ -0,0 +1,188 @@
+import logging
+import openpyxl
+
+
+### SETTINGS ###
+TEMPLATE_FILE = "Point Read Write.xlsx"
+
+# Rows under the header that describe each point.  Label is in column A
+POINT_ROWS = {
+    "object_type": "object_type",
+    "object_instance": "object_instance",
+    "object_property": "property",
+    "index": "index",
+}
+
+# Device instances are read from column A starting at this row
+FIRST_DEVICE_ROW = 4
+
+
+### CLASSES ###
+class JobSpec:
+    """
+    Everything a read or write job needs from one sheet of the template
+
+    - sheet_name: "read" or "write"
+    - DI_list: device instances in sheet order
+    - points_list: list of point dicts (col_index, object_type, object_instance, property, index, col_letter, col)
+    - rows: device instance -> Excel row
+    - values: device instance -> list of cell values, in points_list order.  Used for the values to write
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    __slots__ = ("sheet_name", "DI_list", "points_list", "rows", "values")
+
+    def __init__(self, sheet_name, DI_list, points_list, rows, values):
+        self.sheet_name = sheet_name
+        self.DI_list = DI_list
+        self.points_list = points_list
+        self.rows = rows
+        self.values = values
+
+    def __repr__(self):
+        return f"JobSpec(sheet_name={self.sheet_name}, devices={len(self.DI_list)}, points={len(self.points_list)})"
+
+
+class JobTemplate:
+    """
+    "Point Read Write.xlsx" loaded once.  Holds the read and write job specs, and the workbook for writing results back.
+    The specs are parsed from values_wb (loaded with data_only=True) when the sheets have formulas, so formula cells give their value.
+    wb keeps the formulas and is the one saved
+
+    Example:
+    template = load_template()
+    for device_instance in template.read.DI_list: ...
+    template.write_results(template.read, results)
+    template.save()
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): specs parsed from values_wb
+    """
+
+    def __init__(self, file_name, wb, values_wb=None):
+        if values_wb is None:
+            values_wb = wb
+        self.file_name = file_name
+        self.wb = wb
+        self.read = parse_sheet(values_wb["read"], "read")
+        self.write = parse_sheet(values_wb["write"], "write")
+
+    def write_results(self, spec, results):
+        """Writes results (device instance -> list of values in points_list order) to the sheet of spec"""
+        sheet = self.wb[spec.sheet_name]
+
+        for device_instance, values in results.items():
+            row = spec.rows.get(device_instance)
+            if row is None:
+                logging.error(f"write_results error: device {device_instance} not found in sheet {spec.sheet_name}")
+                continue
+
+            for point, value in zip(spec.points_list, values):
+                sheet.cell(row=row, column=point["col"], value=value)
+
+    def save(self):
+        try:
+            self.wb.save(self.file_name)
+            logging.info("JobTemplate save successful")
+        except Exception as e:
+            logging.error(f"JobTemplate save error: {e}")
+
+
+### FUNCTIONS ###
+def is_device_instance(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def has_formulas(sheet):
+    """True if any cell of the sheet holds a formula"""
+    return any(isinstance(value, str) and value.startswith("=") for row in sheet.iter_rows(values_only=True) for value in row)
+
+
+def parse_sheet(sheet, sheet_name):
+    """
+    Parameters: openpyxl sheet, sheet name
+    Reads the header, the point description rows and the device rows in one pass over the sheet
+    Return: JobSpec
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    rows = list(sheet.iter_rows(min_row=1, max_row=sheet.max_row, values_only=True))
+    if not rows:
+        return JobSpec(sheet_name, [], [], {}, {})
+
+    header = rows[0]
+
+    # Point description rows, found by their label in column A
+    point_rows = {}
+    for row in rows[1:]:
+        if row and row[0] in POINT_ROWS:
+            point_rows.setdefault(POINT_ROWS[row[0]], row)
+
+    points_list = []
+    for col in range(1, len(header)):
+        # Skip empty columns
+        if header[col] is None:
+            continue
+
+        point = {"col_index": header[col]}
+        for key in POINT_ROWS.values():
+            row = point_rows.get(key)
+            point[key] = row[col] if row is not None and col < len(row) else None
+        point["col_letter"] = openpyxl.utils.get_column_letter(col + 1)
+        point["col"] = col + 1
+
+        points_list.append(point)
+
+    # Device rows
+    DI_list = []
+    device_rows = {}
+    values = {}
+    for excel_row, row in enumerate(rows[FIRST_DEVICE_ROW - 1 :], start=FIRST_DEVICE_ROW):
+        device_instance = row[0] if row else None
+        if not is_device_instance(device_instance):
+            continue
+
+        DI_list.append(device_instance)
+
+        # First row wins for a device listed twice
+        if device_instance not in device_rows:
+            device_rows[device_instance] = excel_row
+            values[device_instance] = [row[point["col"] - 1] if point["col"] - 1 < len(row) else None for point in points_list]
+
+    return JobSpec(sheet_name, DI_list, points_list, device_rows, values)
+
+
+def load_template(file_name=TEMPLATE_FILE):
+    """
+    Parameters: template file name
+    Loads the template workbook once and parses the read and write sheets from it.  If those sheets have formulas,
+    a data_only copy is loaded too so formula cells give their cached value, like pandas did.  The workbook with formulas is kept for save()
+    Return: JobTemplate.  None if the file can't be read
+
+    Example:
+    template = load_template()
+    DI_list = template.write.DI_list
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): parse from a data_only load
+    2026-10-17 (mikes): data_only load only for sheets with formulas
+    """
+
+    try:
+        wb = openpyxl.load_workbook(file_name)
+
+        values_wb = None
+        if has_formulas(wb["read"]) or has_formulas(wb["write"]):
+            values_wb = openpyxl.load_workbook(file_name, data_only=True)
+
+        return JobTemplate(file_name, wb, values_wb)
+
+    except Exception as e:
+        logging.error(f"Error reading Excel file: {e}")
+        return None
@@ -0,0 +1,180 @@
+import configparser
+import logging
+import threading
+import warnings
+import numpy as np
+from ranges import range_to_list
+
+
+### SETTINGS ###
+# Scales the MAD to the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+# Scales the mean absolute deviation, used when more than half the values are the same (MAD is 0)
+MEAN_AD_SCALE = 1.2533
+
+
+### FUNCTIONS ###
+def get_outlier_settings():
+    """
+    Parameters: None
+    Takes in outlier settings from settings.ini
+    Return: dict with method ("std" or "mad"), warn and alarm thresholds (deviations from the center), groups string
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    method = config.get("bacnet", "outlierMethod", fallback="std").strip().lower()
+    if method not in ("std", "mad"):
+        logging.error(f"get_outlier_settings error: unknown outlierMethod {method}.  Using std")
+        method = "std"
+
+    return {
+        "method": method,
+        "warn": config.getfloat("bacnet", "outlierWarn", fallback=1),
+        "alarm": config.getfloat("bacnet", "outlierAlarm", fallback=2),
+        "groups": config.get("bacnet", "outlierGroups", fallback=""),
+    }
+
+
+def build_groups(instances, groups_string=""):
+    """
+    Parameters: object instances of the columns, groups string ('15-20 | 30;31')
+    Instances in one group share their statistics.  Groups are split by |.  Columns not in a group get their own
+    Return: int array, group number of each column
+    """
+
+    group_of = {}
+    for group, range_string in enumerate(groups_string.split("|")):
+        for instance in range_to_list(range_string):
+            group_of.setdefault(instance, group)
+
+    # Number the groups in column order
+    numbers = {}
+    groups = np.empty(len(instances), dtype=np.int64)
+    for col, instance in enumerate(instances):
+        key = ("group", group_of[instance]) if instance in group_of else ("column", col)
+        groups[col] = numbers.setdefault(key, len(numbers))
+
+    return groups
+
+
+### CLASSES ###
+class OutlierStats:
+    """
+    Running statistics of a sweep, updated as each device row comes in.
+
+    - Mean and variance are kept per group with Welford / Chan updates, so rows are never stored
+    - mask(values) gives the outlier level of every cell as one int8 array: 0 normal, 1 warn, 2 alarm
+    - With outlierMethod mad, the center and spread are the median and MAD of the final values instead
+
+    Example:
+    stats = OutlierStats()
+    stats.start([15, 16, 17])
+    stats.update(row_values)
+    mask = stats.mask(values)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or get_outlier_settings()
+        self.groups = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0)
+        self.mean = np.empty(0)
+        self.m2 = np.empty(0)
+        self.lock = threading.Lock()
+
+    def start(self, instances):
+        """Sets the columns.  Clears the statistics"""
+        self.groups = build_groups(instances, self.settings["groups"])
+        group_count = int(self.groups.max()) + 1 if len(self.groups) else 0
+        self.count = np.zeros(group_count)
+        self.mean = np.zeros(group_count)
+        self.m2 = np.zeros(group_count)
+
+    def update(self, rows):
+        """Adds one row, or a block of rows, of column values.  NaN is skipped"""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        valid = ~np.isnan(rows)
+        group_index = np.broadcast_to(self.groups, rows.shape)[valid]
+        x = rows[valid]
+        if not len(x):
+            return
+
+        # Statistics of the new rows per group
+        size = len(self.count)
+        batch_count = np.bincount(group_index, minlength=size).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            batch_mean = np.bincount(group_index, weights=x, minlength=size) / batch_count
+        batch_mean[batch_count == 0] = 0
+        batch_m2 = np.bincount(group_index, weights=(x - batch_mean[group_index]) ** 2, minlength=size)
+
+        # Merge with the running statistics
+        with self.lock:
+            count = self.count + batch_count
+            delta = batch_mean - self.mean
+            with np.errstate(invalid="ignore", divide="ignore"):
+                ratio = np.where(count > 0, batch_count / count, 0)
+            self.mean = self.mean + delta * ratio
+            self.m2 = self.m2 + batch_m2 + delta**2 * self.count * ratio
+            self.count = count
+
+    def std(self):
+        """Return: population standard deviation per group (same as np.nanstd).  NaN for empty groups"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / self.count)
+
+    def center_spread(self, values):
+        """Return: (center, spread) per column"""
+        if self.settings["method"] == "std":
+            with self.lock:
+                mean = np.where(self.count > 0, self.mean, np.nan)
+                return mean[self.groups], self.std()[self.groups]
+
+        # Median / MAD need every value of the group
+        center = np.full(len(self.groups), np.nan)
+        spread = np.full(len(self.groups), np.nan)
+        # All NaN columns warn "All-NaN slice"
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            if len(np.unique(self.groups)) == len(self.groups):
+                center = np.nanmedian(values, axis=0)
+                deviation = np.abs(values - center)
+                spread = MAD_SCALE * np.nanmedian(deviation, axis=0)
+                spread = np.where(spread > 0, spread, MEAN_AD_SCALE * np.nanmean(deviation, axis=0))
+            else:
+                for group in np.unique(self.groups):
+                    cols = self.groups == group
+                    group_values = values[:, cols]
+                    median = np.nanmedian(group_values)
+                    deviation = np.abs(group_values - median)
+                    mad = MAD_SCALE * np.nanmedian(deviation)
+                    center[cols] = median
+                    spread[cols] = mad if mad > 0 else MEAN_AD_SCALE * np.nanmean(deviation)
+
+        return center, spread
+
+    def mask(self, values):
+        """
+        Parameters: devices x columns float array (NaN for missing values)
+        Return: int8 array of the same shape.  0 normal, 1 more than outlierWarn away from the center, 2 more than outlierAlarm
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return np.zeros(values.shape, dtype=np.int8)
+
+        center, spread = self.center_spread(values)
+
+        # A column with no spread has no outliers
+        with np.errstate(invalid="ignore", divide="ignore"):
+            score = np.abs(values - center) / np.where(spread > 0, spread, np.nan)
+        score = np.nan_to_num(score, nan=0.0)
+
+        return (score > self.settings["warn"]).astype(np.int8) + (score > self.settings["alarm"]).astype(np.int8)
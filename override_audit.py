@@ -0,0 +1,171 @@
+import configparser
+import logging
+import batch_read
+import bacnet_session
+import device_cache
+import priority_array
+import read_scheduler
+import result_sink
+from ranges import range_to_list
+
+
+### SETTINGS ###
+# Always commandable
+OUTPUT_TYPES = ("analogOutput", "binaryOutput", "multiStateOutput")
+
+# Commandable if the object has a priorityArray.  Objects without one are skipped
+VALUE_TYPES = ("analogValue", "binaryValue", "multiStateValue")
+
+# Read for every commandable object
+AUDIT_PROPERTIES = ("objectName", "presentValue", "priorityArray", "relinquishDefault")
+
+# Columns of the override_audit file
+AUDIT_SCHEMA = [
+    ("deviceInstance", "int"),
+    ("object_type", "string"),
+    ("object_instance", "int"),
+    ("objectName", "string"),
+    ("priority", "int"),
+    ("value", "string"),
+    ("presentValue", "string"),
+    ("relinquishDefault", "string"),
+]
+
+
+### FUNCTIONS ###
+def get_audit_levels():
+    """
+    Parameters: None
+    Takes in auditLevels from settings.ini
+    Return: set of priority levels to report
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    return set(range_to_list(config.get("bacnet", "auditLevels", fallback="1-16") or "1-16"))
+
+
+def audit_device(bacnet, device_manager, device_instance, objects, levels):
+    """
+    Parameters: bacnet device, device_manager, device instance, list of (object_type, object_instance), priority levels to report
+    Reads AUDIT_PROPERTIES of every commandable object of one device in one batched read
+    Return: (list of AUDIT_SCHEMA rows, one per non-null slot, number of commandable objects)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        return [], 0
+
+    objects = [item for item in objects if item[0] in OUTPUT_TYPES + VALUE_TYPES]
+    requests = [(object_type, object_instance, property, None) for object_type, object_instance in objects for property in AUDIT_PROPERTIES]
+    values = batch_read.read_properties(bacnet, address, device_instance, requests)
+
+    rows = []
+    commandable = 0
+    for i, (object_type, object_instance) in enumerate(objects):
+        name, present_value, array, relinquish_default = values[i * len(AUDIT_PROPERTIES) : (i + 1) * len(AUDIT_PROPERTIES)]
+
+        # Same active / inactive / null text as serialize_priority_array
+        slots = priority_array.decode_priority_array(array, object_type)
+        if slots is None:
+            if object_type in OUTPUT_TYPES:
+                logging.error(f"audit_device error.  priorityArray not read.  device: {device_instance} object_type: {object_type} object_instance: {object_instance}")
+            continue
+        commandable += 1
+
+        for level, value in enumerate(slots, start=1):
+            if value != "null" and level in levels:
+                rows.append([device_instance, object_type, object_instance, name, level, value, present_value, relinquish_default])
+
+    return rows, commandable
+
+
+def audit_overrides(bacnet, DI_list=None, progress=None, cancel=None):
+    """
+    Parameters: bacnet device, list of Device Instances (None for every device in device_cache.json),
+    progress(devicesDone, deviceCount, overridesFound) called as each device finishes, cancel threading.Event (devices not started are skipped)
+
+    Override audit.  For every device:
+    1. Commandable objects come from the device objectList (point inventory, see point_inventory.py)
+    2. objectName, presentValue, priorityArray and relinquishDefault of all of them are read in batched requests
+    3. Every non-null slot in auditLevels is written to override_audit, one row per slot
+    Devices run in parallel, limited per network
+
+    Return: list of AUDIT_SCHEMA rows
+
+    Example:
+    rows = audit_overrides(bacnet, [1001, 1002])
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    session = bacnet_session.session_for(bacnet)
+    levels = get_audit_levels()
+
+    if DI_list is None:
+        DI_list = device_cache.load_device_registry().instances()
+    device_manager = session.devices(DI_list)
+    DI_list = [device_instance for device_instance in dict.fromkeys(DI_list) if device_instance in device_manager]
+
+    print(f"Override audit of {len(DI_list)} devices...")
+    inventory = session.objects(DI_list)
+    for device_instance in DI_list:
+        if device_instance not in inventory:
+            print(f"Object list of {device_instance} not read.  Skipping")
+
+    sink = result_sink.open_sink("override_audit", AUDIT_SCHEMA, sort_by="deviceInstance")
+    done = []
+    found = []
+    counts = {}
+
+    def run_device(device_instance):
+        if cancel is not None and cancel.is_set():
+            return None
+
+        try:
+            rows, commandable = audit_device(session.bacnet, device_manager, device_instance, sorted(inventory.get(device_instance, ())), levels)
+        except Exception as e:
+            logging.error(f"audit_overrides error.  error: {e} device: {device_instance}")
+            return None
+
+        sink.write_rows(rows)
+        with session.lock:
+            done.append(device_instance)
+            found.extend(rows)
+            counts[device_instance] = commandable
+            if progress is not None:
+                progress(len(done), len(DI_list), len(found))
+
+        return rows
+
+    read_scheduler.run_per_device(device_manager, [device_instance for device_instance in DI_list if device_instance in inventory], run_device)
+    result_sink.finish_sink(sink)
+
+    # Overrides per level
+    per_level = {}
+    for row in found:
+        per_level[row[4]] = per_level.get(row[4], 0) + 1
+    print(f"{len(found)} overrides in {sum(counts.values())} commandable objects of {len(done)} devices")
+    for level, count in sorted(per_level.items()):
+        print(f"  priority {level}: {count}")
+
+    return found
+
+
+def main():
+    session = bacnet_session.get_session()
+    audit_overrides(session.bacnet)
+    session.print_metrics()
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import configparser
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import batch_read
+import read_scheduler
+
+
+### SETTINGS ###
+INVENTORY_FILE = "point_inventory.json"
+
+# Columns of the device_objects file written by device_point_read.scan_device_objects
+INVENTORY_SCHEMA = [
+    ("deviceInstance", "int"),
+    ("object_type", "string"),
+    ("object_instance", "int"),
+]
+
+# One inventory file per process, shared by the threads reading devices
+_lock = threading.Lock()
+
+# Load, merge and save of the inventory file by the jobs of one process one at a time
+_file_lock = threading.Lock()
+
+
+### FUNCTIONS ###
+def use_inventory():
+    """
+    Parameters: None
+    Takes in pointInventory from settings.ini
+    Return: True if sweeps should only read objects in the device inventory.  Default False:
+    checking the inventory costs a databaseRevision read per device on every sweep
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): default off
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    return config.getboolean("bacnet", "pointInventory", fallback=False)
+
+
+def load_inventory(file_name=INVENTORY_FILE):
+    """
+    Parameters: inventory file name
+    Return: dict device_instance -> entry.  Empty dict if there is no inventory yet
+
+    Entry:
+    {"database_revision": 12, "read_at": 1700000000.0, "objects": [["analogValue", 1], ["binaryValue", 2]]}
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if not os.path.exists(file_name):
+        return {}
+
+    try:
+        with open(file_name, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        logging.error(f"load_inventory error: {e}")
+        return {}
+
+    # json keys are strings
+    return {int(device_instance): entry for device_instance, entry in data.items()}
+
+
+def save_inventory(inventory, file_name=INVENTORY_FILE):
+    """
+    Parameters: dict device_instance -> entry, inventory file name
+    Writes the inventory.  Writes to a temp file with a unique name first so a crash or another writer can't leave a half written file
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): unique temp file
+    """
+
+    temp_file = None
+
+    try:
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(file_name)), prefix=os.path.basename(file_name), suffix=".tmp", delete=False) as f:
+            temp_file = f.name
+            json.dump({str(device_instance): entry for device_instance, entry in sorted(inventory.items())}, f)
+        os.replace(temp_file, file_name)
+    except Exception as e:
+        logging.error(f"save_inventory error: {e}")
+        if temp_file is not None and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def merge_inventory(inventory, changed, file_name=INVENTORY_FILE):
+    """
+    Parameters: dict from load_inventory, device instances whose entries were read again, inventory file name
+    Loads the file again and saves it with the changed entries, so entries saved by other jobs in the meantime are kept
+    Return: None
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    with _file_lock:
+        saved = load_inventory(file_name)
+        saved.update({device_instance: inventory[device_instance] for device_instance in changed})
+        save_inventory(saved, file_name)
+
+
+def is_not_read(value):
+    return isinstance(value, str) and value == "NR"
+
+
+def read_object_list(bacnet, address, device_instance):
+    """
+    Parameters: bacnet device, device address, device instance
+    Reads the device objectList.  Devices that can segment get one read of the whole list.
+    Otherwise, or if the whole list fails, the length is read (index 0) and then every element by array index,
+    batched into ReadPropertyMultiple requests that fit the device max APDU
+    Return: list of (object_type, object_instance).  None if the list can't be read
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    capabilities = batch_read.get_device_capabilities(bacnet, address, device_instance)
+
+    if capabilities["segmentation"]:
+        object_list = batch_read.read_single(bacnet, address, ("device", device_instance, "objectList", None))
+        if not is_not_read(object_list) and isinstance(object_list, (list, tuple)):
+            return [(str(object_type), int(object_instance)) for object_type, object_instance in object_list]
+
+    length = batch_read.read_single(bacnet, address, ("device", device_instance, "objectList", 0))
+    if is_not_read(length) or not isinstance(length, int):
+        return None
+
+    requests = [("device", device_instance, "objectList", index) for index in range(1, length + 1)]
+    values = batch_read.read_properties(bacnet, address, device_instance, requests)
+
+    object_list = []
+    for index, value in enumerate(values, start=1):
+        if is_not_read(value) or not isinstance(value, (list, tuple)):
+            logging.error(f"read_object_list error.  device: {device_instance} index: {index}")
+            continue
+        object_list.append((str(value[0]), int(value[1])))
+
+    return object_list
+
+
+def read_database_revision(bacnet, address, device_instance):
+    """Return: device databaseRevision.  None if the device doesn't have it (None, "NR" or not a number)"""
+    revision = batch_read.read_single(bacnet, address, ("device", device_instance, "databaseRevision", None))
+    try:
+        return int(revision)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_device_objects(bacnet, device_manager, device_instance, inventory):
+    """
+    Parameters: bacnet device, device_manager, device instance, dict from load_inventory
+    Returns the cached object list if the device databaseRevision hasn't changed, else reads it again and updates inventory.
+    Devices without databaseRevision have their objectList read every time
+    Return: list of (object_type, object_instance).  None if the device can't be read
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): no cache for devices without databaseRevision
+    """
+
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        return None
+
+    entry = inventory.get(int(device_instance))
+    revision = read_database_revision(bacnet, address, device_instance)
+
+    if entry is not None and revision is not None and entry.get("database_revision") == revision:
+        return [tuple(item) for item in entry["objects"]]
+
+    print(f"Reading object list of {device_instance}...")
+    object_list = read_object_list(bacnet, address, device_instance)
+    if object_list is None:
+        return None
+
+    with _lock:
+        inventory[int(device_instance)] = {"database_revision": revision, "read_at": time.time(), "objects": [list(item) for item in object_list]}
+
+    return object_list
+
+
+def get_inventory(bacnet, device_manager, DI_list=None, file_name=INVENTORY_FILE):
+    """
+    Parameters: bacnet device, device_manager, list of device instances (None for all in device_manager), inventory file name
+    Point inventory of many devices.  Each device costs one databaseRevision read unless its objects changed.
+    Devices run in parallel, limited per network.  The entries read again are merged into the inventory file at the end
+    Return: dict device_instance -> set of (object_type, object_instance).  Devices that can't be read are left out
+
+    Example:
+    inventory = get_inventory(bacnet, device_manager)
+    if ("analogValue", 15) in inventory[1001]: ...
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): merge into the file instead of overwriting it
+    """
+
+    if DI_list is None:
+        DI_list = device_manager.instances()
+
+    inventory = load_inventory(file_name)
+    loaded = dict(inventory)
+
+    results, timings = read_scheduler.run_per_device(
+        device_manager, DI_list, lambda device_instance: get_device_objects(bacnet, device_manager, device_instance, inventory)
+    )
+
+    merge_inventory(inventory, [device_instance for device_instance, entry in inventory.items() if entry is not loaded.get(device_instance)], file_name)
+
+    return {device_instance: set(object_list) for device_instance, object_list in results.items() if object_list is not None}
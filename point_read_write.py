@@ -1,38 +1,31 @@
 import BAC0
-from BAC0.core.devices.local.models import (
-    analog_input,
-    analog_output,
-    analog_value,
-    binary_input,
-    binary_output,
-    binary_value,
-    character_string,
-    date_value,
-    datetime_value,
-    humidity_input,
-    humidity_value,
-    make_state_text,
-    multistate_input,
-    multistate_output,
-    multistate_value,
-    temperature_input,
-    temperature_value,
-)
-from BAC0.core.devices.local.object import ObjectFactory
 import re
-import time
-import configparser
-import openpyxl
-from openpyxl.styles import PatternFill
-import pandas as pd
-import numpy as np
 import os
-import re
 import warnings
 import logging
 import math
 import datetime
 from dotenv import load_dotenv
+import device_cache
+import bacnet_session
+from bacnet_session import device_scan, plan_reads
+import read_scheduler
+import job_template
+import result_sink
+import asyncio
+
+### SETTINGS ###
+# Columns of point_values written by execute_read when resultFormat is parquet / arrow
+POINT_VALUES_SCHEMA = [
+    ("deviceInstance", "int"),
+    ("point", "string"),
+    ("object_type", "string"),
+    ("object_instance", "int"),
+    ("property", "string"),
+    ("index", "int"),
+    ("value", "string"),
+]
+
 
 ### Logging Settings ###
 # Silence (use CRITICAL so not much messages will be sent)
@@ -57,19 +50,6 @@ file_handler.setFormatter(formatter)
 bacnet_logger.addHandler(file_handler)
 
 
-### CLASSES ###
-class Device:
-    def __init__(self, address, device_instance, ip_address, net, mac):
-        self.address = address
-        self.deviceInstance = device_instance
-        self.ipAddress = ip_address
-        self.net = net
-        self.mac = mac
-
-    def __repr__(self):
-        return f"Device(deviceInstance={self.deviceInstance}, ipAddress={self.ipAddress}, net={self.net}, mac={self.mac})"
-
-
 ### FUNCTIONS ###
 def authenticate():
     load_dotenv()
@@ -95,338 +75,88 @@ def authenticate():
     return True
 
 
-def bacnet_initialize():
-    """
-    Parameters: None
-    Takes in BACnet configuration parameters from settings.ini
-    Returns: BACnet device
-
-    REV History:
-    2024-02-08 (mikes): initial
-    """
-    # Takes in BACnet configuration parameters from settings.ini
-    # Creates and returns a BACnet device
-    config = configparser.ConfigParser()
-    config.read("settings.ini")
-    ipAddress = config.get("bacnet", "ipAddress")
-    udpPort = config.get("bacnet", "udpPort")
-    bacnet = BAC0.lite(ip=ipAddress, port=udpPort)
-    return bacnet
-
-
-def read_from_excel():
-    """
-    Paramters: None
-    Returns: pandas dataframe as read from excel file
-
-    REV History:
-    2024-02-08 (mikes): initial
+async def device_scan_async(client, start_instance, end_instance):
     """
+    Parameters: AsyncBacnetClient, range of device instances
+    Async version of device_scan.  Discovery waits on I-Am rather than on replies,
+    so it runs in a worker thread and reads on the event loop keep going during the scan
+    Return: DeviceRegistry with address information for each Device Instance
 
-    file_name = "Point Read Write.xlsx"
-
-    try:
-        # Read the Excel file into a pandas DataFrame
-        read_df = pd.read_excel(file_name, sheet_name="read")
-        write_df = pd.read_excel(file_name, sheet_name="write")
-
-    except Exception as e:
-        return f"Error reading Excel file: {e}"
-
-    return read_df, write_df
-
-
-def get_di_list(excel_df):
-    """
-    Parameters: dataframe that's read from excel
-    Return: List of device instances
-
-    REV History:
-    2024-02-08 (mikes): initial
-    """
-
-    DI_list = []
-    for i in range(2, len(excel_df)):
-        cell_value = excel_df.iloc[i, 0]
-        # Check if cell value is numeric
-        if pd.notnull(cell_value) and isinstance(cell_value, (int, float)):
-            DI_list.append(cell_value)
-    return DI_list
-
-
-def get_points_list(df):
-    """
-    Parameters: dataframe that's read from excel
-    Return: List of dicts.  Each dict contains point information for reading / writing
-
-    REV History:
-    2024-02-08 (mikes): initial
-    """
-
-    # Load the workbook
-    file_name = "Point Read Write.xlsx"
-    try:
-        wb = openpyxl.load_workbook(file_name)
-    except Exception as e:
-        logging.error(f"Error reading Excel file: {e}")
-        return
-
-    if "READ" in df.columns:
-        df.rename(columns={"READ": "A1"}, inplace=True)
-        sheet = wb["read"]
-    else:
-        df.rename(columns={"WRITE": "A1"}, inplace=True)
-        sheet = wb["write"]
-
-    # Get row indexes
-    object_type_row = df[df["A1"] == "object_type"].index[0]
-    object_instance_row = df[df["A1"] == "object_instance"].index[0]
-    object_property_row = df[df["A1"] == "object_property"].index[0]
-    index_row = df[df["A1"] == "index"].index[0]
-
-    # Get column list
-    column_list = df.columns.tolist()
-    column_list.remove("A1")
-
-    points_list = []
-
-    # Iterate through columns and create points list
-    for column_name in column_list:
-        for col in range(1, sheet.max_column + 1):
-            if sheet.cell(row=1, column=col).value == column_name:
-                column_letter = openpyxl.utils.get_column_letter(col)
-                break
-
-        point = {
-            "col_index": column_name,
-            "object_type": df.at[object_type_row, column_name],
-            "object_instance": df.at[object_instance_row, column_name],
-            "property": df.at[object_property_row, column_name],
-            "index": df.at[index_row, column_name],
-            "col_letter": column_letter,
-        }
-
-        points_list.append(point)
-
-    wb.close()
-
-    return points_list
-
-
-def build_device_manager(bacnet, DI_list):
-    """
-    Parameters: bacnet device, list of Device Instances
-    Calls device_scan() once for entire range, then scans for missing devices
-    Return: Pandas df with address information for each Device Instance
+    Example:
+    device_manager = bacnet_async.run_sync(device_scan_async(client, 0, 4194303))
 
     REV History:
-    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): initial
     """
 
-    # Scan for entire range from max to min
-    device_manager = device_scan(bacnet, min(DI_list), max(DI_list))
-    # device_manager = device_scan(bacnet, min(DI_list), 1200)
-
-    # Scan for missing items
-    for device in DI_list:
-        if device not in np.array(device_manager["deviceInstance"].values, dtype=np.int64):
-            print(f"Scanning for missing device {device}")
-            device_info = device_scan(bacnet, device, device)
-            if device_info is not None:  # Check if device_info is not empty
-                device_manager = pd.concat([device_manager, device_info], ignore_index=True)
+    loop = asyncio.get_running_loop()
 
-    # Remove duplicate rows based on 'deviceInstance' column
-    device_manager = device_manager.drop_duplicates(subset="deviceInstance", keep="first").reset_index(drop=True)
+    return await loop.run_in_executor(None, device_scan, client.bacnet, start_instance, end_instance)
 
-    # Remove deviees that aren't in DI_list
-    device_manager = device_manager[device_manager["deviceInstance"].isin(DI_list)]
 
-    return device_manager
-
-
-def device_scan(bacnet, start_instance, end_instance):
-    """
-    Parameters: bacnet device, list of Device Instances
-    Conducts a scan for a set range of device instances.  Will repeat scans based on settings.ini
-    Return: Pandas df with address information for each Device Instance
-
-    REV History:
-    2024-02-08 (mikes): initial
+async def read_points_async(client, device_manager, device_instance, points):
     """
+    Parameters: AsyncBacnetClient, device_manager, device instance, list of point dicts (object_type, object_instance, property, index)
+    Async version of read_points.  ReadPropertyMultiple chunks for the device are outstanding at the same time
+    Return: list of BACnet values in the same order as points.  If error, value is "NR"
 
-    config = configparser.ConfigParser()
-    config.read("settings.ini")
-    scanTimeout = config.getint("bacnet", "scanTimeout")
-
-    device_manager = []
-    passes = 1
-
-    while passes <= scanTimeout:
-        # If single instance scan and device is found, break
-        if start_instance == end_instance and any(device.deviceInstance == start_instance for device in device_manager):
-            break
-
-        print(f"Scan for devices {start_instance} to {end_instance}, Pass # {passes}")
-
-        # Scan for device
-        bacnet.discover(limits=(start_instance, end_instance))
-        device_dict = bacnet.discoveredDevices
-
-        for key, value in device_dict.items():
-            address = key[0]
-            deviceInstance = key[1]
-            ipAddress = ""
-            net = ""
-            mac = ""
-
-            if re.match(r"^(\d{1,3}\.){3}\d{1,3}$", address):
-                ipAddress = address
-            else:
-                address_parts = address.split(":")
-                if len(address_parts) == 2:
-                    net = address_parts[0]
-                    mac = address_parts[1]
-
-            device = Device(address, deviceInstance, ipAddress, net, mac)
-            if all(device.deviceInstance != d.deviceInstance for d in device_manager):
-                device_manager.append(device)
-                print("** Found device " + str(device.deviceInstance))
-                device_found = True
-
-        passes += 1
-
-    device_manager = sorted(device_manager, key=lambda x: x.deviceInstance)
-
-    # Create a dictionary to store device information
-    data = {
-        "address": [device.address for device in device_manager],
-        "deviceInstance": [device.deviceInstance for device in device_manager],
-        "IP": [device.ipAddress for device in device_manager],
-        "Network": [device.net for device in device_manager],
-        "MAC": [device.mac for device in device_manager],
-    }
-
-    # Create a Pandas DataFrame from the device information
-    df = pd.DataFrame(data)
-
-    return df
-
-
-def serialize_priority_array(priority_array, object_type):
-    """
-    Parameters: priority_array object, object_type
-    Unpacks priority_array object.
-    Replaces binary text with active and inactive
-    Return: dict with priority array data
+    Example:
+    values = await read_points_async(client, device_manager, 1001, points_list)
 
     REV History:
-    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): priority array levels with array index reads, same as read_points
+    2026-10-17 (mikes): steps from bacnet_session.plan_reads, only the reads are awaited here
     """
 
-    priority_array_dict = {}
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        return ["NR" for point in points]
 
-    for i in range(16):
-        sub_dict = priority_array[i]
-        if sub_dict:  # Check if sub-dictionary is not empty
-            value = list(sub_dict.values())[0]
-
-            # Replace null text
-            if (not value) and (value != 0):
-                value = "null"
-
-            # Replace binary text with "active" and "inactive"
-            if object_type == "binaryInput" or object_type == "binaryOutput" or object_type == "binaryValue":
-
-                if value == 1:
-                    value = "active"
-                elif value == 0:
-                    value = "inactive"
-
-            priority_array_dict[str(i + 1)] = value
-        else:
-            priority_array_dict[str(i + 1)] = "null"
-    return priority_array_dict
+    plan = plan_reads(device_instance, points)
+    try:
+        requests = next(plan)
+        while True:
+            requests = plan.send(await client.read_properties(address, device_instance, requests))
+    except StopIteration as done:
+        return done.value
 
 
-def read_point(bacnet, device_manager, device_instance, object_type, object_instance, property, index=None):
+async def read_point_async(client, device_manager, device_instance, object_type, object_instance, property, index=None):
     """
     Parameters: lots
-    Performs BACnet read
+    Async version of read_point
     Return: BACnet value.  If error, returns "NR"
 
     Example:
-    value = read_point(bacnet, device_manager, 1001, "binaryOutput", "0", "priorityArray", 14)
-    
+    value = await read_point_async(client, device_manager, 1001, "binaryOutput", "0", "priorityArray", 14)
+
     REV History:
-    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): initial
     """
 
-    # Variables
-    address = None
-    value = None
+    point = {"object_type": object_type, "object_instance": object_instance, "property": property, "index": index}
 
-    # Get bacnet address from device_manager
-    if device_instance in device_manager["deviceInstance"].values:
-        # Get the address for device_instance 1000
-        address = device_manager.loc[device_manager["deviceInstance"] == device_instance, "address"].iloc[0]
-    else:
-        return "NR"
-
-    # Read BACnet point
-    try:
-        # Read DDC file name
-        if object_type == "program":
-            value = bacnet.read(f"{address} program 0 {property}")
-
-        # Read from device
-        elif object_type == "device":
-            value = bacnet.read(f"{address} device {device_instance} {property}")
+    return (await read_points_async(client, device_manager, device_instance, [point]))[0]
 
-        # Read point
-        else:
-            value = bacnet.read(f"{address} {object_type} {object_instance} {property}")
 
-    except Exception as e:
-        logging.error(
-            f"read_point error.  error: {e} device: {device_instance} object_type: {object_type} object_instance: {object_instance} property: {property} index: {index}"
-        )
-        value = "NR"
-        return value
-
-    # Unpack priority array
-    if property == "priorityArray":
-        array = serialize_priority_array(value.dict_contents(), object_type)
-        if str(index) in array.keys():
-            value = array[str(index)]
-        else:
-            value = "NR"
-
-    return value
-
-
-def write_point(bacnet, device_manager, device_instance, object_type, object_instance, property, value, index=None):
+async def write_point_async(client, device_manager, device_instance, object_type, object_instance, property, value, index=None):
     """
     Parameters: lots
-    Performs BACnet write
-    Logs previous value prior to writing
+    Async version of write_point.  Logs previous value prior to writing
     Return: None
 
     Example:
-    write_point(bacnet, device_manager, 1001, "binaryOutput", "20", "priorityArray", "inactive", 3)
-    
+    await write_point_async(client, device_manager, 1001, "binaryOutput", "20", "priorityArray", "inactive", 3)
+
     REV History:
-    2024-02-08 (mikes): initial
+    2026-10-17 (mikes): initial
     """
 
-    # Variables
-    address = None
     value = re.sub(r"\s+", "_", str(value))
 
-    # Get bacnet address from device_manager
-    if device_instance in device_manager["deviceInstance"].values:
-        # Get the address for device_instance 1000
-        address = device_manager.loc[device_manager["deviceInstance"] == device_instance, "address"].iloc[0]
-    else:
+    address = device_manager.get_address(device_instance)
+    if address is None:
         return
 
     # Don't allow writing to program
@@ -434,7 +164,7 @@ def write_point(bacnet, device_manager, device_instance, object_type, object_ins
         return
 
     # Read BACnet point and log value
-    read_value = read_point(bacnet, device_manager, device_instance, object_type, object_instance, property, index)
+    read_value = await read_point_async(client, device_manager, device_instance, object_type, object_instance, property, index)
 
     if index is None:
         bacnet_logger.info(f"Writing to {device_instance}:{object_type}{object_instance} {property}.  Original value: {read_value}")
@@ -443,19 +173,15 @@ def write_point(bacnet, device_manager, device_instance, object_type, object_ins
             f"Writing to {device_instance}:{object_type}{object_instance} {property} priority {index}.  Original value: {read_value}"
         )
 
-    # Write BACnet point
     try:
-        # Write to device
         if object_type == "device":
-            bacnet.write(f"{address} device {device_instance} {property} {value}")
+            await client.write(address, "device", device_instance, property, value)
 
-        # Write to priority array
         elif property == "priorityArray":
-            bacnet.write(f"{address} {object_type} {object_instance} presentValue {value} - {index}")
+            await client.write(address, object_type, object_instance, "presentValue", value, priority=index)
 
-        # Write to point
         else:
-            bacnet.write(f"{address} {object_type} {object_instance} {property} {value}")
+            await client.write(address, object_type, object_instance, property, value)
 
     except Exception as e:
         logging.error(
@@ -465,157 +191,136 @@ def write_point(bacnet, device_manager, device_instance, object_type, object_ins
             f"write_point error.  error: {e} device: {device_instance} object_type: {object_type} object_instance: {object_instance} property: {property} index: {index}"
         )
 
-        return None
     return
 
 
-def output_to_excel(df, DI_list, points_list, sheet_name):
-    """
-    Parameters: pandas df, other sorting information
-    Writes data from df to excel.
-    Return: None
-
-    REV History:
-    2024-02-08 (mikes): initial
-    """
-    # Take in dataframe read from BACnet
-    # Write to excel
-
-    file_name = "Point Read Write.xlsx"
-
-    try:
-        # Load the workbook
-        wb = openpyxl.load_workbook(file_name)
-
-        # Select the active sheet
-        sheet = wb[sheet_name]
-
-        for device_instance in DI_list:
-            # Find df row index
-            if sheet_name == "read":
-                df_row_index = df.index[df["READ"] == device_instance].tolist()[0]
-            else:
-                df_row_index = df.index[df["WRITE"] == device_instance].tolist()[0]
-
-            # Find Excel row index
-            excel_row_index = None
-            for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, min_col=1, max_col=1):
-                if row[0].value == device_instance:
-                    excel_row_index = row[0].row
-                    break
-
-            # Iterate through columns
-            for point in points_list:
-                col_letter = point["col_letter"]
-                col_name = point["col_index"]
-
-                df_value = df.at[df_row_index, col_name]
-                cell = str(col_letter) + str(excel_row_index)
-                sheet[cell] = df_value
-
-        # Save the workbook
-        wb.save(file_name)
-        logging.info(f"output_to_excel successful")
-
-    except Exception as e:
-        logging.error(f"output_to_excel error: {e}")
-
-
-def execute_read():
+def execute_read(bacnet=None, template=None, cov_manager=None):
     """
-    Parameters: none
+    Parameters: bacnet device (optional, made from settings.ini if None), JobTemplate (optional, loaded if None), CovManager (optional)
     Main call to read parameters from excel and reads BACnet data
     Return: writes data back to same excel file
 
     REV History:
     2024-02-08 (mikes): initial
+    2026-10-17 (mikes): read devices concurrently with read_scheduler
+    2026-10-17 (mikes): start reading devices while discovery is still running
+    2026-10-17 (mikes): optional bacnet device, for benchmark.py
+    2026-10-17 (mikes): load the template once with job_template
+    2026-10-17 (mikes): stream values to a result_sink
+    2026-10-17 (mikes): serve subscribed present values from a CovManager
+    2026-10-17 (mikes): run in a bacnet_session.  Devices found before in the session skip discovery
     """
 
-    bacnet = bacnet_initialize()
-    read_df, write_df = read_from_excel()
-    DI_list = get_di_list(read_df)
-    device_manager = build_device_manager(bacnet, DI_list)
+    if template is None:
+        template = job_template.load_template()
+        if template is None:
+            return
+
+    session = bacnet_session.session_for(bacnet)
 
-    # Make df for read / write similar
-    df = read_df
-    points_list = get_points_list(df)
-    df.rename(columns={"READ": "A1"}, inplace=True)
+    spec = template.read
+    DI_list = spec.DI_list
+    points_list = spec.points_list
 
-    for device_instance in DI_list:
+    # With resultFormat parquet / arrow, values are streamed to point_values as each device finishes.
+    # The template is only written back if excelExport is set
+    result_format, excel_export = result_sink.get_sink_settings()
+    write_template = result_format == "excel" or excel_export
+    sink = None
+    if result_format != "excel":
+        sink = result_sink.open_sink("point_values", POINT_VALUES_SCHEMA)
+
+    # Read all devices at the same time, limited per network.  Each device is read as soon as it is found
+    def read_device(device_instance):
         print(f"Reading from {device_instance}...")
-        # find row index for this device instance
-        row_index = df.index[df["A1"] == device_instance].tolist()[0]
-
-        # Iterate through columns
-        for point in points_list:
-            # Read the BACnet point
-            value = read_point(
-                bacnet, device_manager, device_instance, point["object_type"], point["object_instance"], point["property"], point["index"]
+        values = session.read_points(device_instance, points_list, cov_manager)
+
+        if sink is not None:
+            sink.write_rows(
+                [
+                    [device_instance, point["col_index"], point["object_type"], point["object_instance"], point["property"], point["index"], value]
+                    for point, value in zip(points_list, values)
+                ]
             )
 
-            # Write to df
-            col_index = point["col_index"]
-            df.at[row_index, col_index] = value
+        # Don't keep the values if the template is not written back
+        return values if write_template else True
+
+    device_stream = session.iter_devices(DI_list)
+    results, timings = read_scheduler.run_per_device_stream(device_stream, read_device)
 
-    df.rename(columns={"A1": "READ"}, inplace=True)
+    # Report the slowest devices
+    for device_instance, seconds in sorted(timings.items(), key=lambda x: x[1], reverse=True)[:5]:
+        print(f"Slow device {device_instance}: {seconds:.2f} s")
+
+    if sink is not None:
+        sink.close()
 
     # Write back to excel sheet "read"
-    output_to_excel(df, DI_list, points_list, "read")
+    if write_template:
+        template.write_results(spec, {device_instance: results.get(device_instance) or ["NR" for point in points_list] for device_instance in DI_list})
+        template.save()
+
+    # Save device limits learned while reading
+    device_cache.remember_devices(session.device_manager.filter(DI_list), seen=False)
 
     return
 
 
-def execute_write():
+def execute_write(bacnet=None, template=None):
     """
-    Parameters: none
+    Parameters: bacnet device (optional, made from settings.ini if None), JobTemplate (optional, loaded if None)
     Main call to write BACnet parameters to excel
     Return: none
 
     REV History:
     2024-02-08 (mikes): initial
+    2026-10-17 (mikes): optional bacnet device, for benchmark.py
+    2026-10-17 (mikes): load the template once with job_template
+    2026-10-17 (mikes): write devices concurrently with write_pipeline
+    2026-10-17 (mikes): WritePropertyMultiple, errors reported by sheet cell
+    2026-10-17 (mikes): run in a bacnet_session.  Devices found before in the session skip discovery
     """
 
-    bacnet = bacnet_initialize()
-    read_df, write_df = read_from_excel()
+    if template is None:
+        template = job_template.load_template()
+        if template is None:
+            return
 
-    DI_list = get_di_list(write_df)
-    device_manager = build_device_manager(bacnet, DI_list)
+    session = bacnet_session.session_for(bacnet)
 
-    # Make df for read / write similar
-    df = write_df
-    points_list = get_points_list(df)
-    df.rename(columns={"WRITE": "A1"}, inplace=True)
+    spec = template.write
+    DI_list = spec.DI_list
+    points_list = spec.points_list
+    device_manager = session.devices(DI_list)
 
-    # Iterate through rows
-    for device_instance in DI_list:
+    # Write all devices at the same time, limited per network.  Each device is one write_pipeline run
+    def write_device(device_instance):
         print(f"Writing to {device_instance}...")
 
-        # Find row index
-        df_row_index = df.index[df["A1"] == device_instance].tolist()[0]
-
-        # Iterate through points
-        for point in points_list:
-            # Find column name
-            col_name = point["col_index"]
-
-            # Find value to write from df
-            df_value = df.at[df_row_index, col_name]
-            if df_value == "auto":
-                df_value = "null"
-
-            if not (isinstance(df_value, float) and math.isnan(df_value)):
-                # Write to BACnet
-                print("here")
-                write_point(
-                    bacnet,
-                    device_manager,
-                    device_instance,
-                    point["object_type"],
-                    point["object_instance"],
-                    point["property"],
-                    df_value,
-                    point["index"],
-                )
+        writes = []
+        cells = []
+        for point, value in zip(points_list, spec.values[device_instance]):
+            # Empty cell, nothing to write
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+
+            if value == "auto":
+                value = "null"
+
+            writes.append((point["object_type"], point["object_instance"], point["property"], value, point["index"]))
+            cells.append(f"{point['col_letter']}{spec.rows[device_instance]}")
+
+        return list(zip(cells, session.write_points(device_instance, writes)))
+
+    results, timings = read_scheduler.run_per_device(device_manager, list(dict.fromkeys(DI_list)), write_device)
+
+    # Report each failed write by its cell in the write sheet
+    failed = [(device_instance, cell, result) for device_instance, cell_results in results.items() for cell, result in cell_results or [] if result is not True]
+    for device_instance, cell, result in failed:
+        print(f"Write failed: {spec.sheet_name}!{cell} device: {device_instance} error: {result}")
+        bacnet_logger.error(f"Write failed: {spec.sheet_name}!{cell} device: {device_instance} error: {result}")
+    print(f"{sum(len(cell_results or []) for cell_results in results.values()) - len(failed)} writes done, {len(failed)} failed")
 
     return
 
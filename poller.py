@@ -0,0 +1,342 @@
+import configparser
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import batch_read
+import device_cache
+import read_scheduler
+import result_sink
+from ranges import range_to_list
+
+
+### SETTINGS ###
+# Object types polled from the settings.ini ranges: key -> (object type, range key)
+POLL_TYPES = {
+    "av": ("analogValue", "avRange"),
+    "bv": ("binaryValue", "bvRange"),
+    "ai": ("analogInput", "aiRange"),
+    "ao": ("analogOutput", "aoRange"),
+    "bi": ("binaryInput", "biRange"),
+    "bo": ("binaryOutput", "boRange"),
+    "msv": ("multiStateValue", "msvRange"),
+}
+
+# Columns of the trend file
+TREND_SCHEMA = [
+    ("time", "float"),
+    ("deviceInstance", "int"),
+    ("object_type", "string"),
+    ("object_instance", "int"),
+    ("value", "float"),
+]
+
+# Seconds between points/sec reports
+REPORT_INTERVAL = 10
+
+BINARY_VALUES = {"active": 1.0, "inactive": 0.0}
+
+
+### CLASSES ###
+class RingBuffer:
+    """
+    Time indexed ring buffer for one point.  Samples are kept in two preallocated float64 arrays
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    __slots__ = ("times", "values", "count", "next", "unflushed")
+
+    def __init__(self, capacity):
+        self.times = np.full(capacity, np.nan, dtype=np.float64)
+        self.values = np.full(capacity, np.nan, dtype=np.float64)
+        self.count = 0
+        self.next = 0
+        self.unflushed = 0
+
+    def append(self, sample_time, value):
+        self.times[self.next] = sample_time
+        self.values[self.next] = value
+        self.next = (self.next + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+        self.unflushed = min(self.unflushed + 1, len(self.times))
+
+    def latest(self):
+        """Returns (time, value) of the last sample.  (None, None) if empty"""
+        if self.count == 0:
+            return None, None
+        return self.times[self.next - 1], self.values[self.next - 1]
+
+    def last(self, count):
+        """Returns (times, values) of the last count samples, oldest first"""
+        count = min(count, self.count)
+        index = (np.arange(self.next - count, self.next)) % len(self.times)
+        return self.times[index], self.values[index]
+
+    def window(self, seconds, now=None):
+        """Returns (times, values) of the samples from the last seconds, oldest first"""
+        times, values = self.last(self.count)
+        now = time.time() if now is None else now
+        keep = times >= now - seconds
+        return times[keep], values[keep]
+
+    def take_unflushed(self):
+        """Returns (times, values) not yet flushed to disk and marks them flushed"""
+        times, values = self.last(self.unflushed)
+        self.unflushed = 0
+        return times, values
+
+
+class PollGroup:
+    """
+    Points of one device that share a poll interval.  Read together in one batched request
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    __slots__ = ("device_instance", "interval", "requests", "buffers")
+
+    def __init__(self, device_instance, interval, requests, buffers):
+        self.device_instance = device_instance
+        self.interval = interval
+        self.requests = requests
+        self.buffers = buffers
+
+
+class Poller:
+    """
+    Polls points on their intervals until stopped.
+
+    - Groups due at the same time are merged per device into one batch_read request (ReadPropertyMultiple)
+    - A heap holds the next due time of each group, so the loop sleeps until the next group is due
+    - Devices are read by a worker pool.  A device still being read is not read again until it is done
+    - Samples go to a RingBuffer per point.  Full chunks are flushed to the trend file
+
+    Example:
+    poller = Poller(bacnet, device_manager, build_poll_points(device_manager))
+    poller.run()
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    def __init__(self, bacnet, device_manager, points, buffer_size=1024, flush_size=256, sink=None, max_workers=None):
+        self.bacnet = bacnet
+        self.device_manager = device_manager
+        self.flush_size = min(flush_size, buffer_size)
+        self.sink = sink
+        self.max_workers = max_workers or read_scheduler.get_scheduler_limits()[0]
+
+        # (device instance, object type, object instance) -> RingBuffer
+        self.buffers = {}
+        self.heap = []
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.samples = 0
+
+        groups = {}
+        for device_instance, object_type, object_instance, interval in points:
+            key = (device_instance, object_type, object_instance)
+            if key in self.buffers:
+                continue
+            self.buffers[key] = RingBuffer(buffer_size)
+            groups.setdefault((device_instance, interval), []).append(key)
+
+        # Spread the first polls over the first interval so all devices don't start at once
+        start = time.monotonic()
+        for i, ((device_instance, interval), keys) in enumerate(groups.items()):
+            requests = [(object_type, object_instance, "presentValue", None) for device, object_type, object_instance in keys]
+            group = PollGroup(device_instance, interval, requests, [self.buffers[key] for key in keys])
+            heapq.heappush(self.heap, (start + interval * i / max(1, len(groups)), i, group))
+
+    def stop(self):
+        self.stop_event.set()
+
+    def due_groups(self, now):
+        """Pops every group due at now and schedules its next poll.  Return: dict device instance -> list of groups"""
+        due = {}
+        while self.heap and self.heap[0][0] <= now:
+            due_time, order, group = heapq.heappop(self.heap)
+            due.setdefault(group.device_instance, []).append(group)
+
+            # Fixed rate.  If we fell more than one interval behind, skip the missed polls
+            next_time = due_time + group.interval
+            if next_time <= now:
+                next_time = now + group.interval
+            heapq.heappush(self.heap, (next_time, order, group))
+
+        return due
+
+    def poll_device(self, device_instance, groups):
+        """Reads all due groups of one device in one batched request and stores the samples"""
+        try:
+            address = self.device_manager.get_address(device_instance)
+            requests = [request for group in groups for request in group.requests]
+            buffers = [buffer for group in groups for buffer in group.buffers]
+
+            values = batch_read.read_properties(self.bacnet, address, device_instance, requests)
+            sample_time = time.time()
+
+            with self.lock:
+                for request, buffer, value in zip(requests, buffers, values):
+                    buffer.append(sample_time, to_float(value))
+                    if buffer.unflushed >= self.flush_size:
+                        self.flush_buffer(device_instance, request, buffer)
+                self.samples += len(values)
+
+        except Exception as e:
+            logging.error(f"poll_device error.  error: {e} device: {device_instance}")
+
+        finally:
+            with self.lock:
+                self.in_flight.discard(device_instance)
+
+    def flush_buffer(self, device_instance, request, buffer):
+        times, values = buffer.take_unflushed()
+        if self.sink is not None:
+            self.sink.write_rows([[t, device_instance, request[0], request[1], v] for t, v in zip(times.tolist(), values.tolist())])
+
+    def flush(self):
+        """Writes every unflushed sample to the trend file"""
+        with self.lock:
+            for (device_instance, object_type, object_instance), buffer in self.buffers.items():
+                if buffer.unflushed:
+                    self.flush_buffer(device_instance, (object_type, object_instance), buffer)
+
+    def run(self, seconds=None):
+        """Polls until stop() is called, Ctrl+C, or for seconds"""
+        end_time = None if seconds is None else time.monotonic() + seconds
+        report_time = time.monotonic() + REPORT_INTERVAL
+        report_samples = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while not self.stop_event.is_set():
+                    now = time.monotonic()
+                    if end_time is not None and now >= end_time:
+                        break
+
+                    for device_instance, groups in self.due_groups(now).items():
+                        with self.lock:
+                            if device_instance in self.in_flight:
+                                logging.info(f"Poller overrun: device {device_instance} still being read")
+                                continue
+                            self.in_flight.add(device_instance)
+                        executor.submit(self.poll_device, device_instance, groups)
+
+                    if now >= report_time:
+                        print(f"Poller: {(self.samples - report_samples) / REPORT_INTERVAL:.0f} points/s")
+                        report_samples = self.samples
+                        report_time = now + REPORT_INTERVAL
+
+                    # Sleep until the next group is due
+                    wake_time = self.heap[0][0] if self.heap else now + 1
+                    if end_time is not None:
+                        wake_time = min(wake_time, end_time)
+                    self.stop_event.wait(max(0, wake_time - time.monotonic()))
+
+            except KeyboardInterrupt:
+                print("Poller stopped")
+
+        self.flush()
+
+
+### FUNCTIONS ###
+def to_float(value):
+    """
+    Parameters: BACnet value
+    Return: value as float for the ring buffer.  active / inactive are 1 / 0.  Errors are NaN
+    """
+
+    if isinstance(value, str):
+        return BINARY_VALUES.get(value, np.nan)
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def get_poll_settings():
+    """
+    Parameters: None
+    Takes in poll settings from settings.ini
+    Return: dict with interval (seconds), intervals per type key, devices (list or None for all cached devices), buffer_size, flush_size
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    interval = config.getfloat("bacnet", "pollInterval", fallback=60)
+    devices = config.get("bacnet", "pollDevices", fallback="").strip()
+
+    return {
+        "interval": interval,
+        "intervals": {key: config.getfloat("bacnet", f"{key}PollInterval", fallback=interval) for key in POLL_TYPES},
+        "devices": range_to_list(devices) if devices else None,
+        "buffer_size": config.getint("bacnet", "pollBufferSize", fallback=1024),
+        "flush_size": config.getint("bacnet", "pollFlushSize", fallback=256),
+    }
+
+
+def build_poll_points(device_manager, settings=None):
+    """
+    Parameters: DeviceRegistry, poll settings (None to read settings.ini)
+    Builds the poll list from the settings.ini ranges (avRange, bvRange, ...) for every device
+    Return: list of (device instance, object type, object instance, interval)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if settings is None:
+        settings = get_poll_settings()
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    device_instances = settings["devices"] if settings["devices"] is not None else device_manager.instances()
+
+    points = []
+    for key, (object_type, range_key) in POLL_TYPES.items():
+        instances = range_to_list(config.get("bacnet", range_key, fallback=""))
+        interval = settings["intervals"][key]
+        for device_instance in device_instances:
+            if device_instance not in device_manager:
+                continue
+            points += [(device_instance, object_type, instance, interval) for instance in instances]
+
+    return points
+
+
+def main():
+    import bacnet as bacnet_scan
+
+    bacnet = bacnet_scan.bacnetInitialize()
+    device_manager = device_cache.load_device_registry()
+    settings = get_poll_settings()
+    points = build_poll_points(device_manager, settings)
+    print(f"Polling {len(points)} points on {len(device_manager)} devices.  Ctrl+C to stop")
+
+    # Excel can't be appended to, so trends use csv unless a streaming format is set.  csv trends add to the file of earlier runs
+    result_format = result_sink.get_sink_settings()[0]
+    if result_format == "excel":
+        result_format = "csv"
+
+    with result_sink.open_sink("trend", TREND_SCHEMA, result_format=result_format, append=True) as sink:
+        poller = Poller(bacnet, device_manager, points, settings["buffer_size"], settings["flush_size"], sink)
+        poller.run()
+
+    bacnet.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+### SETTINGS ###
+PRIORITY_LEVELS = 16
+
+BINARY_TYPES = ("binaryInput", "binaryOutput", "binaryValue")
+
+# Objects with more wanted levels than this get one read of the whole array instead of one read per level
+MAX_SLOT_READS = 4
+
+
+### FUNCTIONS ###
+def level(index):
+    """Return: priority level 1-16 of a sheet index (8, "8", 8.0).  None if it isn't one"""
+    try:
+        number = int(float(index))
+    except (TypeError, ValueError):
+        return None
+    return number if 1 <= number <= PRIORITY_LEVELS and number == float(index) else None
+
+
+def slot_value(contents, object_type):
+    """
+    Parameters: contents of one slot ({"real": 12.0}, {"null": ()}, {} ...), object type
+    Return: slot value.  "null" if empty, "active" / "inactive" for binary objects
+
+    REV History:
+    2026-10-17 (mikes): initial, from serialize_priority_array
+    """
+
+    value = next(iter(contents.values())) if contents else None
+
+    # Replace null text
+    if (not value) and (value != 0):
+        return "null"
+
+    # Replace binary text with "active" and "inactive"
+    if object_type in BINARY_TYPES:
+        if value == 1:
+            return "active"
+        elif value == 0:
+            return "inactive"
+
+    return value
+
+
+def decode_slot(value, object_type):
+    """
+    Parameters: one priority array slot read with an array index (PriorityValue), object type
+    Return: slot value, see slot_value.  "NR" stays "NR"
+    """
+
+    if not hasattr(value, "dict_contents"):
+        return value
+
+    return slot_value(value.dict_contents(), object_type)
+
+
+def decode_priority_array(value, object_type):
+    """
+    Parameters: whole priority array as read, object type
+    Decodes every slot once
+    Return: tuple of the 16 slot values, level 1 first.  None if value is not a priority array (e.g. "NR")
+
+    Example:
+    slots = decode_priority_array(value, "binaryOutput")
+    slots[8 - 1]  # level 8
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if not hasattr(value, "dict_contents"):
+        return None
+
+    contents = value.dict_contents()
+    return tuple(slot_value(contents[i], object_type) if i < len(contents) else "null" for i in range(PRIORITY_LEVELS))
@@ -0,0 +1,123 @@
+import logging
+import batch_read
+import read_scheduler
+import write_pipeline
+
+
+### SETTINGS ###
+# Short object names used in messages
+OBJECT_LABELS = {
+    "analogValue": "AV",
+    "binaryValue": "BV",
+    "multiStateValue": "MV",
+    "analogInput": "AI",
+    "binaryInput": "BI",
+    "multiStateInput": "MI",
+    "analogOutput": "AO",
+    "binaryOutput": "BO",
+    "multiStateOutput": "MO",
+}
+
+
+### FUNCTIONS ###
+def is_not_read(value):
+    return isinstance(value, str) and value == "NR"
+
+
+def copy_device(bacnet, device_manager, device_instance, objects, source, destination, transform=None):
+    """
+    Parameters: bacnet device, device_manager, device instance, list of (object_type, object_instance),
+    source property, destination property, function applied to each source value (None to copy as is)
+
+    Copies source to destination for every object of one device:
+    1. Reads source and destination of every object in one batched read
+    2. Writes only the destinations that differ, with write_pipeline.  The destination values already read are the logged originals
+
+    Return: dict with counts copied, same, not_read, failed
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    counts = {"copied": 0, "same": 0, "not_read": 0, "failed": 0}
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        counts["not_read"] = len(objects)
+        return counts
+
+    print(f"Reading from {device_instance}...")
+
+    # Source and destination of the same object share one access spec in the ReadPropertyMultiple
+    requests = []
+    for object_type, object_instance in objects:
+        requests += [(object_type, object_instance, source, None), (object_type, object_instance, destination, None)]
+    values = batch_read.read_properties(bacnet, address, device_instance, requests)
+
+    writes = []
+    before = []
+    for i, (object_type, object_instance) in enumerate(objects):
+        value, current = values[2 * i], values[2 * i + 1]
+        label = f"{device_instance}:{OBJECT_LABELS.get(object_type, object_type)}{object_instance}"
+
+        if is_not_read(value):
+            print(f"Point not read: {label} {value}")
+            counts["not_read"] += 1
+            continue
+
+        if transform is not None:
+            value = transform(value)
+
+        # Compare as it would be written
+        if not is_not_read(current) and write_pipeline.wire_value(value) == write_pipeline.wire_value(current):
+            counts["same"] += 1
+            continue
+
+        print(f"Copying {label} {value}")
+        writes.append((object_type, object_instance, destination, value, None))
+        before.append(current)
+
+    if writes:
+        results = write_pipeline.write_points(bacnet, device_manager, device_instance, writes, before=before)
+        counts["copied"] += sum(result is True for result in results)
+        counts["failed"] += sum(result is not True for result in results)
+
+    return counts
+
+
+def copy_property(bacnet, device_manager, DI_list, objects, source="objectName", destination="description", transform=None):
+    """
+    Parameters:
+    - bacnet device, device_manager
+    - DI_list: device instances.  Devices not in device_manager are skipped
+    - objects: list of (object_type, object_instance), or function device_instance -> list for different objects per device
+    - source / destination: properties to copy from / to
+    - transform: function applied to each source value (None to copy as is)
+
+    Property copy engine.  Devices run in parallel, limited per network.  See copy_device
+    Return: dict device_instance -> counts
+
+    Example:
+    copy_property(bacnet, device_manager, [1001, 1002], [("analogValue", 1), ("binaryValue", 2)], "objectName", "description")
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    def run_device(device_instance):
+        device_objects = objects(device_instance) if callable(objects) else objects
+        try:
+            return copy_device(bacnet, device_manager, device_instance, device_objects, source, destination, transform)
+        except Exception as e:
+            logging.error(f"copy_property error.  error: {e} device: {device_instance}")
+            return None
+
+    DI_list = [device_instance for device_instance in dict.fromkeys(DI_list) if device_instance in device_manager]
+    results, timings = read_scheduler.run_per_device(device_manager, DI_list, run_device)
+
+    totals = {"copied": 0, "same": 0, "not_read": 0, "failed": 0}
+    for counts in results.values():
+        for key, count in (counts or {}).items():
+            totals[key] += count
+    print(f"{source} -> {destination}: {totals['copied']} copied, {totals['same']} already the same, {totals['not_read']} not read, {totals['failed']} failed")
+
+    return results
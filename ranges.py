@@ -0,0 +1,27 @@
+### FUNCTIONS ###
+def range_to_list(range_string):
+    """
+    Parameters:
+    - range_string: string with ranges broken up by semi-colons.
+    Example: 1000-1010;2000-3000;4000;5000
+
+    Return: a list
+
+    Example:
+    range_to_list("15;26;66-68")  # [15, 26, 66, 67, 68]
+
+    REV History:
+    2024-02-18 (mikes): initial
+    2026-10-17 (mikes): moved to ranges.py, shared by the scripts.  Spaces around items are ignored
+    """
+
+    result = []
+
+    for item in range_string.split(";"):
+        item = item.strip()
+        if "-" in item:
+            start, end = map(int, item.split("-"))
+            result.extend(range(start, end + 1))
+        elif item:  # Add this condition to handle semicolon at the end
+            result.append(int(item))
+    return result
@@ -0,0 +1,158 @@
+import configparser
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from device_registry import DeviceRecord
+
+
+# Seconds between checks for new devices while the device stream is still running
+STREAM_POLL = 0.2
+
+
+### FUNCTIONS ###
+def get_scheduler_limits():
+    """
+    Parameters: None
+    Takes in scheduler limits from settings.ini
+    Return: (max devices in flight, max devices in flight per BACnet network)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    max_in_flight = config.getint("bacnet", "maxConcurrentRequests", fallback=16)
+    max_per_network = config.getint("bacnet", "maxRequestsPerNetwork", fallback=2)
+
+    return max(1, max_in_flight), max(1, max_per_network)
+
+
+def run_per_device_stream(device_stream, task, max_in_flight=None, max_per_network=None):
+    """
+    Parameters:
+    - device_stream: iterable of DeviceRecord.  Can be a generator that is still discovering devices
+    - task: function called as task(device_instance).  Must be thread safe
+    - max_in_flight / max_per_network: override settings.ini limits
+
+    Runs task for many devices at the same time.  The number of devices in flight is limited globally,
+    and per routed network so MS/TP trunks are not flooded.  Devices on the local IP network only use the global limit.
+    Devices are started as soon as device_stream yields them
+    Return: (dict device_instance -> task result, dict device_instance -> seconds)
+
+    Example:
+    results, timings = run_per_device_stream(discovery.iter_device_manager(bacnet, DI_list, device_manager), read_device)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config_in_flight, config_per_network = get_scheduler_limits()
+    max_in_flight = max_in_flight or config_in_flight
+    max_per_network = max_per_network or config_per_network
+
+    def timed_task(device_instance):
+        start = time.perf_counter()
+        result = task(device_instance)
+        return result, time.perf_counter() - start
+
+    # Pull devices from the stream in its own thread so a slow Who-Is doesn't hold up running reads
+    incoming = queue.Queue()
+    end_of_stream = object()
+
+    def feed():
+        try:
+            for device in device_stream:
+                incoming.put(device)
+        except Exception as e:
+            logging.error(f"run_per_device_stream feed error: {e}")
+        finally:
+            incoming.put(end_of_stream)
+
+    threading.Thread(target=feed, daemon=True).start()
+    streaming = True
+
+    # Queue of devices per network
+    pending = {}
+    in_flight = defaultdict(int)
+    futures = {}
+    results = {}
+    timings = {}
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while streaming or futures or any(pending.values()):
+            # Take new devices.  Block only when there is nothing else to do
+            block = streaming and not futures and not any(pending.values())
+            while streaming:
+                try:
+                    device = incoming.get(block=block, timeout=None)
+                except queue.Empty:
+                    break
+                block = False
+
+                if device is end_of_stream:
+                    streaming = False
+                else:
+                    pending.setdefault(device.net, deque()).append(device.deviceInstance)
+
+            # Fill free slots, one device per network at a time so no network is starved
+            submitted = True
+            while submitted and len(futures) < max_in_flight:
+                submitted = False
+                for network, devices in pending.items():
+                    if not devices or len(futures) >= max_in_flight:
+                        continue
+                    if network and in_flight[network] >= max_per_network:
+                        continue
+
+                    device_instance = devices.popleft()
+                    futures[executor.submit(timed_task, device_instance)] = (device_instance, network)
+                    in_flight[network] += 1
+                    submitted = True
+
+            if not futures:
+                continue
+
+            # Wake up now and then to pick up newly discovered devices
+            done, not_done = wait(futures, timeout=STREAM_POLL if streaming else None, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                device_instance, network = futures.pop(future)
+                in_flight[network] -= 1
+                try:
+                    results[device_instance], timings[device_instance] = future.result()
+                    print(f"Finished {device_instance} in {timings[device_instance]:.2f} s")
+                except Exception as e:
+                    logging.error(f"run_per_device error.  error: {e} device: {device_instance}")
+                    results[device_instance] = None
+
+    logging.info(f"run_per_device: {len(results)} devices, device timings (s): {timings}")
+
+    return results, timings
+
+
+def run_per_device(device_manager, DI_list, task, max_in_flight=None, max_per_network=None):
+    """
+    Parameters:
+    - device_manager: DeviceRegistry from build_device_manager.  The device network is used for per-network limits
+    - DI_list: list of device instances.  Devices not in device_manager are run as local IP devices
+    - task: function called as task(device_instance).  Must be thread safe
+    - max_in_flight / max_per_network: override settings.ini limits
+
+    Runs task for many devices at the same time.  See run_per_device_stream
+    Return: (dict device_instance -> task result, dict device_instance -> seconds)
+
+    Example:
+    results, timings = run_per_device(device_manager, DI_list, lambda di: read_points(bacnet, device_manager, di, points_list))
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): use run_per_device_stream
+    """
+
+    device_stream = [device_manager.get(device_instance) or DeviceRecord("", device_instance, "", "", "") for device_instance in DI_list]
+
+    return run_per_device_stream(device_stream, task, max_in_flight, max_per_network)
@@ -0,0 +1,351 @@
+import configparser
+import csv
+import logging
+import os
+import threading
+
+
+### SETTINGS ###
+FORMATS = {"excel": ".xlsx", "csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Rows kept in memory before a batch is written to a streaming file
+BATCH_ROWS = 1000
+
+# Arrow type for each column type
+ARROW_TYPES = {
+    "int": lambda pa: pa.int64(),
+    "float": lambda pa: pa.float64(),
+    "string": lambda pa: pa.string(),
+}
+
+# Excel fill for each highlight level (see set_highlights)
+HIGHLIGHT_COLORS = {1: "FFFF00", 2: "FF0000"}
+
+
+### FUNCTIONS ###
+def get_sink_settings():
+    """
+    Parameters: None
+    Takes in result settings from settings.ini
+    Return: (result format, export excel after a streaming sweep)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    result_format = config.get("bacnet", "resultFormat", fallback="excel").strip().lower()
+    excel_export = config.getboolean("bacnet", "excelExport", fallback=True)
+
+    if result_format not in FORMATS:
+        logging.error(f"get_sink_settings error: unknown resultFormat {result_format}.  Using excel")
+        result_format = "excel"
+
+    return result_format, excel_export
+
+
+def import_pyarrow():
+    # pyarrow is only needed for the parquet / arrow formats
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(f"resultFormat parquet / arrow needs pyarrow (pip install pyarrow): {e}")
+
+    return pyarrow
+
+
+def coerce(value, column_type):
+    """
+    Parameters: value, column type ("int", "float" or "string")
+    Converts a BACnet value to the column type.  Values that don't fit ("NR", errors) become None
+    Return: value
+    """
+
+    if value is None:
+        return None
+
+    if column_type == "string":
+        return str(value)
+
+    try:
+        if column_type == "int":
+            return int(value)
+        value = float(value)
+        return None if value != value else value
+    except (TypeError, ValueError):
+        return None
+
+
+### CLASSES ###
+class ResultSink:
+    """
+    Streams result rows to a file.  Rows are lists in schema order.  Thread safe
+
+    - schema: list of (column name, column type).  Column type is "int", "float" or "string"
+    - sort_by: column the Excel output is sorted by.  Default is the first column
+    - append: add to the rows of an earlier run instead of starting a new file (csv only).  For trends
+    - write_row(row) / write_rows(rows) as results come in
+    - set_highlights(keys, mask) to color cells of the Excel output
+    - close() when done.  Returns the file name
+
+    Example:
+    with open_sink("av_values", [("deviceInstance", "int"), ("AV15", "float")]) as sink:
+        sink.write_row([1001, 72.5])
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): append
+    """
+
+    extension = ""
+
+    def __init__(self, name, schema, sort_by=None, append=False):
+        self.path = name + self.extension
+        self.schema = schema
+        self.sort_by = sort_by or schema[0][0]
+        self.rows = []
+        self.highlights = None
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_row(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        with self._lock:
+            self.rows.extend([coerce(value, column_type) for value, (name, column_type) in zip(row, self.schema)] for row in rows)
+            if len(self.rows) >= BATCH_ROWS:
+                self._flush()
+
+    def set_highlights(self, keys, mask):
+        """
+        keys: first column value of each mask row.  mask: rows x (columns after the first) int array.
+        Cells with level 1 are filled yellow, level 2 red, when the Excel file is written
+        """
+        self.highlights = (keys, mask)
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self._flush()
+                self._close()
+                self.closed = True
+        return self.path
+
+    def _flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class ExcelSink(ResultSink):
+    """Excel can't be appended to.  Rows are kept and written once, sorted by the first column, on close"""
+
+    extension = ".xlsx"
+
+    def _close(self):
+        import pandas as pd
+
+        df = pd.DataFrame(self.rows, columns=[name for name, column_type in self.schema])
+        df.sort_values(self.sort_by, inplace=True, kind="stable")
+        write_excel(df, self.path, self.highlights)
+        self.rows = []
+
+
+class CsvSink(ResultSink):
+    """CSV file.  Writes each batch as it fills.  No extra packages needed.  A new file each run unless append is set"""
+
+    extension = ".csv"
+
+    def __init__(self, name, schema, sort_by=None, append=False):
+        super().__init__(name, schema, sort_by, append)
+        new_file = not (append and os.path.exists(self.path))
+        self.file = open(self.path, "a" if append else "w", newline="")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow([column for column, column_type in schema])
+
+    def _flush(self):
+        self.writer.writerows(self.rows)
+        self.file.flush()
+        self.rows = []
+
+    def _close(self):
+        self.file.close()
+
+
+class ArrowSink(ResultSink):
+    """Arrow IPC file.  Each batch is written as it fills.  Can be memory mapped with read_results"""
+
+    extension = ".arrow"
+
+    def __init__(self, name, schema, sort_by=None, append=False):
+        # Arrow and parquet files can't be appended to.  Always a new file
+        super().__init__(name, schema, sort_by, append)
+        self.pa = import_pyarrow()
+        self.arrow_schema = self.pa.schema([(column, ARROW_TYPES[column_type](self.pa)) for column, column_type in schema])
+        self.writer = self._open_writer()
+
+    def _open_writer(self):
+        return self.pa.ipc.new_file(self.path, self.arrow_schema)
+
+    def _flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        batch = self.pa.record_batch([self.pa.array(column, type=field.type) for column, field in zip(columns, self.arrow_schema)], schema=self.arrow_schema)
+        self.writer.write_batch(batch)
+        self.rows = []
+
+    def _close(self):
+        self.writer.close()
+
+
+class ParquetSink(ArrowSink):
+    """Parquet file.  Each batch is written as a row group as it fills"""
+
+    extension = ".parquet"
+
+    def _open_writer(self):
+        return self.pa.parquet.ParquetWriter(self.path, self.arrow_schema)
+
+
+SINKS = {"excel": ExcelSink, "csv": CsvSink, "parquet": ParquetSink, "arrow": ArrowSink}
+
+
+### EXCEL FUNCTIONS ###
+def write_excel(df, excel_file, highlights=None):
+    """
+    Parameters: DataFrame, Excel file name, highlights (keys, mask) from ResultSink.set_highlights
+    Writes the DataFrame and fills the highlighted cells in the same pass.  Only flagged cells are touched.
+    Rows with the same first column value all get the highlights of that key
+    """
+
+    import numpy as np
+    import pandas as pd
+    from openpyxl.styles import PatternFill
+
+    with pd.ExcelWriter(excel_file, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False)
+        if highlights is None:
+            return
+
+        keys, mask = highlights
+        sheet = next(iter(writer.sheets.values()))
+        fills = {level: PatternFill(start_color=color, end_color=color, fill_type="solid") for level, color in HIGHLIGHT_COLORS.items()}
+
+        mask = np.asarray(mask)
+        if mask.size == 0:
+            return
+
+        # Mask row of each DataFrame row, found by the first column.  Rows without a key are -1.  Keys don't have to be unique
+        key_rows = {key: i for i, key in enumerate(np.asarray(keys).tolist())}
+        mask_rows = np.fromiter((key_rows.get(key, -1) for key in df.iloc[:, 0].tolist()), dtype=int, count=len(df))
+        rows, cols = np.nonzero((mask_rows >= 0)[:, None] & (mask[mask_rows] > 0))
+        levels = mask[mask_rows[rows], cols].tolist()
+        for row, col, level in zip((rows + 2).tolist(), (cols + 2).tolist(), levels):
+            sheet.cell(row=row, column=col).fill = fills[level]
+
+
+### SINK FUNCTIONS ###
+def open_sink(name, schema, sort_by=None, result_format=None, append=False):
+    """
+    Parameters: file name without extension, schema (list of (column name, column type)), Excel sort column, format (None for settings.ini resultFormat),
+    append to the file of an earlier run (csv only, for trends.  One-shot jobs always start a new file)
+    Return: ResultSink for the format
+
+    Example:
+    sink = open_sink("device_info", [("deviceInstance", "int"), ("address", "string")])
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): new file unless append
+    """
+
+    if result_format is None:
+        result_format = get_sink_settings()[0]
+
+    return SINKS[result_format](name, schema, sort_by, append)
+
+
+def read_results(path):
+    """
+    Parameters: .parquet, .arrow or .xlsx file written by a sink
+    Arrow files are memory mapped, so large results are not copied into memory
+    Return: pandas DataFrame
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if path.endswith(".xlsx"):
+        import pandas as pd
+
+        return pd.read_excel(path)
+
+    if path.endswith(".csv"):
+        import pandas as pd
+
+        return pd.read_csv(path)
+
+    pa = import_pyarrow()
+    if path.endswith(".arrow"):
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    return pa.parquet.read_table(path, memory_map=True).to_pandas()
+
+
+def export_excel(path, excel_file=None, sort_by=None, highlights=None):
+    """
+    Parameters: csv, parquet or arrow result file, Excel file name (None for same name with .xlsx), sort column (None for first column), highlights (see ResultSink.set_highlights)
+    Optional final step: writes a streamed result file to Excel, sorted by the first column
+    Return: Excel file name.  None if error
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    if excel_file is None:
+        excel_file = os.path.splitext(path)[0] + ".xlsx"
+
+    try:
+        df = read_results(path)
+        df.sort_values(sort_by or df.columns[0], inplace=True, kind="stable")
+        write_excel(df, excel_file, highlights)
+    except Exception as e:
+        logging.error(f"export_excel error: {e} file: {path}")
+        return None
+
+    return excel_file
+
+
+def finish_sink(sink):
+    """
+    Parameters: ResultSink
+    Closes the sink, then exports csv / parquet / arrow results to Excel if excelExport is set
+    Return: Excel file name.  None if no Excel file was written
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    path = sink.close()
+
+    if isinstance(sink, ExcelSink):
+        return path
+
+    if get_sink_settings()[1]:
+        return export_excel(path, sort_by=sink.sort_by, highlights=sink.highlights)
+
+    return None
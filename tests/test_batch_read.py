@@ -0,0 +1,65 @@
+import batch_read
+
+
+def test_chunk_requests_fits_max_apdu():
+    requests = [("analogValue", i, "objectName", None) for i in range(20)]
+    chunks = batch_read.chunk_requests(requests, 480, False)
+
+    assert [request for chunk in chunks for request in chunk] == requests
+    budget = 480 - batch_read.APDU_HEADER
+    for chunk in chunks:
+        size = sum(batch_read.estimate_response_size(request) + batch_read.OBJECT_OVERHEAD for request in chunk)
+        assert size <= budget
+    assert len(chunks) > 1
+
+
+def test_chunk_requests_segmentation_allows_bigger_chunks():
+    requests = [("analogValue", i, "objectName", None) for i in range(40)]
+
+    assert len(batch_read.chunk_requests(requests, 480, True)) < len(batch_read.chunk_requests(requests, 480, False))
+
+
+def test_chunk_requests_limits_properties_per_request():
+    requests = [("analogValue", 1, "presentValue", index) for index in range(1, 121)]
+    chunks = batch_read.chunk_requests(requests, 1476, True)
+
+    assert max(len(chunk) for chunk in chunks) == batch_read.MAX_PROPERTIES_PER_REQUEST
+    assert sum(len(chunk) for chunk in chunks) == 120
+
+
+def test_chunk_requests_empty():
+    assert batch_read.chunk_requests([], 480, False) == []
+
+
+def test_array_element_is_small():
+    assert batch_read.estimate_response_size(("analogOutput", 1, "priorityArray", 8)) == batch_read.DEFAULT_PROPERTY_SIZE
+    assert batch_read.estimate_response_size(("analogOutput", 1, "priorityArray", None)) == batch_read.PROPERTY_RESPONSE_SIZE["priorityArray"]
+
+
+def test_build_rpm_args_groups_consecutive_properties():
+    chunk = [
+        ("analogValue", 1, "presentValue", None),
+        ("analogValue", 1, "objectName", None),
+        ("binaryValue", 2, "presentValue", None),
+        ("analogOutput", 3, "priorityArray", 8),
+    ]
+
+    assert batch_read.build_rpm_args("192.168.1.10", chunk) == (
+        "192.168.1.10 analogValue 1 presentValue objectName binaryValue 2 presentValue analogOutput 3 priorityArray 8"
+    )
+
+
+def test_build_rpm_args_repeats_object_after_another():
+    chunk = [("analogValue", 1, "presentValue", None), ("binaryValue", 2, "presentValue", None), ("analogValue", 1, "objectName", None)]
+
+    assert batch_read.build_rpm_args("2000:15", chunk) == "2000:15 analogValue 1 presentValue binaryValue 2 presentValue analogValue 1 objectName"
+
+
+def test_set_capabilities():
+    capabilities = batch_read.set_capabilities(batch_read.default_capabilities(), 1476, "segmentedBoth")
+    assert capabilities["max_apdu"] == 1476
+    assert capabilities["segmentation"] is True
+
+    capabilities = batch_read.set_capabilities(batch_read.default_capabilities(), "NR", "noSegmentation")
+    assert capabilities["max_apdu"] == batch_read.DEFAULT_MAX_APDU
+    assert capabilities["segmentation"] is False
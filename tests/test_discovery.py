@@ -0,0 +1,89 @@
+import discovery
+
+
+SETTINGS = {"scan_timeout": 2, "split_threshold": 4, "whois_wait": 0, "max_passes": 6}
+
+
+class FakeApplication:
+    def __init__(self):
+        self.i_am_counter = {}
+
+
+class FakeBacnet:
+    """
+    Answers Who-Is from a dict of device instance -> address, like the BAC0 I-Am counter.
+    lost: number of Who-Is each device doesn't answer first (lost broadcast or I-Am)
+    """
+
+    def __init__(self, devices, lost=None):
+        self.devices = devices
+        self.lost = dict(lost or {})
+        self.this_application = FakeApplication()
+        self.whois_ranges = []
+
+    def whois(self, args):
+        start_instance, end_instance = map(int, args.split()[-2:])
+        self.whois_ranges.append((start_instance, end_instance))
+        for device_instance, address in self.devices.items():
+            if not start_instance <= device_instance <= end_instance:
+                continue
+            if self.lost.get(device_instance, 0) > 0:
+                self.lost[device_instance] -= 1
+                continue
+            key = (address, device_instance)
+            self.this_application.i_am_counter[key] = self.this_application.i_am_counter.get(key, 0) + 1
+
+
+def discover(bacnet, start_instance, end_instance, wanted=None, settings=SETTINGS):
+    return [device_instance for address, device_instance in discovery.iter_discover_range(bacnet, start_instance, end_instance, [], settings, set(), wanted)]
+
+
+def test_busy_range_is_split():
+    bacnet = FakeBacnet({i: f"10.0.0.{i}" for i in range(8)})
+
+    assert sorted(discover(bacnet, 0, 7)) == list(range(8))
+    assert (0, 3) in bacnet.whois_ranges
+    assert (4, 7) in bacnet.whois_ranges
+
+
+def test_quiet_range_is_not_split():
+    bacnet = FakeBacnet({1: "10.0.0.1", 5: "10.0.0.5"})
+
+    assert sorted(discover(bacnet, 0, 7)) == [1, 5]
+    assert set(bacnet.whois_ranges) == {(0, 7)}
+
+
+def test_quiet_passes_up_to_scan_timeout():
+    bacnet = FakeBacnet({})
+
+    assert discover(bacnet, 100, 100) == []
+    assert len(bacnet.whois_ranges) == SETTINGS["scan_timeout"]
+
+
+def test_lost_i_am_found_on_next_pass():
+    bacnet = FakeBacnet({100: "10.0.0.100"}, lost={100: 1})
+
+    assert discover(bacnet, 100, 100, wanted={100}) == [100]
+    assert len(bacnet.whois_ranges) == 2
+
+
+def test_stops_once_wanted_devices_found():
+    bacnet = FakeBacnet({100: "10.0.0.100"})
+
+    assert discover(bacnet, 100, 100, wanted={100}) == [100]
+    assert len(bacnet.whois_ranges) == 1
+
+
+def test_i_am_heard_before_the_who_is_is_not_found():
+    bacnet = FakeBacnet({})
+    bacnet.this_application.i_am_counter[("10.0.0.9", 9)] = 3
+
+    assert discover(bacnet, 0, 10) == []
+
+
+def test_max_passes():
+    bacnet = FakeBacnet({i: f"10.0.0.{i}" for i in range(3)}, lost={1: 1, 2: 2})
+    settings = dict(SETTINGS, max_passes=2)
+
+    assert sorted(discover(bacnet, 0, 7, settings=settings)) == [0, 1]
+    assert len(bacnet.whois_ranges) == 2
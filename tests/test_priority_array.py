@@ -0,0 +1,102 @@
+from bacpypes.basetypes import PriorityArray, PriorityValue
+import batch_read
+import bacnet_session
+import priority_array
+
+
+def make_array(slots):
+    # slots: level -> PriorityValue keyword, e.g. {8: {"real": 12.5}}
+    array = PriorityArray([PriorityValue(null=()) for level in range(16)])
+    for level, value in slots.items():
+        array[level] = PriorityValue(**value)
+    return array
+
+
+def point(object_type, object_instance, property, index=None):
+    return {"object_type": object_type, "object_instance": object_instance, "property": property, "index": index}
+
+
+def test_level():
+    assert priority_array.level(8) == 8
+    assert priority_array.level("8") == 8
+    assert priority_array.level(8.0) == 8
+    assert priority_array.level(0) is None
+    assert priority_array.level(17) is None
+    assert priority_array.level(8.5) is None
+    assert priority_array.level(None) is None
+
+
+def test_decode_priority_array():
+    slots = priority_array.decode_priority_array(make_array({8: {"real": 12.5}, 16: {"real": 0.0}}), "analogOutput")
+
+    assert len(slots) == 16
+    assert slots[8 - 1] == 12.5
+    assert slots[16 - 1] == 0.0
+    assert slots.count("null") == 14
+
+
+def test_decode_priority_array_binary():
+    slots = priority_array.decode_priority_array(make_array({5: {"enumerated": 1}, 6: {"enumerated": 0}}), "binaryOutput")
+
+    assert slots[5 - 1] == "active"
+    assert slots[6 - 1] == "inactive"
+
+
+def test_decode_priority_array_not_read():
+    assert priority_array.decode_priority_array("NR", "analogOutput") is None
+
+
+def test_decode_slot():
+    assert priority_array.decode_slot(PriorityValue(real=3.0), "analogValue") == 3.0
+    assert priority_array.decode_slot(PriorityValue(null=()), "analogValue") == "null"
+    assert priority_array.decode_slot("NR", "analogValue") == "NR"
+
+
+def test_point_requests_few_levels_use_array_index():
+    points = [point("analogOutput", 1, "priorityArray", 8), point("analogOutput", 1, "priorityArray", "16"), point("analogValue", 2, "presentValue")]
+
+    assert bacnet_session.point_requests(1001, points) == [
+        ("analogOutput", 1, "priorityArray", 8),
+        ("analogOutput", 1, "priorityArray", 16),
+        ("analogValue", 2, "presentValue", None),
+    ]
+
+
+def test_point_requests_many_levels_share_whole_array():
+    points = [point("analogOutput", 1, "priorityArray", level) for level in range(1, priority_array.MAX_SLOT_READS + 2)]
+
+    assert set(bacnet_session.point_requests(1001, points)) == {("analogOutput", 1, "priorityArray", None)}
+
+
+def test_point_requests_without_array_index():
+    points = [point("analogOutput", 1, "priorityArray", 8)]
+
+    assert bacnet_session.point_requests(1001, points, array_index=False) == [("analogOutput", 1, "priorityArray", None)]
+
+
+def test_unpack_values_whole_array():
+    points = [point("binaryOutput", 1, "priorityArray", 5), point("binaryOutput", 1, "priorityArray", 6), point("binaryOutput", 1, "priorityArray", 99)]
+    requests = [("binaryOutput", 1, "priorityArray", None)] * 3
+    array = make_array({5: {"enumerated": 1}})
+
+    assert bacnet_session.unpack_values(points, requests, [array] * 3) == ["active", "null", "NR"]
+
+
+def test_plan_reads_falls_back_to_whole_arrays():
+    # Device answers whole arrays but not array index reads
+    batch_read.device_capabilities[1001] = batch_read.default_capabilities()
+    array = make_array({8: {"real": 12.5}})
+    sent = []
+
+    def read(requests):
+        sent.append(requests)
+        return ["NR" if request[3] is not None else array for request in requests]
+
+    try:
+        values = bacnet_session.run_plan(bacnet_session.plan_reads(1001, [point("analogOutput", 1, "priorityArray", 8)]), read)
+
+        assert values == [12.5]
+        assert sent == [[("analogOutput", 1, "priorityArray", 8)], [("analogOutput", 1, "priorityArray", None)]]
+        assert batch_read.device_capabilities[1001]["array_index"] is False
+    finally:
+        batch_read.device_capabilities.pop(1001, None)
@@ -0,0 +1,123 @@
+from bacpypes.apdu import SimpleAckPDU, WritePropertyMultipleError
+from bacpypes.basetypes import ErrorType, ObjectPropertyReference
+import asyncio
+import write_pipeline
+
+
+def test_write_args():
+    assert write_pipeline.write_args(1001, "device", 1001, "description", "x", None) == ("device", 1001, "description", "x", None)
+    assert write_pipeline.write_args(1001, "binaryOutput", 20, "priorityArray", "inactive", 3) == ("binaryOutput", 20, "presentValue", "inactive", 3)
+    assert write_pipeline.write_args(1001, "analogValue", 1, "presentValue", 72, None) == ("analogValue", 1, "presentValue", 72, None)
+
+
+def test_write_key_matches_first_failed_write_attempt():
+    args = write_pipeline.write_args(1001, "binaryOutput", "20", "priorityArray", "active", 8)
+    failed = ObjectPropertyReference(objectIdentifier=("binaryOutput", 20), propertyIdentifier="presentValue")
+
+    assert write_pipeline.write_key(args) == write_pipeline.failed_write_key(failed)
+
+
+def test_write_key_differs_by_object_and_property():
+    failed = ObjectPropertyReference(objectIdentifier=("analogValue", 2), propertyIdentifier="presentValue")
+
+    assert write_pipeline.write_key(("analogValue", 1, "presentValue", 1, None)) != write_pipeline.failed_write_key(failed)
+    assert write_pipeline.write_key(("analogValue", 2, "description", "x", None)) != write_pipeline.failed_write_key(failed)
+
+
+def test_chunk_writes_never_repeats_a_key():
+    # Two priorities of one object write the same property, so they go in different requests
+    args_list = [("analogOutput", 1, "presentValue", 10, 8), ("analogOutput", 1, "presentValue", 20, 9), ("analogOutput", 2, "presentValue", 30, 8)]
+    chunks = write_pipeline.chunk_writes(args_list, 1476)
+
+    assert sorted(i for chunk in chunks for i in chunk) == [0, 1, 2]
+    for chunk in chunks:
+        keys = [write_pipeline.write_key(args_list[i]) for i in chunk]
+        assert len(keys) == len(set(keys))
+    assert len(chunks) == 2
+
+
+def test_chunk_writes_fits_max_apdu():
+    args_list = [("analogValue", i, "presentValue", 1000.5, None) for i in range(40)]
+    chunks = write_pipeline.chunk_writes(args_list, 128)
+
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(40))
+    for chunk in chunks:
+        size = write_pipeline.WPM_HEADER + sum(
+            write_pipeline.WPM_PROPERTY_OVERHEAD + write_pipeline.WPM_OBJECT_OVERHEAD + len(str(args_list[i][3])) for i in chunk
+        )
+        assert size <= 128
+
+
+def test_wpm_string():
+    assert write_pipeline.wpm_string("analogValue", 1, "presentValue", 72, None) == "analogValue 1 presentValue 72"
+    assert write_pipeline.wpm_string("binaryOutput", 20, "presentValue", "active", 8) == "binaryOutput 20 presentValue active - 8"
+
+
+def test_same_value():
+    assert write_pipeline.same_value("72", 72.0)
+    assert write_pipeline.same_value("active", 1)
+    assert not write_pipeline.same_value("72", 73.0)
+    assert not write_pipeline.same_value("on", "off")
+
+
+class FakeIOCB:
+    def __init__(self, response=None, error=None):
+        self.ioResponse = response
+        self.ioError = error
+
+
+class FakeDevice:
+    """
+    WritePropertyMultiple device.  Requests are grouped by object like BAC0 build_wpm_request,
+    writes are applied in that wire order up to the first write in fail
+    """
+
+    def __init__(self, fail):
+        self.fail = set(fail)
+        self.applied = []
+
+    def build_wpm_request(self, strings, addr=None):
+        groups = {}
+        for string in strings:
+            object_type, object_instance, property = string.split()[:3]
+            groups.setdefault((object_type, int(object_instance)), []).append(property)
+        return [(obj, property) for obj, properties in groups.items() for property in properties]
+
+
+class FakeClient:
+    def __init__(self, device):
+        self.bacnet = device
+
+    async def request(self, address, request):
+        for obj, property in request:
+            if (obj, property) in self.bacnet.fail:
+                self.bacnet.fail.discard((obj, property))
+                failed = ObjectPropertyReference(objectIdentifier=obj, propertyIdentifier=property)
+                error = WritePropertyMultipleError(
+                    errorType=ErrorType(errorClass="property", errorCode="writeAccessDenied"), firstFailedWriteAttempt=failed
+                )
+                return FakeIOCB(error=error)
+            self.bacnet.applied.append((obj, property))
+        return FakeIOCB(response=SimpleAckPDU())
+
+
+def test_group_by_object():
+    args_list = [("analogValue", 1, "presentValue", 1, None), ("analogValue", 2, "presentValue", 2, None), ("analogValue", "1", "description", "x", None)]
+
+    assert write_pipeline.group_by_object(range(3), args_list) == [0, 2, 1]
+
+
+def test_write_multiple_interleaved_objects_failed_later_property():
+    # AV1 pv, AV2 pv, AV1 description.  On the wire: AV1 pv, AV1 description, AV2 pv.  AV1 description fails
+    writes = [("analogValue", 1, "presentValue", 1, None), ("analogValue", 2, "presentValue", 2, None), ("analogValue", 1, "description", "x", None)]
+    device = FakeDevice(fail=[(("analogValue", 1), "description")])
+    capabilities = {"wpm": True, "max_apdu": 1476}
+
+    answers = asyncio.run(write_pipeline.send_write_multiple(FakeClient(device), "10.0.0.1", 1001, writes, capabilities))
+
+    assert answers[0] is True
+    assert isinstance(answers[2], Exception)
+    # AV2 pv was after the failed write on the wire.  It is only reported written if it was sent again and applied
+    assert answers[1] is True
+    assert (("analogValue", 2), "presentValue") in device.applied
+    assert device.applied.count((("analogValue", 2), "presentValue")) == 1
@@ -0,0 +1,327 @@
+from BAC0.core.io.IOExceptions import NoResponseFromController
+from BAC0.core.io.Read import find_reason
+from bacpypes.apdu import SimpleAckPDU, WritePropertyMultipleError
+import asyncio
+import configparser
+import logging
+import re
+import batch_read
+from bacnet_async import AsyncBacnetClient, run_sync
+
+
+### SETTINGS ###
+# Logger for BACnet write operations ("bacnet log.txt"), set up by the scripts
+bacnet_logger = logging.getLogger("custom_logger")
+
+BINARY_VALUES = {"active": 1.0, "inactive": 0.0}
+
+# Estimated bytes of a WritePropertyMultiple request, used to keep each request inside the device max APDU
+WPM_HEADER = 8
+WPM_OBJECT_OVERHEAD = 8
+WPM_PROPERTY_OVERHEAD = 8
+MAX_WRITES_PER_REQUEST = 50
+
+
+### FUNCTIONS ###
+def get_write_settings():
+    """
+    Parameters: None
+    Takes in write settings from settings.ini
+    Return: (writes in flight per device, read back after writing)
+
+    REV History:
+    2026-10-17 (mikes): initial
+    """
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+
+    return config.getint("bacnet", "maxWritesPerDevice", fallback=8), config.getboolean("bacnet", "verifyWrites", fallback=False)
+
+
+def wire_value(value):
+    # Values are written as BAC0 text.  Spaces can't be written, same as write_point
+    return re.sub(r"\s+", "_", str(value))
+
+
+def same_value(written, read):
+    # Values read back compare as text, or as numbers (72 == 72.0, active == 1)
+    if str(written) == str(read):
+        return True
+    try:
+        written = BINARY_VALUES.get(written, written)
+        read = BINARY_VALUES.get(read, read)
+        return abs(float(written) - float(read)) < 1e-3
+    except (TypeError, ValueError):
+        return False
+
+
+def read_before(bacnet, device_manager, device_instance, writes):
+    """
+    Reads the current value of every write target with bacnet_session.read_points, in batched reads.
+    Priority slots are read by array index, or as whole arrays on devices that don't take array index reads
+    Return: list of values ("NR" if not read)
+    """
+
+    # bacnet_session imports this module
+    import bacnet_session
+
+    points = [{"object_type": write[0], "object_instance": write[1], "property": write[2], "index": write[4]} for write in writes]
+
+    return bacnet_session.read_points(bacnet, device_manager, device_instance, points)
+
+
+def write_args(device_instance, object_type, object_instance, property, value, index):
+    """
+    Parameters: device instance, write tuple
+    Return: what goes on the wire (object_type, object_instance, property, value, priority)
+    """
+
+    # Write to device
+    if object_type == "device":
+        return ("device", device_instance, property, value, None)
+
+    # Write to priority array
+    if property == "priorityArray":
+        return (object_type, object_instance, "presentValue", value, index)
+
+    # Write to point
+    return (object_type, object_instance, property, value, None)
+
+
+def write_key(args):
+    # (object identifier, property, array index) of a write.  Matches firstFailedWriteAttempt of a WritePropertyMultiple error
+    try:
+        object_instance = int(args[1])
+    except (TypeError, ValueError):
+        object_instance = args[1]
+    return ((str(args[0]), object_instance), str(args[2]), None)
+
+
+def failed_write_key(failed):
+    # Key of the firstFailedWriteAttempt (ObjectPropertyReference) of a WritePropertyMultiple error, same form as write_key
+    return ((str(failed.objectIdentifier[0]), failed.objectIdentifier[1]), str(failed.propertyIdentifier), failed.propertyArrayIndex)
+
+
+def wpm_string(object_type, object_instance, property, value, priority):
+    # One write in BAC0 writeMultiple form: "<type> <inst> <prop> <value> - <priority>"
+    if priority is None:
+        return f"{object_type} {object_instance} {property} {value}"
+    return f"{object_type} {object_instance} {property} {value} - {priority}"
+
+
+def group_by_object(indexes, args_list):
+    """
+    Parameters: indexes into args_list, list of write_args
+    BAC0 build_wpm_request puts every property of an object in that object's first WriteAccessSpecification,
+    so the writes go on the wire grouped by object.  Puts indexes in that order: objects in first-appearance order, writes of one object in their order
+    Return: list of indexes
+    """
+
+    groups = {}
+    for i in indexes:
+        groups.setdefault(write_key(args_list[i])[0], []).append(i)
+
+    return [i for group in groups.values() for i in group]
+
+
+def chunk_writes(args_list, max_apdu):
+    """
+    Parameters: list of write_args, device max APDU
+    Splits writes into WritePropertyMultiple requests that fit the device max APDU.
+    The same property is never written twice in one request, so an error maps back to one write
+    Return: list of lists of indexes into args_list
+    """
+
+    budget = max_apdu - WPM_HEADER
+    chunks = []
+    chunk = []
+    keys = set()
+    size = 0
+    last_object = None
+
+    for i, args in enumerate(args_list):
+        write_size = WPM_PROPERTY_OVERHEAD + len(str(args[3]))
+        if args[:2] != last_object:
+            write_size += WPM_OBJECT_OVERHEAD
+
+        key = write_key(args)
+        if chunk and (size + write_size > budget or len(chunk) >= MAX_WRITES_PER_REQUEST or key in keys):
+            chunks.append(chunk)
+            chunk = []
+            keys = set()
+            size = 0
+            write_size = WPM_PROPERTY_OVERHEAD + len(str(args[3])) + WPM_OBJECT_OVERHEAD
+
+        chunk.append(i)
+        keys.add(key)
+        size += write_size
+        last_object = args[:2]
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+async def send_writes(client, address, device_instance, writes):
+    """Sends all writes of one device as single WriteProperty requests.  The client limits how many are in flight.  Return: list of True or exception"""
+
+    tasks = []
+    for write in writes:
+        object_type, object_instance, property, value, priority = write_args(device_instance, *write)
+        tasks.append(client.write(address, object_type, object_instance, property, value, priority=priority))
+
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def send_write_multiple(client, address, device_instance, writes, capabilities):
+    """
+    Sends the writes of one device as WritePropertyMultiple requests.
+
+    A device stops at the first failed write of a request and reports it.  Writes before it on the wire are done,
+    the failed write gets the error and the writes after it are sent again in a new request.
+    Writes are kept in wire order (grouped by object, see group_by_object), so "before it" is known.
+    Writes the device won't take as WritePropertyMultiple (rejected, aborted) are sent as single writes
+
+    Return: list of True or exception, in writes order
+    """
+
+    args_list = [write_args(device_instance, *write) for write in writes]
+    answers = [None for write in writes]
+
+    async def send_chunk(indexes):
+        while indexes and capabilities["wpm"]:
+            indexes = group_by_object(indexes, args_list)
+            try:
+                request = client.bacnet.build_wpm_request([wpm_string(*args_list[i]) for i in indexes], addr=address)
+            except Exception as e:
+                logging.error(f"send_write_multiple error.  error: {e} device: {device_instance}")
+                break
+
+            iocb = await client.request(address, request)
+
+            if isinstance(iocb.ioResponse, SimpleAckPDU):
+                for i in indexes:
+                    answers[i] = True
+                return
+
+            error = iocb.ioError
+            if isinstance(error, WritePropertyMultipleError):
+                key = failed_write_key(error.firstFailedWriteAttempt)
+                failed_at = next((n for n, i in enumerate(indexes) if write_key(args_list[i]) == key), None)
+
+                # Can't tell which write failed.  Send them one by one
+                if failed_at is None:
+                    break
+
+                for i in indexes[:failed_at]:
+                    answers[i] = True
+                answers[indexes[failed_at]] = NoResponseFromController(f"APDU Abort Reason : {find_reason(error)}")
+                indexes = indexes[failed_at + 1 :]
+                continue
+
+            reason = find_reason(error) if error else "not an ack"
+            if reason == "unrecognizedService":
+                capabilities["wpm"] = False
+            logging.info(f"WritePropertyMultiple not used.  reason: {reason} device: {device_instance}")
+            break
+
+        # Rest is written one by one
+        singles = await send_writes(client, address, device_instance, [writes[i] for i in indexes])
+        for i, answer in zip(indexes, singles):
+            answers[i] = answer
+
+    order = group_by_object(range(len(args_list)), args_list)
+    chunks = [[order[n] for n in chunk] for chunk in chunk_writes([args_list[i] for i in order], capabilities["max_apdu"])]
+    await asyncio.gather(*(send_chunk(chunk) for chunk in chunks))
+
+    return answers
+
+
+def write_points(bacnet, device_manager, device_instance, writes, verify=None, max_in_flight=None, before=None):
+    """
+    Parameters: bacnet device, device_manager, device instance, list of (object_type, object_instance, property, value, index),
+    read back after writing (None for settings.ini verifyWrites), writes in flight (None for settings.ini maxWritesPerDevice),
+    original values in writes order if the caller already read them (None to read them here)
+
+    Write pipeline for one device:
+    1. Reads every original value in one batched read (unless given) and logs it to "bacnet log.txt"
+    2. Sends the writes concurrently, at most max_in_flight at a time.  Grouped into WritePropertyMultiple requests
+       if the device takes them, else single WriteProperty requests
+    3. Optionally reads everything back in one batched read and logs values that didn't stick
+
+    Return: list in writes order.  True if written, else the error text
+
+    Example:
+    write_points(bacnet, device_manager, 1001, [("binaryOutput", 20, "priorityArray", "inactive", 3)])
+
+    REV History:
+    2026-10-17 (mikes): initial
+    2026-10-17 (mikes): WritePropertyMultiple
+    2026-10-17 (mikes): original values can be passed in
+    2026-10-17 (mikes): original values read with bacnet_session.read_points, whole array fallback for priority slots
+    """
+
+    default_in_flight, default_verify = get_write_settings()
+    verify = default_verify if verify is None else verify
+    max_in_flight = max_in_flight or default_in_flight
+
+    # Get bacnet address from device_manager
+    address = device_manager.get_address(device_instance)
+    if address is None:
+        return ["device not found" for write in writes]
+
+    results = ["program not writable" for write in writes]
+
+    # Don't allow writing to program
+    index_list = [i for i, write in enumerate(writes) if write[0] != "program"]
+    writes = [(*writes[i][:3], wire_value(writes[i][3]), writes[i][4]) for i in index_list]
+    if not writes:
+        return results
+
+    # Read BACnet points and log values
+    if before is None:
+        before = read_before(bacnet, device_manager, device_instance, writes)
+    else:
+        before = [before[i] for i in index_list]
+    for (object_type, object_instance, property, value, index), read_value in zip(writes, before):
+        if index is None:
+            bacnet_logger.info(f"Writing to {device_instance}:{object_type}{object_instance} {property}.  Original value: {read_value}")
+        else:
+            bacnet_logger.info(
+                f"Writing to {device_instance}:{object_type}{object_instance} {property} priority {index}.  Original value: {read_value}"
+            )
+
+    # Write BACnet points
+    client = AsyncBacnetClient(bacnet, max_outstanding=max_in_flight)
+    capabilities = batch_read.get_device_capabilities(bacnet, address, device_instance)
+    if len(writes) > 1 and capabilities.get("wpm", True):
+        capabilities.setdefault("wpm", True)
+        answers = run_sync(send_write_multiple(client, address, device_instance, writes, capabilities))
+    else:
+        answers = run_sync(send_writes(client, address, device_instance, writes))
+
+    for i, write, answer in zip(index_list, writes, answers):
+        object_type, object_instance, property, value, index = write
+        if isinstance(answer, Exception):
+            message = f"write_point error.  error: {answer} device: {device_instance} object_type: {object_type} object_instance: {object_instance} property: {property} index: {index}"
+            logging.error(message)
+            bacnet_logger.error(message)
+            results[i] = str(answer)
+        else:
+            results[i] = True
+
+    # Read back the points that were written
+    if verify:
+        written = [n for n, i in enumerate(index_list) if results[i] is True]
+        after = read_before(bacnet, device_manager, device_instance, [writes[n] for n in written])
+        for n, read_value in zip(written, after):
+            object_type, object_instance, property, value, index = writes[n]
+            if not same_value(value, read_value):
+                bacnet_logger.error(
+                    f"Verify failed {device_instance}:{object_type}{object_instance} {property} index: {index}.  Wrote: {value} read back: {read_value}"
+                )
+                results[index_list[n]] = f"verify failed, read back {read_value}"
+
+    return results